@@ -1,18 +1,38 @@
 # api/endpoints.py
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List, Dict
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import asyncio
+import contextlib
+import hashlib
+from datetime import date, timezone
+import sqlite3
 import sys
 import os
 
 try:
-    from app.models.product_model import ProductModel
-    from app.models.sale_model import SaleModel
+    from app.models.product_model import ProductModel, STOCK_MODE_SET, STOCK_MODE_ADJUST
+    from app.models.product_catalog import get_product_catalog
+    from app.controllers.products_controller import ProductsController
+    from app.models.sale_model import SaleModel, InsufficientStockError, ProductUnavailableError
+    from app.controllers.history_controller import HistoryController, EXPORT_FORMATS, EXPORT_MEDIA_TYPES
+    from app.models.cash_session_model import CashSessionModel, CashSessionClosedError
+    from app.models.change_events import ProductsUpserted, SalePosted, StockChanged, get_change_event_log
+    from app.models.sync_model import SyncModel, DEFAULT_SYNC_BATCH_SIZE
+    from app.models.idempotency_model import IdempotencyKeyModel, IdempotencyKeyReusedError
 except ImportError:
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
     if project_root not in sys.path:
         sys.path.insert(0, project_root)
-    from app.models.product_model import ProductModel
-    from app.models.sale_model import SaleModel
+    from app.models.product_model import ProductModel, STOCK_MODE_SET, STOCK_MODE_ADJUST
+    from app.models.product_catalog import get_product_catalog
+    from app.controllers.products_controller import ProductsController
+    from app.models.sale_model import SaleModel, InsufficientStockError, ProductUnavailableError
+    from app.controllers.history_controller import HistoryController, EXPORT_FORMATS, EXPORT_MEDIA_TYPES
+    from app.models.cash_session_model import CashSessionModel, CashSessionClosedError
+    from app.models.change_events import ProductsUpserted, SalePosted, StockChanged, get_change_event_log
+    from app.models.sync_model import SyncModel, DEFAULT_SYNC_BATCH_SIZE
+    from app.models.idempotency_model import IdempotencyKeyModel, IdempotencyKeyReusedError
 
 from . import schemas
 # from .dependencies import verify_api_key # Descomentar para autenticación
@@ -27,38 +47,157 @@ async def create_product_endpoint(product_data: schemas.ProductCreateAPI):
         name=product_data.name,
         quantity_available=product_data.quantity_available,
         sale_price=product_data.sale_price,
-        purchase_price=product_data.purchase_price
+        purchase_price=product_data.purchase_price,
+        reorder_point=product_data.reorder_point,
+        reorder_qty=product_data.reorder_qty
     )
     if not product_id:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="No se pudo crear el producto.")
-    created_product_db = ProductModel.get_product_by_id(product_id)
+    created_product_db = get_product_catalog().get_by_id(product_id)
     if not created_product_db:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Producto creado pero no se pudo recuperar.")
     return created_product_db # Pydantic convierte sqlite3.Row a ProductAPI
 
-@router.get("/products/", response_model=List[schemas.ProductAPI], summary="Obtener lista de productos activos")
-async def get_all_products_endpoint(skip: int = 0, limit: int = 100, include_inactive: bool = False):
-    if include_inactive:
-        # Necesitarías un método como ProductModel.get_all_including_inactive()
-        # Por ahora, solo se devuelven activos
-        products_db_rows = ProductModel.get_all_products()
-    else:
-        products_db_rows = ProductModel.get_all_products() # Ya filtra por activos
-    
+@router.get("/products/", response_model=schemas.ProductPageAPI, summary="Obtener una página de productos")
+async def get_all_products_endpoint(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor devuelto por la página anterior"),
+    include_inactive: bool = False,
+    name_prefix: Optional[str] = Query(None, min_length=1),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    min_stock: Optional[int] = Query(None, ge=0),
+    max_stock: Optional[int] = Query(None, ge=0)
+):
+    try:
+        products_db_rows, next_cursor = ProductModel.get_products_page(
+            limit=limit,
+            page_cursor=cursor,
+            include_inactive=include_inactive,
+            name_prefix=name_prefix,
+            min_price=min_price,
+            max_price=max_price,
+            min_stock=min_stock,
+            max_stock=max_stock
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if products_db_rows is None:
-        return []
-    return products_db_rows[skip : skip + limit]
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="No se pudieron obtener los productos.")
+    return schemas.ProductPageAPI(
+        items=[schemas.ProductAPI.model_validate(dict(row)) for row in products_db_rows],
+        next_cursor=next_cursor
+    )
+
+@router.get("/products/search", response_model=List[schemas.ProductAPI], summary="Buscar productos por nombre (por relevancia)")
+async def search_products_endpoint(
+    q: str = Query(..., min_length=1, description="Texto a buscar; ignora mayúsculas y tildes y tolera errores de tipeo"),
+    include_inactive: bool = False,
+    limit: int = Query(20, ge=1, le=200)
+):
+    return ProductsController.search_products_ranked(q, include_inactive=include_inactive, limit=limit)
+
+# El cuerpo se lee a mano según su Content-Type; esto lo documenta en OpenAPI.
+_BULK_IMPORT_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "application/json": {
+            "schema": {"type": "array", "items": {"type": "object"}},
+        },
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "properties": {"file": {"type": "string", "format": "binary", "description": "Archivo CSV o .json"}},
+                "required": ["file"],
+            },
+        },
+    },
+}
+
+@router.post(
+    "/products/bulk", response_model=schemas.ProductBulkImportResultAPI,
+    summary="Importar productos en bloque (alta o actualización por nombre)",
+    openapi_extra={"requestBody": _BULK_IMPORT_REQUEST_BODY}
+)
+async def bulk_import_products_endpoint(request: Request):
+    """
+    Acepta una lista JSON de productos, o un archivo CSV (columnas name, quantity_available,
+    sale_price, purchase_price) o .json subido como multipart/form-data en el campo 'file'.
+    """
+    # Cada fila se valida por separado (una fila inválida no rechaza el lote) y las válidas se
+    # escriben en una sola transacción, fuera del event loop.
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        try:
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Falta el archivo (campo 'file').")
+            try:
+                report = await asyncio.to_thread(
+                    ProductsController.import_products_from_upload, upload.file, upload.filename
+                )
+            except ValueError as e: # Formato, columnas o codificación inválidos
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Archivo inválido: {e}")
+        finally:
+            await form.close()
+        if report is not None and report['total_rows'] == 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El archivo no tiene productos.")
+    else:
+        try:
+            products_data = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El cuerpo no es JSON válido.")
+        if not isinstance(products_data, list):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Se esperaba una lista de productos.")
+        if not products_data:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La lista de productos está vacía.")
+        report = await asyncio.to_thread(
+            ProductsController.import_products, enumerate(products_data, start=1)
+        )
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="No se pudieron importar los productos.")
+    return report
+
+@router.patch("/products/bulk", response_model=schemas.ProductBulkUpdateResultAPI, summary="Cambiar precios, stock o estado de muchos productos")
+async def bulk_update_products_endpoint(update_data: schemas.ProductBulkUpdateAPI):
+    # Cada operación es una sola transacción (todo o nada) y el catálogo se invalida una vez.
+    product_filter = update_data.filter.model_dump()
+    try:
+        if update_data.operation == "adjust_prices":
+            affected = await asyncio.to_thread(
+                ProductsController.bulk_adjust_prices, percent=update_data.percent, amount=update_data.amount,
+                price_field=update_data.price_field, **product_filter
+            )
+        elif update_data.operation in ("set_stock", "adjust_stock"):
+            if not update_data.stock:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Falta la planilla de stock ('stock').")
+            affected = await asyncio.to_thread(
+                ProductsController.bulk_update_stock,
+                [(entry.product_id, entry.quantity) for entry in update_data.stock],
+                mode=STOCK_MODE_SET if update_data.operation == "set_stock" else STOCK_MODE_ADJUST,
+                movement_type=update_data.movement_type
+            )
+        else:
+            product_filter.pop('is_active')
+            affected = await asyncio.to_thread(
+                ProductsController.bulk_set_active, update_data.operation == "activate", **product_filter
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if affected is None:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="No se pudo aplicar la operación.")
+    return schemas.ProductBulkUpdateResultAPI(operation=update_data.operation, affected=affected)
 
 @router.get("/products/{product_id}", response_model=schemas.ProductAPI, summary="Obtener un producto por su ID")
 async def get_product_by_id_endpoint(product_id: int):
-    product_db_row = ProductModel.get_product_by_id(product_id)
+    product_db_row = get_product_catalog().get_by_id(product_id)
     if not product_db_row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Producto con ID {product_id} no encontrado.")
     return product_db_row
 
 @router.put("/products/{product_id}", response_model=schemas.ProductAPI, summary="Actualizar un producto existente")
 async def update_product_endpoint(product_id: int, product_data: schemas.ProductUpdateAPI):
-    existing_product_db = ProductModel.get_product_by_id(product_id)
+    existing_product_db = get_product_catalog().get_by_id(product_id)
     if not existing_product_db:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Producto con ID {product_id} no encontrado para actualizar.")
 
@@ -74,7 +213,9 @@ async def update_product_endpoint(product_id: int, product_data: schemas.Product
         name=name_to_update,
         quantity_available=qty_to_update,
         sale_price=sale_p_to_update,
-        purchase_price=purchase_p_to_update
+        purchase_price=purchase_p_to_update,
+        reorder_point=update_data_payload.get('reorder_point'),
+        reorder_qty=update_data_payload.get('reorder_qty')
     )
     if not success:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="No se pudo actualizar el producto.")
@@ -86,12 +227,12 @@ async def update_product_endpoint(product_id: int, product_data: schemas.Product
             else:
                 ProductModel.soft_delete_product(product_id)
 
-    updated_product_db = ProductModel.get_product_by_id(product_id)
+    updated_product_db = get_product_catalog().get_by_id(product_id)
     return updated_product_db
 
 @router.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Eliminar un producto (soft delete)")
 async def delete_product_endpoint(product_id: int):
-    existing_product_db = ProductModel.get_product_by_id(product_id)
+    existing_product_db = get_product_catalog().get_by_id(product_id)
     if not existing_product_db:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Producto con ID {product_id} no encontrado.")
     if not existing_product_db['is_active']:
@@ -103,37 +244,291 @@ async def delete_product_endpoint(product_id: int):
 
 # === SALE ENDPOINTS ===
 @router.post("/sales/", response_model=schemas.SaleCreationResponseAPI, status_code=status.HTTP_201_CREATED, summary="Crear una nueva venta")
-async def create_sale_endpoint(sale_data: schemas.SaleCreateAPI):
+async def create_sale_endpoint(
+    sale_data: schemas.SaleCreateAPI,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255, description="Clave única por venta: reintentar con la misma clave no registra la venta otra vez."),
+):
+    """
+    Con la cabecera Idempotency-Key, un reintento con la misma clave y el mismo cuerpo devuelve la
+    respuesta de la venta ya registrada (con la cabecera Idempotent-Replayed: true) sin tocar las
+    ventas ni el stock; con otro cuerpo, 422. Las claves valen 24 horas.
+    """
     user_id_for_sale = 1 # Hardcoded. Integrar autenticación para obtener el user_id real.
-    items_for_model = []
-    calculated_total_amount = 0.0
 
     if not sale_data.items:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La venta debe contener al menos un producto.")
 
-    for item_api in sale_data.items:
-        product_details = ProductModel.get_product_by_id(item_api.product_id)
-        if not product_details or not product_details['is_active']:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Producto con ID {item_api.product_id} no encontrado o está inactivo.")
-        if item_api.quantity_sold <= 0:
-             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"La cantidad vendida para el producto ID {item_api.product_id} debe ser mayor a cero.")
-        if item_api.quantity_sold > product_details['quantity_available']:
-            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Stock insuficiente para '{product_details['name']}' (ID: {item_api.product_id}). Disponibles: {product_details['quantity_available']}, Solicitados: {item_api.quantity_sold}")
-        
-        price_at_sale = product_details['sale_price']
-        items_for_model.append({
-            'product_id': item_api.product_id,
-            'quantity_sold': item_api.quantity_sold,
-            'price_per_unit': price_at_sale
-        })
-        calculated_total_amount += item_api.quantity_sold * price_at_sale
-    
-    sale_id_db = SaleModel.create_sale(
-        user_id=user_id_for_sale,
-        initial_cash=sale_data.initial_cash,
-        total_amount=calculated_total_amount,
-        items=items_for_model
-    )
+    request_hash = None
+    if idempotency_key is not None:
+        request_hash = hashlib.sha256(sale_data.model_dump_json().encode("utf-8")).hexdigest()
+        try:
+            stored = IdempotencyKeyModel.get_stored_response(idempotency_key, request_hash)
+        except IdempotencyKeyReusedError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+        if stored is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return schemas.SaleCreationResponseAPI(id=stored['sale_id'], total_amount_calculated=stored['total_amount'])
+
+    cart_items = [(item_api.product_id, item_api.quantity_sold) for item_api in sale_data.items]
+
+    # Si el usuario tiene una caja abierta, la venta se suma a ella; la base queda solo en la caja
+    # (sales.initial_cash es una columna heredada que solo guarda la de las ventas sin caja).
+    cash_session = CashSessionModel.get_open_session(user_id_for_sale)
+    initial_cash = 0.0 if cash_session else sale_data.initial_cash
+    cash_session_id = cash_session['id'] if cash_session else None
+
+    # Los productos se leen con una sola consulta y se validan (activo, stock, precio) dentro de
+    # la misma transacción que escribe la venta. Con group commit activo la venta se encola en el
+    # escritor único y se espera sin bloquear el event loop.
+    # Con Idempotency-Key, la clave se vuelve a buscar dentro de la transacción de la venta: dos
+    # reintentos simultáneos registran una sola venta.
+    try:
+        if idempotency_key is None:
+            sale_id_db, calculated_total_amount = await asyncio.wrap_future(SaleModel.submit_cart_sale(
+                user_id=user_id_for_sale,
+                initial_cash=initial_cash,
+                cart_items=cart_items,
+                cash_session_id=cash_session_id
+            ))
+        else:
+            sale_id_db, calculated_total_amount, replayed = await asyncio.wrap_future(SaleModel.submit_idempotent_cart_sale(
+                idempotency_key,
+                request_hash,
+                user_id=user_id_for_sale,
+                initial_cash=initial_cash,
+                cart_items=cart_items,
+                cash_session_id=cash_session_id
+            ))
+            if replayed:
+                response.headers["Idempotent-Replayed"] = "true"
+    except IdempotencyKeyReusedError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except (InsufficientStockError, CashSessionClosedError) as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except (ProductUnavailableError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except sqlite3.Error as e:
+        print(f"Error creating sale (API): {e}")
+        sale_id_db = None
     if not sale_id_db:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error al registrar la venta.")
-    return schemas.SaleCreationResponseAPI(id=sale_id_db, total_amount_calculated=calculated_total_amount)
\ No newline at end of file
+    return schemas.SaleCreationResponseAPI(id=sale_id_db, total_amount_calculated=calculated_total_amount)
+
+# === CASH SESSION ENDPOINTS ===
+@router.post("/cash-sessions/", response_model=schemas.CashSessionAPI, status_code=status.HTTP_201_CREATED, summary="Abrir la caja")
+async def open_cash_session_endpoint(session_data: schemas.CashSessionOpenAPI):
+    user_id_for_session = 1 # Hardcoded, igual que en las ventas. Integrar autenticación.
+    # Las lecturas y escrituras de la caja (BEGIN IMMEDIATE puede esperar el busy timeout) van
+    # fuera del event loop.
+    if await asyncio.to_thread(CashSessionModel.get_open_session, user_id_for_session, use_cache=False):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="El usuario ya tiene una caja abierta.")
+    session = await asyncio.to_thread(CashSessionModel.open_session, user_id_for_session, session_data.base_amount)
+    if not session:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="No se pudo abrir la caja.")
+    return session
+
+@router.get("/cash-sessions/current", response_model=schemas.CashSessionAPI, summary="Caja abierta del usuario")
+async def get_current_cash_session_endpoint():
+    user_id_for_session = 1 # Hardcoded. Integrar autenticación.
+    session = await asyncio.to_thread(CashSessionModel.get_open_session, user_id_for_session)
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No hay una caja abierta.")
+    return await asyncio.to_thread(CashSessionModel.get_session, session['id']) # Totales al día
+
+@router.get("/cash-sessions/{cash_session_id}", response_model=schemas.CashSessionAPI, summary="Reporte de una caja")
+async def get_cash_session_endpoint(cash_session_id: int):
+    session = await asyncio.to_thread(CashSessionModel.get_session, cash_session_id)
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Caja no encontrada.")
+    return session
+
+@router.post("/cash-sessions/{cash_session_id}/close", response_model=schemas.CashSessionAPI, summary="Cerrar una caja")
+async def close_cash_session_endpoint(cash_session_id: int, close_data: schemas.CashSessionCloseAPI):
+    session = await asyncio.to_thread(CashSessionModel.get_session, cash_session_id)
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Caja no encontrada.")
+    if session['closed_at'] is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="La caja ya está cerrada.")
+    closed_session = await asyncio.to_thread(CashSessionModel.close_session, cash_session_id, close_data.counted_cash)
+    if not closed_session:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="No se pudo cerrar la caja.")
+    return closed_session
+
+@router.get("/sales/history", response_model=List[schemas.SalesHistoryDayAPI], summary="Historial de ventas por rango de fechas")
+async def get_sales_history_endpoint(
+    start_date: date = Query(..., description="Primer día del rango (YYYY-MM-DD), inclusivo."),
+    end_date: date = Query(..., description="Último día del rango (YYYY-MM-DD), inclusivo."),
+    user_id: Optional[int] = Query(None, description="Solo ventas de este usuario."),
+    product_id: Optional[int] = Query(None, description="Solo líneas de este producto."),
+):
+    if start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_date no puede ser posterior a end_date.")
+    # Días del más reciente al más antiguo; el filtro de fechas se resuelve en SQL con el índice de
+    # sale_timestamp. Se lee fuera del event loop, para no frenar las demás peticiones ni /events.
+    return await asyncio.to_thread(lambda: list(HistoryController.get_sales_history(
+        start_date.isoformat(), end_date.isoformat(), user_id=user_id, product_id=product_id
+    )))
+
+@router.get("/sales/export", summary="Exportar el historial de ventas (CSV o NDJSON, en streaming)")
+async def export_sales_history_endpoint(
+    start_date: Optional[date] = Query(None, description="Primer día (YYYY-MM-DD), inclusivo. Sin valor: desde el inicio."),
+    end_date: Optional[date] = Query(None, description="Último día (YYYY-MM-DD), inclusivo. Sin valor: hasta hoy."),
+    export_format: str = Query("csv", alias="format", description="csv o ndjson."),
+):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Formato no soportado. Use uno de: {', '.join(EXPORT_FORMATS)}.")
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_date no puede ser posterior a end_date.")
+    # Generador síncrono: Starlette lo recorre en su threadpool, lote a lote, con una conexión
+    # propia (create_connection) que se cierra al terminar o si el cliente se desconecta.
+    chunks = (chunk for chunk, _ in HistoryController.iter_sales_export(
+        start_date.isoformat() if start_date else None,
+        end_date.isoformat() if end_date else None,
+        export_format
+    ))
+    file_name = f"historial_ventas_{start_date or 'inicio'}_{end_date or 'hoy'}.{export_format}"
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+    )
+
+def _first_sales_history_day(day_iso, user_id, product_id):
+    """Primer (único) día del historial, o None. Abre y cierra el generador en el mismo hilo."""
+    with contextlib.closing(HistoryController.get_sales_history(day_iso, day_iso, user_id=user_id, product_id=product_id)) as days:
+        return next(days, None)
+
+@router.get("/sales/history/{sale_date}", response_model=schemas.SalesHistoryDayAPI, summary="Historial de ventas de un día")
+async def get_sales_history_for_day_endpoint(
+    sale_date: date,
+    user_id: Optional[int] = Query(None, description="Solo ventas de este usuario."),
+    product_id: Optional[int] = Query(None, description="Solo líneas de este producto."),
+):
+    day_iso = sale_date.isoformat()
+    day = await asyncio.to_thread(_first_sales_history_day, day_iso, user_id, product_id)
+    if day is not None:
+        return day
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No hay ventas registradas el {day_iso}.")
+
+# === CHANGE EVENTS (Server-Sent Events) ===
+# Cada cuánto se envía un comentario si no hay cambios (mantiene viva la conexión y detecta cierres).
+EVENTS_HEARTBEAT_SECONDS = 15
+# Eventos pendientes por cliente; si uno lento acumula más, se corta su stream y al reconectar
+# retoma desde su Last-Event-ID con lo guardado en el registro de eventos.
+EVENTS_CLIENT_QUEUE_SIZE = 1000
+
+def _change_event_type(event):
+    if isinstance(event, SalePosted):
+        return "sale_posted"
+    if isinstance(event, StockChanged):
+        return "stock_changed"
+    if isinstance(event, ProductsUpserted):
+        return "product_upserted"
+    return "history_cleared"
+
+def _change_event_message(seq, event):
+    """Evento SSE (id, event, data JSON) con el estado actual de los productos afectados."""
+    product_ids = getattr(event, 'product_ids', None)
+    catalog = get_product_catalog()
+    payload = schemas.ChangeEventAPI(
+        seq=seq,
+        type=_change_event_type(event),
+        product_ids=list(product_ids) if product_ids is not None else None,
+        products=[product for product in map(catalog.get_by_id, product_ids or ()) if product],
+        sale_id=getattr(event, 'sale_id', None),
+        user_id=getattr(event, 'user_id', None),
+        cash_session_id=getattr(event, 'cash_session_id', None),
+    )
+    return f"id: {seq}\nevent: {payload.type}\ndata: {payload.model_dump_json()}\n\n"
+
+@router.get("/events", summary="Cambios de productos, stock y ventas en vivo (Server-Sent Events)")
+async def stream_change_events_endpoint(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Último seq recibido: se reenvían primero los eventos posteriores."),
+    last_event_id: Optional[str] = Header(None, description="Igual que since; lo envía EventSource al reconectar."),
+):
+    """
+    Stream text/event-stream. Primero un evento 'hello' (ChangeStreamHelloAPI) con el último seq
+    al conectar; si trae resync_required (since ya no está en el registro o es de un arranque
+    anterior del servidor), el cliente debe recargar GET /products/. Luego los eventos posteriores
+    a since y los nuevos, uno por cambio (ChangeEventAPI), con id = seq creciente.
+    """
+    resume_after = since
+    if resume_after is None and last_event_id and last_event_id.isdigit():
+        resume_after = int(last_event_id)
+
+    async def event_messages():
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=EVENTS_CLIENT_QUEUE_SIZE)
+        overflowed = []
+
+        def enqueue(entry):
+            try:
+                queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                overflowed.append(True)
+
+        # El registro llama al oyente en el hilo que publicó: se pasa al loop de este stream.
+        unsubscribe, backlog, last_seq = get_change_event_log().subscribe_after(
+            resume_after, lambda seq, event: loop.call_soon_threadsafe(enqueue, (seq, event))
+        )
+        try:
+            hello = schemas.ChangeStreamHelloAPI(last_seq=last_seq, resync_required=backlog is None)
+            yield f"retry: 3000\nevent: hello\ndata: {hello.model_dump_json()}\n\n"
+            for seq, event in backlog or ():
+                yield await asyncio.to_thread(_change_event_message, seq, event)
+            while not overflowed:
+                try:
+                    seq, event = await asyncio.wait_for(queue.get(), EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                # Leer los productos puede recargar el catálogo (tras un cambio masivo): fuera del loop.
+                yield await asyncio.to_thread(_change_event_message, seq, event)
+        finally:
+            unsubscribe()
+
+    return StreamingResponse(
+        event_messages(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# === SYNC ENDPOINTS (terminales remotas) ===
+@router.get("/sync", response_model=schemas.SyncChangesAPI, summary="Cambios de productos y ventas desde una versión")
+async def get_sync_changes_endpoint(
+    since: int = Query(0, ge=0, description="next_since de la llamada anterior (0: todo)."),
+    limit: int = Query(DEFAULT_SYNC_BATCH_SIZE, ge=1, le=5000, description="Filas aproximadas por lote."),
+):
+    changes = await asyncio.to_thread(SyncModel.get_changes, since, limit)
+    if changes is None:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="No se pudieron leer los cambios.")
+    return changes
+
+@router.post("/sync/sales", response_model=schemas.OfflineSalesPushResultAPI, summary="Cargar ventas hechas sin conexión")
+async def push_offline_sales_endpoint(push_data: schemas.OfflineSalesPushAPI):
+    """
+    Registra las ventas en una transacción, cada una con sus precios y su hora. Se puede reenviar el
+    mismo lote (por ejemplo, tras un corte): las ventas con un client_sale_id ya registrado vuelven
+    como 'duplicate' con su sale_id, sin tocar el stock otra vez.
+    """
+    user_id_for_sale = 1 # Hardcoded, igual que en las ventas. Integrar autenticación.
+    offline_sales = [
+        {
+            'client_sale_id': sale_api.client_sale_id,
+            'sale_timestamp': (sale_api.sold_at.astimezone(timezone.utc) if sale_api.sold_at.tzinfo else sale_api.sold_at)
+                              .strftime("%Y-%m-%d %H:%M:%S"),
+            'initial_cash': sale_api.initial_cash,
+            'items': [item_api.model_dump() for item_api in sale_api.items],
+        }
+        for sale_api in push_data.sales
+    ]
+    try:
+        results = await asyncio.wrap_future(SaleModel.submit_offline_sales(user_id_for_sale, offline_sales))
+    except sqlite3.Error as e:
+        print(f"Error loading offline sales (API): {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error al registrar las ventas.")
+    return schemas.OfflineSalesPushResultAPI(results=results)
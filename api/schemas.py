@@ -1,7 +1,7 @@
 # api/schemas.py
 from pydantic import BaseModel, Field, field_validator # field_validator para Pydantic v2 si es necesario
-from typing import List, Optional
-from datetime import datetime
+from typing import Any, List, Literal, Optional
+from datetime import date, datetime
 
 # --- Esquemas de Producto (Product) ---
 class ProductBaseAPI(BaseModel):
@@ -9,6 +9,8 @@ class ProductBaseAPI(BaseModel):
     quantity_available: int = Field(..., ge=0, example=100)
     sale_price: float = Field(..., gt=0, example=25.50)
     purchase_price: float = Field(..., ge=0, example=12.75)
+    reorder_point: int = Field(5, ge=0, example=10) # Alerta de stock bajo cuando quantity_available <= reorder_point
+    reorder_qty: int = Field(0, ge=0, example=50)   # Cantidad sugerida a pedir (0 = sin sugerencia)
 
 class ProductCreateAPI(ProductBaseAPI):
     pass
@@ -18,6 +20,8 @@ class ProductUpdateAPI(BaseModel):
     quantity_available: Optional[int] = Field(None, ge=0, example=90)
     sale_price: Optional[float] = Field(None, gt=0, example=26.00)
     purchase_price: Optional[float] = Field(None, ge=0, example=13.00)
+    reorder_point: Optional[int] = Field(None, ge=0, example=10)
+    reorder_qty: Optional[int] = Field(None, ge=0, example=50)
     is_active: Optional[bool] = Field(None, example=True)
 
 class ProductAPI(ProductBaseAPI):
@@ -33,6 +37,45 @@ class ProductAPI(ProductBaseAPI):
     # class Config:
     #     orm_mode = True
 
+class ProductPageAPI(BaseModel):
+    items: List[ProductAPI]
+    next_cursor: Optional[str] = Field(None, description="Cursor para pedir la página siguiente; null en la última.")
+
+class ProductImportErrorAPI(BaseModel):
+    row: int = Field(..., description="Posición de la fila en la lista enviada (desde 1).")
+    name: Optional[str] = None
+    error: str
+
+class ProductBulkImportResultAPI(BaseModel):
+    total_rows: int
+    inserted: int
+    updated: int = Field(..., description="Filas cuyo nombre ya existía: se actualizaron stock y precios.")
+    errors: List[ProductImportErrorAPI] = Field(default_factory=list, description="Filas rechazadas; no impiden guardar las demás.")
+
+class ProductBulkFilterAPI(BaseModel):
+    product_ids: Optional[List[int]] = Field(None, description="Solo estos productos.")
+    name_prefix: Optional[str] = Field(None, min_length=1)
+    is_active: Optional[bool] = Field(None, description="Solo activos (true) o inactivos (false); null: todos.")
+    min_price: Optional[float] = Field(None, ge=0, description="Precio de venta actual mínimo.")
+    max_price: Optional[float] = Field(None, ge=0, description="Precio de venta actual máximo.")
+
+class ProductStockEntryAPI(BaseModel):
+    product_id: int
+    quantity: int
+
+class ProductBulkUpdateAPI(BaseModel):
+    operation: Literal["adjust_prices", "set_stock", "adjust_stock", "activate", "deactivate"]
+    filter: ProductBulkFilterAPI = Field(default_factory=ProductBulkFilterAPI, description="Productos afectados (precios y estado); vacío: todos.")
+    price_field: Literal["sale_price", "purchase_price"] = "sale_price"
+    percent: Optional[float] = Field(None, gt=-100, example=8.0, description="adjust_prices: cambio porcentual.")
+    amount: Optional[float] = Field(None, example=500.0, description="adjust_prices: cambio en monto fijo.")
+    stock: Optional[List[ProductStockEntryAPI]] = Field(None, description="set_stock / adjust_stock: planilla de conteo.")
+    movement_type: Literal["adjustment", "restock", "return"] = Field("adjustment", description="set_stock / adjust_stock: tipo de movimiento registrado.")
+
+class ProductBulkUpdateResultAPI(BaseModel):
+    operation: str
+    affected: int
+
 
 # --- Esquemas de Venta (Sale) ---
 class SaleItemCreateAPI(BaseModel):
@@ -74,4 +117,95 @@ class SaleDetailAPI(BaseModel):
 class SaleCreationResponseAPI(BaseModel):
     id: int
     message: str = Field("Venta registrada exitosamente", example="Venta registrada exitosamente")
-    total_amount_calculated: float = Field(..., example=51.00)
\ No newline at end of file
+    total_amount_calculated: float = Field(..., example=51.00)
+
+# --- Esquemas de Caja (Cash Session) ---
+class CashSessionOpenAPI(BaseModel):
+    base_amount: float = Field(..., ge=0, example=100000.0)
+
+class CashSessionCloseAPI(BaseModel):
+    counted_cash: float = Field(..., ge=0, example=351000.0)
+
+class CashSessionAPI(BaseModel):
+    id: int
+    user_id: int
+    opened_at: datetime
+    closed_at: Optional[datetime] = None
+    base_amount: float
+    sales_total: float
+    sale_count: int
+    expected_cash: float
+    counted_cash: Optional[float] = None
+    cash_difference: Optional[float] = None
+
+# --- Esquemas de Historial de Ventas ---
+class SalesHistoryItemAPI(BaseModel):
+    sale_id: int
+    product_name: str
+    quantity: int
+    unit_sale_price_at_transaction: float
+    total_sale_price: float
+    unit_purchase_price: float
+    total_cost_price: float
+
+class SalesHistoryDayAPI(BaseModel):
+    sale_date: date
+    base_amount: float
+    sale_count: int
+    items: List[SalesHistoryItemAPI]
+    total_day_sales_value: float
+    total_day_cost_value: float
+    net_profit: float
+
+# --- Esquemas de Eventos de Cambios (GET /api/v1/events) ---
+class ChangeEventAPI(BaseModel):
+    seq: int # Creciente; enviarlo como ?since= (o Last-Event-ID) al reconectar
+    type: Literal["product_upserted", "stock_changed", "sale_posted", "history_cleared"]
+    product_ids: Optional[List[int]] = None # None en cambios masivos: recargar GET /products/
+    products: List[ProductAPI] = [] # Estado actual de esos productos
+    sale_id: Optional[int] = None
+    user_id: Optional[int] = None
+    cash_session_id: Optional[int] = None
+
+class ChangeStreamHelloAPI(BaseModel):
+    last_seq: int # Último seq publicado al conectar
+    resync_required: bool # True si no se pudo retomar desde `since`: recargar todo antes de aplicar eventos
+
+# --- Esquemas de Sincronización de Terminales (GET /api/v1/sync, POST /api/v1/sync/sales) ---
+class SyncTableBatchAPI(BaseModel):
+    columns: List[str] # Nombres de columna, una vez por lote
+    rows: List[List[Any]] = [] # Valores en el orden de columns, ordenados por row_version
+
+class SyncChangesAPI(BaseModel):
+    since: int
+    next_since: int = Field(..., description="Enviar como ?since= en la siguiente llamada.")
+    has_more: bool = Field(..., description="Quedan cambios: pedir de nuevo con next_since.")
+    sales_reset: bool = Field(..., description="Se borró el historial: borrar las ventas locales antes de aplicar el lote.")
+    resync_required: bool = Field(..., description="since no corresponde a esta base: volver a empezar desde 0.")
+    products: SyncTableBatchAPI
+    sales: SyncTableBatchAPI
+    sale_items: SyncTableBatchAPI
+
+class OfflineSaleItemAPI(BaseModel):
+    product_id: int = Field(..., example=1)
+    quantity_sold: int = Field(..., gt=0, example=2)
+    price_per_unit: float = Field(..., ge=0, example=25.50) # Precio que cobró la terminal
+
+class OfflineSaleAPI(BaseModel):
+    client_sale_id: str = Field(..., min_length=1, max_length=100, example="caja2-000153",
+                                description="Identificador único generado por la terminal; reenviarlo no duplica la venta.")
+    sold_at: datetime = Field(..., description="Momento de la venta en la terminal (sin zona horaria: UTC).")
+    initial_cash: float = Field(0.0, ge=0)
+    items: List[OfflineSaleItemAPI] = Field(..., min_length=1)
+
+class OfflineSalesPushAPI(BaseModel):
+    sales: List[OfflineSaleAPI] = Field(..., min_length=1, max_length=500)
+
+class OfflineSaleResultAPI(BaseModel):
+    client_sale_id: str
+    status: Literal["created", "duplicate", "rejected"]
+    sale_id: Optional[int] = None # Venta creada o la ya registrada con ese client_sale_id
+    error: Optional[str] = None # Motivo del rechazo
+
+class OfflineSalesPushResultAPI(BaseModel):
+    results: List[OfflineSaleResultAPI]
@@ -1,6 +1,34 @@
 # app/controllers/history_controller.py
+import csv
+import io
+import json
+import sqlite3
+
 from app.models.sale_model import SaleModel
 
+# Formatos de exportación del historial: CSV plano (una columna tipada por campo, apto para
+# hojas de cálculo y herramientas de análisis por columnas) o NDJSON (un objeto JSON por línea).
+EXPORT_FORMAT_CSV = "csv"
+EXPORT_FORMAT_NDJSON = "ndjson"
+EXPORT_FORMATS = (EXPORT_FORMAT_CSV, EXPORT_FORMAT_NDJSON)
+EXPORT_MEDIA_TYPES = {EXPORT_FORMAT_CSV: "text/csv", EXPORT_FORMAT_NDJSON: "application/x-ndjson"}
+SALES_EXPORT_COLUMNS = (
+    "sale_id", "sale_timestamp", "user_id", "cash_session_id", "product_id", "product_name",
+    "quantity_sold", "price_per_unit", "subtotal", "unit_cost_at_sale", "line_cost", "line_profit",
+)
+EXPORT_BATCH_SIZE = 1000
+
+
+def _export_record(row):
+    """Fila de la exportación: la línea vendida más su costo y ganancia."""
+    unit_cost = row['unit_cost_at_sale'] or 0
+    line_cost = row['quantity_sold'] * unit_cost
+    return (
+        row['sale_id'], row['sale_timestamp'], row['user_id'], row['cash_session_id'], row['product_id'],
+        row['product_name'], row['quantity_sold'], row['price_per_unit'], row['subtotal'], unit_cost,
+        line_cost, row['subtotal'] - line_cost,
+    )
+
 class HistoryController:
     @staticmethod
     def get_formatted_sales_history():
@@ -20,6 +48,90 @@ class HistoryController:
         # return sorted_history
         return history_data
 
+    @staticmethod
+    def get_daily_summaries_page(before_date=None, limit=30):
+        """
+        Página de resúmenes diarios (sin las líneas vendidas), del día más reciente hacia atrás.
+        before_date: 'YYYY-MM-DD' exclusiva (la fecha más antigua de la página anterior) o None.
+        Devuelve (resúmenes, before_date de la página siguiente o None si no hay más días).
+        """
+        sale_days = SaleModel.get_recent_sale_days(before_date=before_date, limit=limit)
+        if not sale_days:
+            return [], None
+        summaries = SaleModel.get_daily_sales_summaries(sale_days[-1], sale_days[0])
+        next_before_date = sale_days[-1] if len(sale_days) == limit else None
+        return summaries, next_before_date
+
+    @staticmethod
+    def get_daily_summaries_for_sales(sale_ids):
+        """Resúmenes de los días de estas ventas (recién confirmadas), del más reciente al más antiguo."""
+        return SaleModel.get_daily_summaries_for_sales(sale_ids)
+
+    @staticmethod
+    def get_sales_history(start_date=None, end_date=None, user_id=None, product_id=None):
+        """
+        Historial entre dos fechas 'YYYY-MM-DD' (inclusivas), opcionalmente por usuario y/o producto.
+        Generador de días (del más reciente al más antiguo), cada uno con sus 'items'; la consulta
+        filtra en SQL y no recorre el historial completo.
+        """
+        return SaleModel.get_sales_history(start_date, end_date, user_id=user_id, product_id=product_id)
+
+    @staticmethod
+    def get_sale_items_for_day(sale_date):
+        """Líneas vendidas en un día, para cargarlas al expandir ese día en el historial."""
+        return SaleModel.get_sale_items_for_day(sale_date)
+
+    @staticmethod
+    def iter_sales_export(start_date=None, end_date=None, export_format=EXPORT_FORMAT_CSV, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Exportación del historial (una fila por línea vendida, en orden cronológico) como
+        generador de tuplas (texto, líneas_en_el_trozo): primero el encabezado (CSV) y luego un
+        trozo por lote leído con fetchmany. La memoria usada es constante sin importar el rango.
+        Lanza ValueError si el formato no existe y sqlite3.Error si la consulta falla.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportación no soportado: {export_format}")
+        buffer = io.StringIO()
+        csv_writer = csv.writer(buffer, lineterminator="\n")
+        if export_format == EXPORT_FORMAT_CSV:
+            csv_writer.writerow(SALES_EXPORT_COLUMNS)
+            yield buffer.getvalue(), 0
+        for rows in SaleModel.iter_sale_line_batches(start_date, end_date, batch_size=batch_size):
+            buffer.seek(0)
+            buffer.truncate()
+            records = [_export_record(row) for row in rows]
+            if export_format == EXPORT_FORMAT_CSV:
+                csv_writer.writerows(records)
+            else:
+                for record in records:
+                    buffer.write(json.dumps(dict(zip(SALES_EXPORT_COLUMNS, record)), ensure_ascii=False))
+                    buffer.write("\n")
+            yield buffer.getvalue(), len(rows)
+
+    @staticmethod
+    def export_sales_history(file_path, start_date=None, end_date=None, export_format=EXPORT_FORMAT_CSV,
+                             progress_callback=None, should_cancel=None):
+        """
+        Escribe la exportación en file_path por lotes. progress_callback(escritas, total) se llama
+        tras cada lote; si should_cancel() devuelve True se detiene (el archivo queda incompleto).
+        Devuelve la cantidad de líneas escritas, o None si hubo error.
+        """
+        total_lines = SaleModel.count_sale_lines(start_date, end_date)
+        written_lines = 0
+        try:
+            with open(file_path, "w", encoding="utf-8", newline="") as export_file:
+                for chunk, line_count in HistoryController.iter_sales_export(start_date, end_date, export_format):
+                    if should_cancel is not None and should_cancel():
+                        break
+                    export_file.write(chunk)
+                    written_lines += line_count
+                    if progress_callback is not None:
+                        progress_callback(written_lines, total_lines)
+            return written_lines
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print(f"Error exporting sales history: {e}")
+            return None
+
     @staticmethod
     def clear_all_sales_history():
         """
@@ -33,9 +145,3 @@ class HistoryController:
             print("Failed to clear sales history.")
         return success
 
-    # Si necesitas filtrar por fecha, la lógica iría aquí o en el modelo.
-    # Por ejemplo:
-    # @staticmethod
-    # def get_sales_history_for_date(target_date_str): # target_date_str en formato 'YYYY-MM-DD'
-    #     all_history = SaleModel.get_sales_history_grouped_by_date()
-    #     return {target_date_str: all_history.get(target_date_str)} if target_date_str in all_history else {}
\ No newline at end of file
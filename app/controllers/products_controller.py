@@ -1,9 +1,94 @@
 # app/controllers/products_controller.py
-from app.models.product_model import ProductModel # Asegúrate que la ruta de importación sea correcta
+import csv
+import io
+import json
+import math
+import os
+
+from app.models.product_model import ProductModel, DEFAULT_SEARCH_LIMIT, STOCK_MODE_SET, DEFAULT_REORDER_POINT # Asegúrate que la ruta de importación sea correcta
+from app.models.product_catalog import get_product_catalog
+from database.stock_ledger import MOVEMENT_ADJUSTMENT, MOVEMENT_RESTOCK
+from database.db_connection import fold_search_text
+
+# Máximo de resultados de búsqueda que se muestran en las tablas de las vistas.
+PRODUCT_VIEW_SEARCH_LIMIT = 500
+
+# Importación masiva (CSV con encabezados o JSON con una lista de objetos): columnas requeridas
+# y filas que se validan por lote antes de escribir todo en una sola transacción.
+PRODUCT_IMPORT_FIELDS = ("name", "quantity_available", "sale_price", "purchase_price")
+PRODUCT_IMPORT_BATCH_SIZE = 5000
+
+
+def _import_number(raw_row, field, integer=False):
+    """Número de la columna `field` (acepta texto como "12" o "1500,50"). Lanza ValueError si no lo es."""
+    value = raw_row.get(field)
+    if value is None or isinstance(value, bool) or (isinstance(value, str) and not value.strip()):
+        raise ValueError(f"Falta '{field}'.")
+    try:
+        number = float(value.strip().replace(",", ".") if isinstance(value, str) else value)
+    except (TypeError, ValueError):
+        number = math.nan
+    if not math.isfinite(number) or (integer and (not number.is_integer() or abs(number) >= 2 ** 63)):
+        raise ValueError(f"'{field}' no es un número válido: {value!r}.")
+    return int(number) if integer else number
+
+
+def _validated_import_row(raw_row):
+    """
+    Tupla (name, quantity_available, sale_price, purchase_price) lista para ProductModel, con las
+    mismas reglas que add_new_product. Lanza ValueError con el motivo si la fila no es válida.
+    """
+    if not isinstance(raw_row, dict):
+        raise ValueError("La fila no es un objeto con los campos del producto.")
+    name = str(raw_row.get("name") or "").strip()
+    if not name:
+        raise ValueError("Falta el nombre.")
+    if len(name) > 255:
+        raise ValueError("El nombre supera los 255 caracteres.")
+    quantity_available = _import_number(raw_row, "quantity_available", integer=True)
+    sale_price = _import_number(raw_row, "sale_price")
+    purchase_price = _import_number(raw_row, "purchase_price")
+    if quantity_available < 0:
+        raise ValueError("La cantidad no puede ser negativa.")
+    if sale_price <= 0:
+        raise ValueError("El precio de venta debe ser mayor que cero.")
+    if purchase_price < 0:
+        raise ValueError("El precio de compra no puede ser negativo.")
+    return (name, quantity_available, sale_price, purchase_price)
+
+
+def _read_import_file(file_path):
+    """
+    Filas (número, dict) de un archivo .json (lista de objetos) o CSV con encabezados.
+    En CSV el número es la línea del archivo; en JSON, la posición en la lista (desde 1).
+    Lanza ValueError si el archivo no tiene el formato o las columnas esperadas.
+    """
+    with open(file_path, "r", encoding="utf-8-sig", newline="") as import_file:
+        yield from _read_import_text(import_file, _is_json_import(file_path))
+
+
+def _is_json_import(file_name):
+    return os.path.splitext(file_name or "")[1].lower() == ".json"
+
+
+def _read_import_text(text_file, is_json):
+    """Como _read_import_file, desde un archivo de texto ya abierto."""
+    if is_json:
+        raw_rows = json.load(text_file)
+        if not isinstance(raw_rows, list):
+            raise ValueError("El JSON debe ser una lista de productos.")
+        yield from enumerate(raw_rows, start=1)
+        return
+    reader = csv.DictReader(text_file)
+    missing_fields = [field for field in PRODUCT_IMPORT_FIELDS if field not in (reader.fieldnames or ())]
+    if missing_fields:
+        raise ValueError(f"Faltan columnas en el CSV: {', '.join(missing_fields)}.")
+    for raw_row in reader:
+        yield reader.line_num, raw_row
 
 class ProductsController:
     @staticmethod
-    def add_new_product(name, quantity_available, sale_price, purchase_price):
+    def add_new_product(name, quantity_available, sale_price, purchase_price, reorder_point=DEFAULT_REORDER_POINT, reorder_qty=0):
         """
         Añade un nuevo producto a la base de datos.
         Llama a ProductModel.add_product.
@@ -12,60 +97,191 @@ class ProductsController:
         # Aquí se podrían añadir validaciones de datos del controlador antes de llamar al modelo,
         # aunque muchas validaciones básicas de tipo/rango ya están en los Pydantic Schemas si usas la API.
         # Para la app de escritorio, las vistas o el controlador pueden hacer estas validaciones.
-        if not name or quantity_available < 0 or sale_price <= 0 or purchase_price < 0:
+        if not name or quantity_available < 0 or sale_price <= 0 or purchase_price < 0 or reorder_point < 0 or reorder_qty < 0:
             print("Error (Controller): Datos de producto inválidos para agregar.")
             return None # O lanzar una excepción específica
         
-        return ProductModel.add_product(name, quantity_available, sale_price, purchase_price)
+        return ProductModel.add_product(name, quantity_available, sale_price, purchase_price, reorder_point, reorder_qty)
+
+    @staticmethod
+    def import_products(numbered_rows, batch_size=PRODUCT_IMPORT_BATCH_SIZE, progress_callback=None, should_cancel=None):
+        """
+        Importa productos en bloque: valida las filas por lotes y escribe las válidas con
+        ProductModel.bulk_upsert_products (una transacción; si el nombre ya existe se actualizan
+        stock y precios). numbered_rows: iterable de (número de fila, dict).
+        progress_callback(hechas, total): total 0 mientras se valida (aún no se conoce) y luego
+        las filas escritas sobre las válidas. Si un nombre se repite en el archivo, vale la última fila.
+        Devuelve {'total_rows', 'inserted', 'updated', 'errors': [{'row', 'name', 'error'}]},
+        o None si la escritura falla o se cancela (no se guarda nada).
+        """
+        valid_rows = []
+        errors = []
+        total_rows = 0
+        batch = []
+
+        def validate_batch():
+            for row_number, raw_row in batch:
+                try:
+                    valid_rows.append(_validated_import_row(raw_row))
+                except ValueError as e:
+                    name = raw_row.get("name") if isinstance(raw_row, dict) else None
+                    errors.append({'row': row_number, 'name': str(name) if name is not None else None, 'error': str(e)})
+            batch.clear()
+            if progress_callback is not None:
+                progress_callback(total_rows, 0)
+
+        for numbered_row in numbered_rows:
+            batch.append(numbered_row)
+            total_rows += 1
+            if len(batch) >= batch_size:
+                if should_cancel is not None and should_cancel():
+                    return None
+                validate_batch()
+        if batch:
+            validate_batch()
+
+        inserted, updated = 0, 0
+        if valid_rows:
+            write_result = ProductModel.bulk_upsert_products(
+                valid_rows, batch_size=batch_size, progress_callback=progress_callback, should_cancel=should_cancel
+            )
+            if write_result is None:
+                return None
+            inserted, updated = write_result
+        return {'total_rows': total_rows, 'inserted': inserted, 'updated': updated, 'errors': errors}
+
+    @staticmethod
+    def import_products_from_file(file_path, progress_callback=None, should_cancel=None):
+        """
+        Importa productos desde un archivo CSV (columnas name, quantity_available, sale_price,
+        purchase_price) o .json (lista de objetos con esos campos). Ver import_products.
+        Devuelve el reporte, o None si el archivo no se puede leer o la escritura falla.
+        """
+        try:
+            return ProductsController.import_products(
+                _read_import_file(file_path), progress_callback=progress_callback, should_cancel=should_cancel
+            )
+        except (OSError, ValueError, csv.Error) as e: # json.JSONDecodeError es un ValueError
+            print(f"Error importing products from {file_path}: {e}")
+            return None
+
+    @staticmethod
+    def import_products_from_upload(binary_file, file_name, progress_callback=None, should_cancel=None):
+        """
+        Como import_products_from_file, para un archivo recibido como flujo binario (p. ej. subido
+        a la API): .json según la extensión de file_name; cualquier otro se lee como CSV.
+        Lanza ValueError si el archivo no tiene el formato o las columnas esperadas (no se guarda
+        nada). Devuelve el reporte, o None si la escritura falla.
+        """
+        text_file = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+        try:
+            return ProductsController.import_products(
+                _read_import_text(text_file, _is_json_import(file_name)),
+                progress_callback=progress_callback, should_cancel=should_cancel
+            )
+        except csv.Error as e:
+            raise ValueError(str(e)) from e
+        finally:
+            text_file.detach() # El flujo binario lo cierra quien lo abrió
 
     @staticmethod
     def get_all_products_for_management_view(): # Renombrado para claridad
         """
         Obtiene TODOS los productos (activos e inactivos) para la vista de gestión de productos.
-        Llama a ProductModel.get_all_products_for_management.
+        Se sirve desde el catálogo en memoria (sin consultar SQLite).
+        """
+        return get_product_catalog().get_all()
+
+    @staticmethod
+    def get_products_snapshot_for_management_view():
+        """
+        TODOS los productos como columnas {campo: lista} ordenadas por nombre, para la grilla
+        virtualizada de la vista de gestión. Se sirve desde el catálogo en memoria.
         """
-        return ProductModel.get_all_products_for_management()
+        return get_product_catalog().get_columns()
 
     @staticmethod
     def search_products_for_management_view(search_term): # Renombrado para claridad
         """
         Busca entre TODOS los productos (activos e inactivos) para la vista de gestión.
-        Llama a ProductModel.search_products_for_management.
+        Búsqueda por relevancia, sin tildes y tolerante a errores de tipeo (ver search_products_ranked).
+        Devuelve (productos, truncated): hasta PRODUCT_VIEW_SEARCH_LIMIT productos, y truncated=True
+        si había más coincidencias que no se incluyeron.
         """
-        return ProductModel.search_products_for_management(search_term)
+        products = ProductModel.search_products_ranked(search_term, active_only=False, limit=PRODUCT_VIEW_SEARCH_LIMIT + 1)
+        return products[:PRODUCT_VIEW_SEARCH_LIMIT], len(products) > PRODUCT_VIEW_SEARCH_LIMIT
 
     @staticmethod
     def get_active_products_for_sales_view():
         """
         Obtiene solo los productos ACTIVOS, típicamente para la vista de ventas (ej. autocompletado).
-        Llama a ProductModel.get_active_products_for_sale.
+        Se sirve desde el catálogo en memoria (sin consultar SQLite).
         """
-        return ProductModel.get_active_products_for_sale()
+        return get_product_catalog().get_all(active_only=True)
 
     @staticmethod
     def search_active_products_for_sales_view(search_term):
         """
         Busca solo entre productos ACTIVOS, típicamente para la vista de ventas.
-        Llama a ProductModel.search_active_products_for_sale.
+        Búsqueda por relevancia, sin tildes y tolerante a errores de tipeo (ver search_products_ranked).
+        """
+        return ProductModel.search_products_ranked(search_term, active_only=True, limit=PRODUCT_VIEW_SEARCH_LIMIT)
+
+    @staticmethod
+    def search_products_ranked(search_term, include_inactive=False, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        Búsqueda de productos por nombre ordenada por relevancia (índice FTS5 trigram):
+        ignora mayúsculas y tildes y completa con coincidencias aproximadas ("tornilo" -> "Tornillo").
+        Llama a ProductModel.search_products_ranked.
         """
-        # Podrías añadir una verificación para search_term vacío si quieres que devuelva todos los activos.
-        # if not search_term:
-        #     return ProductModel.get_active_products_for_sale()
-        return ProductModel.search_active_products_for_sale(search_term)
+        if not search_term or not search_term.strip():
+            return []
+        return ProductModel.search_products_ranked(search_term, active_only=not include_inactive, limit=limit)
+
+    @staticmethod
+    def filter_products_by_search_term(products, search_term):
+        """
+        De una lista de productos ya obtenida, los que contienen todas las palabras del término
+        (sin distinguir mayúsculas ni tildes), conservando el orden. No consulta la base.
+        """
+        words = fold_search_text(search_term or "").split()
+        return [product for product in products
+                if all(word in fold_search_text(product['name']) for word in words)]
+
+    @staticmethod
+    def find_active_product_by_name(product_name):
+        """
+        Producto ACTIVO con ese nombre exacto (sin distinguir mayúsculas; si hay varios, el escrito
+        igual), o None. Lee el catálogo en memoria, que refleja el stock tras cada venta confirmada.
+        """
+        return get_product_catalog().get_by_name(product_name, active_only=True)
+
+    @staticmethod
+    def get_product_names_for_completer(active_only=False):
+        """Nombres de productos ordenados para los QCompleter de las vistas."""
+        return get_product_catalog().get_all_names(active_only=active_only)
+
+    @staticmethod
+    def get_catalog_version():
+        """Versión del catálogo en memoria; cambia con cada alta, edición o venta confirmada."""
+        catalog = get_product_catalog()
+        catalog.ensure_loaded()
+        return catalog.version
 
     @staticmethod
     def get_product_details(product_id):
         """
         Obtiene los detalles completos de un producto específico por su ID,
         incluyendo su estado 'is_active'.
-        Llama a ProductModel.get_product_by_id.
+        Se sirve desde el catálogo en memoria (sin consultar SQLite).
         """
-        return ProductModel.get_product_by_id(product_id)
+        return get_product_catalog().get_by_id(product_id)
 
     @staticmethod
-    def update_existing_product(product_id, name, quantity_available, sale_price, purchase_price):
+    def update_existing_product(product_id, name, quantity_available, sale_price, purchase_price, reorder_point=None, reorder_qty=None):
         """
-        Actualiza los datos de un producto existente.
+        Actualiza los datos de un producto existente (el punto de reorden y la cantidad a pedir
+        solo si se indican).
         No modifica el estado 'is_active' directamente; eso se maneja con activate/deactivate.
         Llama a ProductModel.update_product.
         Devuelve True si fue exitoso, False en caso contrario.
@@ -73,8 +289,11 @@ class ProductsController:
         if not name or quantity_available < 0 or sale_price <= 0 or purchase_price < 0:
             print("Error (Controller): Datos de producto inválidos para actualizar.")
             return False
+        if (reorder_point is not None and reorder_point < 0) or (reorder_qty is not None and reorder_qty < 0):
+            print("Error (Controller): El punto de reorden y la cantidad a pedir no pueden ser negativos.")
+            return False
             
-        return ProductModel.update_product(product_id, name, quantity_available, sale_price, purchase_price)
+        return ProductModel.update_product(product_id, name, quantity_available, sale_price, purchase_price, reorder_point, reorder_qty)
 
     @staticmethod
     def deactivate_product(product_id): # Renombrado de remove_product para más claridad semántica
@@ -113,12 +332,68 @@ class ProductsController:
         return ProductModel.restore_product(product_id)
 
     @staticmethod
-    def get_low_stock_products_for_alert(threshold=0):
+    def bulk_adjust_prices(percent=None, amount=None, price_field="sale_price", **product_filter):
+        """
+        Cambia precios por filtro (p. ej. +8 % a todos por inflación) en una sola transacción.
+        product_filter: product_ids, name_prefix, is_active, min_price, max_price (sin filtro: todos).
+        Devuelve la cantidad de productos modificados o None; lanza ValueError si el cambio no es válido.
+        """
+        if percent is not None and percent <= -100:
+            raise ValueError("El porcentaje debe ser mayor que -100.")
+        return ProductModel.bulk_adjust_prices(percent=percent, amount=amount, price_field=price_field, **product_filter)
+
+    @staticmethod
+    def bulk_update_stock(stock_entries, mode=STOCK_MODE_SET, movement_type=MOVEMENT_ADJUSTMENT, note=None):
+        """
+        Aplica una planilla de conteo: (product_id, cantidad) con mode "set" (cantidad contada)
+        o "adjust" (suma o resta), registrada en stock_movements como movement_type.
+        Todo o nada: lanza ValueError si un producto no existe o su stock quedaría negativo.
+        Devuelve la cantidad de filas aplicadas o None.
+        """
+        return ProductModel.bulk_update_stock(stock_entries, mode=mode, movement_type=movement_type, note=note)
+
+    @staticmethod
+    def bulk_set_active(is_active, **product_filter):
+        """Activa o desactiva todos los productos del filtro; devuelve cuántos cambiaron o None."""
+        return ProductModel.bulk_set_active(is_active, **product_filter)
+
+    @staticmethod
+    def record_stock_movement(product_id, quantity_change, movement_type=MOVEMENT_RESTOCK, note=None):
+        """
+        Reposición (+), devolución (+) o ajuste (+/-) de un producto, con su movimiento en el
+        registro de stock. Devuelve True si se aplicó; False si el producto no existe o el stock
+        quedaría negativo.
+        """
+        if quantity_change == 0:
+            return False
+        return ProductModel.record_stock_movement(product_id, quantity_change, movement_type=movement_type, note=note)
+
+    @staticmethod
+    def get_stock_movements(product_id, limit=100):
+        """Historial de movimientos de stock de un producto (más reciente primero)."""
+        return ProductModel.get_stock_movements(product_id, limit=limit)
+
+    @staticmethod
+    def verify_stock_ledger():
+        """Productos cuyo stock no coincide con su registro de movimientos ([] si todo cuadra, None si falla)."""
+        return ProductModel.verify_stock_ledger()
+
+    @staticmethod
+    def get_low_stock_products_for_alert(threshold=None):
+        """
+        Obtiene productos activos con stock bajo: sin threshold, los que están en o bajo su propio
+        punto de reorden; con threshold, los que tienen stock <= ese umbral.
+        Se sirve desde el catálogo en memoria (sin consultar SQLite).
+        """
+        return get_product_catalog().get_low_stock(threshold)
+
+    @staticmethod
+    def get_low_stock_alerts():
         """
-        Obtiene productos con stock bajo o igual al umbral, que estén activos.
-        Llama a ProductModel.get_low_stock_products.
+        (versión, productos bajo su punto de reorden). La versión solo cambia cuando cambia el
+        conjunto de productos en alerta; las vistas la comparan para no redibujar el aviso en vano.
         """
-        return ProductModel.get_low_stock_products(threshold)
+        return get_product_catalog().get_low_stock_alerts()
 
     # La actualización de stock (ProductModel.update_stock) es llamada por SaleModel
     # durante el proceso de creación de una venta, por lo que generalmente no se
@@ -1,25 +1,61 @@
 # app/controllers/sales_controller.py
 from app.models.sale_model import SaleModel
+from app.models.cash_session_model import CashSessionModel
 # from app.models.product_model import ProductModel # Podría necesitarse si la actualización de stock se maneja aquí explícitamente
 
 class SalesController:
-    current_base_cash = 0.0 # Para almacenar la base del día
     current_user_id = None # Para almacenar el ID del usuario logueado
+    # La base ya no se guarda aquí: vive en la sesión de caja abierta (tabla cash_sessions),
+    # que CashSessionModel comparte de forma segura entre la interfaz y la API.
 
     @classmethod
     def set_daily_base(cls, amount, user_id):
         """
-        Establece la base inicial para las ventas del día y el usuario.
+        Abre la caja del usuario con la base indicada. Si el usuario ya tiene una caja abierta
+        (p. ej. tras reiniciar la aplicación o abierta desde la API), la retoma con su base
+        original y `amount` NO se guarda.
+        Devuelve (sesión de caja (dict), retomada): retomada es True si ya estaba abierta.
+        Devuelve (None, False) si no se pudo abrir.
         """
-        # Aquí podrías tener lógica para guardar esta base en una tabla `daily_cash_entries` si fuera necesario.
-        # Por ahora, la almacenamos en la clase y se pasa al crear la venta.
         if amount < 0:
             print("Error: Initial cash base cannot be negative.")
-            return False
-        cls.current_base_cash = amount
+            return None, False
         cls.current_user_id = user_id # Asumiendo que el user_id viene de la sesión/login
-        print(f"Daily base set to: {amount} for user ID: {user_id}")
-        return True
+        session = CashSessionModel.get_open_session(user_id, use_cache=False)
+        if session:
+            print(f"Cash session {session['id']} already open with base {session['base_amount']} for user ID: {user_id}")
+            return session, True
+        session = CashSessionModel.open_session(user_id, amount)
+        if session:
+            print(f"Cash session {session['id']} open with base {session['base_amount']} for user ID: {user_id}")
+        return session, False
+
+    @classmethod
+    def resume_open_cash_session(cls, user_id):
+        """Caja abierta del usuario (o None), para retomarla al iniciar la vista de ventas."""
+        session = CashSessionModel.get_open_session(user_id)
+        if session:
+            cls.current_user_id = user_id
+        return session
+
+    @staticmethod
+    def close_cash_session(user_id, counted_cash):
+        """
+        Cierra la caja abierta del usuario con el efectivo contado.
+        Devuelve el reporte de cierre (base, ventas, esperado, contado, diferencia) o None.
+        """
+        session = CashSessionModel.get_open_session(user_id)
+        if not session:
+            print(f"Error: No open cash session for user ID: {user_id}")
+            return None
+        if counted_cash < 0:
+            print("Error: Counted cash cannot be negative.")
+            return None
+        return CashSessionModel.close_session(session['id'], counted_cash)
+
+    @staticmethod
+    def get_cash_session_report(cash_session_id):
+        return CashSessionModel.get_session(cash_session_id)
 
     @staticmethod
     def process_new_sale(items_to_sell, total_sale_amount, customer_payment_amount=None, change_given=None):
@@ -34,8 +70,9 @@ class SalesController:
             # Podrías lanzar una excepción o devolver un código de error específico.
             return None
         
-        if SalesController.current_base_cash is None: # O alguna validación de que se haya ingresado.
-             print("Error: Daily cash base has not been set.")
+        cash_session = CashSessionModel.get_open_session(SalesController.current_user_id)
+        if not cash_session:
+             print("Error: Daily cash base has not been set (no open cash session).")
              return None
 
         if not items_to_sell:
@@ -56,9 +93,10 @@ class SalesController:
 
         sale_id = SaleModel.create_sale(
             user_id=SalesController.current_user_id,
-            initial_cash=SalesController.current_base_cash, # Pasa la base establecida
+            initial_cash=0.0, # Columna heredada: la base del día se lee de la caja (cash_sessions)
             total_amount=total_sale_amount,
-            items=model_items
+            items=model_items,
+            cash_session_id=cash_session['id']
         )
 
         if sale_id:
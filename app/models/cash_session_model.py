@@ -0,0 +1,175 @@
+# app/models/cash_session_model.py
+"""
+Sesiones de caja (tabla cash_sessions): se abren con una base, cada venta suma su total a la
+sesión dentro de su propia transacción, y al cerrar se guarda el efectivo contado.
+Abrir, cerrar y consultar una sesión son búsquedas por clave o por el índice parcial de cajas
+abiertas (idx_cash_sessions_open_user), sin recorrer sales.
+
+La sesión abierta de cada usuario también se guarda en memoria (CashSessionRegistry), bajo un
+lock, porque la consultan tanto la interfaz como el hilo de la API en cada venta.
+"""
+import sqlite3
+import threading
+
+from database.db_connection import get_connection, get_db_path, transaction
+
+_SESSION_COLUMNS = "id, user_id, opened_at, closed_at, base_amount, sales_total, sale_count, counted_cash"
+
+
+class CashSessionClosedError(Exception):
+    """La venta apunta a una sesión de caja que no existe o ya se cerró; no se guardó nada."""
+    def __init__(self, cash_session_id):
+        self.cash_session_id = cash_session_id
+        super().__init__(f"La sesión de caja {cash_session_id} no está abierta.")
+
+
+def _session_dict(row):
+    """Convierte una fila de cash_sessions en diccionario, con el efectivo esperado y la diferencia."""
+    if row is None:
+        return None
+    session = dict(row)
+    session['expected_cash'] = session['base_amount'] + session['sales_total']
+    session['cash_difference'] = (
+        session['counted_cash'] - session['expected_cash'] if session['counted_cash'] is not None else None
+    )
+    return session
+
+
+class CashSessionRegistry:
+    """
+    Sesión abierta por (base de datos, usuario), compartida entre hilos.
+    Los valores son dicts que no se modifican después de guardarlos.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open_by_user = {}
+
+    def get(self, user_id):
+        with self._lock:
+            return self._open_by_user.get((get_db_path(), user_id))
+
+    def set(self, user_id, session):
+        with self._lock:
+            if session is None:
+                self._open_by_user.pop((get_db_path(), user_id), None)
+            else:
+                self._open_by_user[(get_db_path(), user_id)] = session
+
+    def discard_session(self, cash_session_id):
+        with self._lock:
+            db_path = get_db_path()
+            for key, session in list(self._open_by_user.items()):
+                if key[0] == db_path and session['id'] == cash_session_id:
+                    del self._open_by_user[key]
+
+    def clear(self):
+        with self._lock:
+            self._open_by_user.clear()
+
+
+_registry = CashSessionRegistry()
+
+
+class CashSessionModel:
+    @staticmethod
+    def open_session(user_id, base_amount):
+        """
+        Abre una sesión de caja para el usuario. Devuelve la sesión (dict) o None si falla,
+        incluido el caso de que el usuario ya tenga una abierta (índice único parcial).
+        """
+        try:
+            with get_connection() as conn, transaction(conn):
+                cursor = conn.execute(
+                    "INSERT INTO cash_sessions (user_id, base_amount) VALUES (?, ?)", (user_id, base_amount)
+                )
+                session = _session_dict(conn.execute(
+                    f"SELECT {_SESSION_COLUMNS} FROM cash_sessions WHERE id = ?", (cursor.lastrowid,)
+                ).fetchone())
+            _registry.set(user_id, session)
+            return session
+        except sqlite3.IntegrityError as e:
+            print(f"Error opening cash session (¿ya hay una abierta para el usuario {user_id}?): {e}")
+            return None
+        except sqlite3.Error as e:
+            print(f"Error opening cash session: {e}")
+            return None
+
+    @staticmethod
+    def close_session(cash_session_id, counted_cash):
+        """
+        Cierra la sesión guardando el efectivo contado. Devuelve la sesión cerrada (con
+        'expected_cash' y 'cash_difference') o None si no existe, ya estaba cerrada o hay error.
+        """
+        try:
+            # Cierre y lectura de totales en la misma transacción IMMEDIATE: ninguna venta puede
+            # confirmarse entre ambos y quedar fuera de expected_cash.
+            with get_connection() as conn, transaction(conn, "IMMEDIATE"):
+                cursor = conn.execute(
+                    "UPDATE cash_sessions SET closed_at = CURRENT_TIMESTAMP, counted_cash = ? WHERE id = ? AND closed_at IS NULL",
+                    (counted_cash, cash_session_id)
+                )
+                if cursor.rowcount == 0:
+                    print(f"Error closing cash session: la sesión {cash_session_id} no existe o ya está cerrada.")
+                    return None
+                session = _session_dict(conn.execute(
+                    f"SELECT {_SESSION_COLUMNS} FROM cash_sessions WHERE id = ?", (cash_session_id,)
+                ).fetchone())
+            _registry.discard_session(cash_session_id)
+            return session
+        except sqlite3.Error as e:
+            print(f"Error closing cash session: {e}")
+            return None
+
+    @staticmethod
+    def get_session(cash_session_id):
+        """Sesión por id (reporte de caja: base, ventas, esperado, contado, diferencia) o None."""
+        try:
+            with get_connection() as conn:
+                return _session_dict(conn.execute(
+                    f"SELECT {_SESSION_COLUMNS} FROM cash_sessions WHERE id = ?", (cash_session_id,)
+                ).fetchone())
+        except sqlite3.Error as e:
+            print(f"Error fetching cash session: {e}")
+            return None
+
+    @staticmethod
+    def get_open_session(user_id, use_cache=True):
+        """
+        Sesión abierta del usuario o None. Se sirve desde memoria si ya se consultó; si no, es
+        una búsqueda en el índice parcial de cajas abiertas. En la copia en memoria 'sales_total'
+        y 'sale_count' pueden estar atrasados: para el reporte de caja usar get_session.
+        """
+        if use_cache:
+            session = _registry.get(user_id)
+            if session is not None:
+                return session
+        try:
+            with get_connection() as conn:
+                session = _session_dict(conn.execute(
+                    f"SELECT {_SESSION_COLUMNS} FROM cash_sessions WHERE user_id = ? AND closed_at IS NULL",
+                    (user_id,)
+                ).fetchone())
+        except sqlite3.Error as e:
+            print(f"Error fetching open cash session: {e}")
+            return None
+        _registry.set(user_id, session)
+        return session
+
+    @staticmethod
+    def add_sale_to_session(cursor, cash_session_id, sale_total):
+        """
+        Suma una venta a su sesión usando la transacción ya abierta por SaleModel.
+        Lanza CashSessionClosedError si la sesión no está abierta (p. ej. se cerró desde otro hilo).
+        """
+        cursor.execute(
+            "UPDATE cash_sessions SET sales_total = sales_total + ?, sale_count = sale_count + 1 WHERE id = ? AND closed_at IS NULL",
+            (sale_total, cash_session_id)
+        )
+        if cursor.rowcount != 1:
+            _registry.discard_session(cash_session_id) # Pudo cerrarse desde otro proceso
+            raise CashSessionClosedError(cash_session_id)
+
+    @staticmethod
+    def clear_cached_sessions():
+        """Olvida las sesiones en memoria (p. ej. al cambiar de base de datos o borrar el historial)."""
+        _registry.clear()
@@ -0,0 +1,148 @@
+# app/models/change_events.py
+"""
+Avisos de cambios entre los modelos, la API y las vistas del mismo proceso.
+
+Los modelos publican un evento después de cada escritura confirmada (y después de actualizar el
+catálogo en memoria, así quien lo reciba ya lee datos nuevos). Los suscriptores se llaman en el
+hilo que publicó (interfaz, hilo de la API o escritor de group commit): no deben bloquearse ni
+tocar widgets; las vistas se suscriben a través de app.views.change_event_bridge, que reenvía
+cada evento al hilo de la interfaz con una señal en cola.
+
+ChangeEventLog numera cada evento publicado (seq creciente, empieza en 1 con cada arranque del
+proceso) y guarda los últimos CHANGE_EVENT_LOG_SIZE, para que un cliente externo (GET
+/api/v1/events) pueda retomar desde el último seq que recibió sin perder cambios.
+"""
+import threading
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ProductsUpserted:
+    """Productos creados o editados (nombre, precios, estado, punto de reorden o stock).
+    product_ids es None cuando la escritura fue masiva y no se sabe cuáles cambiaron."""
+    product_ids: Optional[Tuple[int, ...]]
+
+
+@dataclass(frozen=True)
+class StockChanged:
+    """Solo cambió quantity_available de estos productos (None: cualquiera)."""
+    product_ids: Optional[Tuple[int, ...]]
+
+
+@dataclass(frozen=True)
+class SalePosted(StockChanged):
+    """Venta confirmada; como descuenta stock, también es un StockChanged de sus productos."""
+    sale_id: int = 0
+    user_id: Optional[int] = None
+    cash_session_id: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class HistoryCleared:
+    """Se borró todo el historial de ventas."""
+
+
+class ChangeEventBus:
+    """Publicación/suscripción síncrona; la lista de suscriptores se protege con un lock."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = [] # [(tipos de evento, callback)]
+
+    def subscribe(self, callback, *event_types):
+        """Llama a callback(evento) por cada evento de esos tipos (o subclases); sin tipos, todos.
+        Devuelve una función que cancela la suscripción."""
+        subscription = (event_types or (object,), callback)
+        with self._lock:
+            self._subscribers.append(subscription)
+
+        def unsubscribe():
+            with self._lock:
+                if subscription in self._subscribers:
+                    self._subscribers.remove(subscription)
+        return unsubscribe
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for event_types, callback in subscribers:
+            if isinstance(event, event_types):
+                try:
+                    callback(event)
+                except Exception as e: # Un suscriptor con errores no debe deshacer la escritura ya confirmada
+                    print(f"Error en suscriptor de {type(event).__name__}: {e}")
+
+
+class ChangeEventLog:
+    """
+    Últimos eventos del bus con su número de secuencia. Los oyentes reciben (seq, evento) en el
+    hilo que publicó, en orden de seq y bajo el lock del registro: no deben bloquearse.
+    """
+    def __init__(self, max_size):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=max_size) # [(seq, evento)]
+        self._last_seq = 0
+        self._listeners = []
+
+    @property
+    def last_seq(self):
+        return self._last_seq
+
+    def append(self, event):
+        with self._lock:
+            self._last_seq += 1
+            self._entries.append((self._last_seq, event))
+            for listener in list(self._listeners):
+                try:
+                    listener(self._last_seq, event)
+                except Exception as e:
+                    print(f"Error en oyente del registro de eventos: {e}")
+
+    def subscribe_after(self, after_seq, listener):
+        """
+        Registra listener y, en la misma operación, devuelve los eventos ya guardados con seq >
+        after_seq, así no se pierde ni se repite ninguno entre el historial y los nuevos.
+        Devuelve (cancelar_suscripción, eventos o None, last_seq). Los eventos son None si after_seq
+        ya no está en el registro (se descartó o es de un arranque anterior): el cliente debe
+        recargar todo y seguir desde last_seq. Con after_seq None no se devuelve historial ([]).
+        """
+        with self._lock:
+            if after_seq is None:
+                backlog = []
+            elif after_seq > self._last_seq or (after_seq < self._last_seq and (
+                    not self._entries or self._entries[0][0] > after_seq + 1)):
+                backlog = None
+            else:
+                # Los seq guardados son consecutivos: el primero posterior está en esta posición.
+                backlog = list(islice(self._entries, after_seq + 1 - self._entries[0][0], None)) if self._entries else []
+            self._listeners.append(listener)
+            last_seq = self._last_seq
+
+        def unsubscribe():
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+        return unsubscribe, backlog, last_seq
+
+
+CHANGE_EVENT_LOG_SIZE = 10000
+
+_event_bus = ChangeEventBus()
+_event_log = ChangeEventLog(CHANGE_EVENT_LOG_SIZE)
+_event_bus.subscribe(_event_log.append)
+
+
+def get_change_event_bus():
+    """Bus único del proceso."""
+    return _event_bus
+
+
+def get_change_event_log():
+    """Registro numerado de los eventos del bus (ver ChangeEventLog)."""
+    return _event_log
+
+
+def publish_change(event):
+    _event_bus.publish(event)
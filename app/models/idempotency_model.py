@@ -0,0 +1,199 @@
+# app/models/idempotency_model.py
+"""
+Claves de idempotencia para registrar ventas (cabecera Idempotency-Key de POST /sales/).
+
+Un cliente que reintenta tras un timeout reenvía la misma clave: si la venta ya se registró, se
+devuelve el mismo resultado sin tocar sales, sale_items ni el stock. La clave se guarda en
+idempotency_keys dentro de la misma transacción que la venta (no puede quedar una sin la otra),
+y se vuelve a buscar dentro de esa transacción, así dos reintentos simultáneos no registran dos
+ventas. Antes de encolar la venta se consulta una caché LRU en memoria y luego la tabla, para
+que un reintento no espere al escritor.
+
+Las claves vencen a las IDEMPOTENCY_KEY_TTL_SECONDS; IdempotencyCleanupWorker las borra en
+segundo plano.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from database.db_connection import get_connection, get_db_path
+
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_CACHE_SIZE = 4096
+IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS = 10 * 60
+IDEMPOTENCY_CLEANUP_BATCH_SIZE = 1000 # Filas por DELETE: no retener el bloqueo de escritura mucho tiempo
+
+
+class IdempotencyKeyReusedError(Exception):
+    """La clave ya se usó con una petición distinta; no se guardó nada."""
+    def __init__(self, idempotency_key):
+        self.idempotency_key = idempotency_key
+        super().__init__(f"La clave de idempotencia '{idempotency_key}' ya se usó con otra petición.")
+
+
+class IdempotencyCache:
+    """
+    LRU de (base de datos, clave) -> (request_hash, respuesta, expires_at), compartida entre hilos.
+    Las respuestas son dicts que no se modifican después de guardarlos.
+    """
+    def __init__(self, max_size=IDEMPOTENCY_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_size = max_size
+
+    def get(self, idempotency_key):
+        cache_key = (get_db_path(), idempotency_key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry
+
+    def put(self, idempotency_key, request_hash, response, expires_at):
+        cache_key = (get_db_path(), idempotency_key)
+        with self._lock:
+            self._entries[cache_key] = (request_hash, response, expires_at)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = IdempotencyCache()
+
+
+def _checked_response(idempotency_key, request_hash, stored_hash, response):
+    if stored_hash != request_hash:
+        raise IdempotencyKeyReusedError(idempotency_key)
+    return response
+
+
+class IdempotencyKeyModel:
+    @staticmethod
+    def get_stored_response(idempotency_key, request_hash):
+        """
+        Respuesta guardada para la clave (dict), o None si no existe, venció o la consulta falla.
+        Lanza IdempotencyKeyReusedError si la clave se guardó con otro request_hash.
+        """
+        entry = _cache.get(idempotency_key)
+        if entry is not None:
+            return _checked_response(idempotency_key, request_hash, entry[0], entry[1])
+        try:
+            with get_connection() as conn:
+                row = conn.execute(
+                    "SELECT request_hash, response, expires_at FROM idempotency_keys "
+                    "WHERE idempotency_key = ? AND expires_at > ?",
+                    (idempotency_key, int(time.time()))
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error al leer la clave de idempotencia: {e}")
+            return None
+        if row is None:
+            return None
+        response = json.loads(row['response'])
+        _cache.put(idempotency_key, row['request_hash'], response, row['expires_at'])
+        return _checked_response(idempotency_key, request_hash, row['request_hash'], response)
+
+    @staticmethod
+    def find_response(cursor, idempotency_key, request_hash):
+        """
+        Igual que get_stored_response, pero con la transacción de escritura del llamador (donde
+        ningún otro escritor puede guardar la clave a la vez) y sin caché. Lanza sqlite3.Error.
+        """
+        row = cursor.execute(
+            "SELECT request_hash, response FROM idempotency_keys WHERE idempotency_key = ? AND expires_at > ?",
+            (idempotency_key, int(time.time()))
+        ).fetchone()
+        if row is None:
+            return None
+        return _checked_response(idempotency_key, request_hash, row[0], json.loads(row[1]))
+
+    @staticmethod
+    def save_response(cursor, idempotency_key, request_hash, response, ttl_seconds=IDEMPOTENCY_KEY_TTL_SECONDS):
+        """
+        Guarda la respuesta con la transacción del llamador (reemplaza una clave vencida aún no
+        borrada). La caché se llena después del commit, con remember. Devuelve expires_at.
+        """
+        expires_at = int(time.time()) + ttl_seconds
+        cursor.execute(
+            "INSERT OR REPLACE INTO idempotency_keys (idempotency_key, request_hash, response, expires_at) "
+            "VALUES (?, ?, ?, ?)",
+            (idempotency_key, request_hash, json.dumps(response), expires_at)
+        )
+        return expires_at
+
+    @staticmethod
+    def remember(idempotency_key, request_hash, response, expires_at):
+        _cache.put(idempotency_key, request_hash, response, expires_at)
+
+    @staticmethod
+    def clear_all(cursor):
+        """Borra todas las claves con la transacción del llamador (p. ej. al borrar el historial)."""
+        cursor.execute("DELETE FROM idempotency_keys")
+        _cache.clear()
+
+    @staticmethod
+    def delete_expired(batch_size=IDEMPOTENCY_CLEANUP_BATCH_SIZE):
+        """Borra las claves vencidas, por lotes de batch_size. Devuelve cuántas borró, o None si falla."""
+        deleted = 0
+        try:
+            with get_connection() as conn:
+                while True:
+                    cursor = conn.execute(
+                        """DELETE FROM idempotency_keys WHERE idempotency_key IN (
+                               SELECT idempotency_key FROM idempotency_keys WHERE expires_at <= ? LIMIT ?
+                           )""",
+                        (int(time.time()), batch_size)
+                    )
+                    conn.commit()
+                    deleted += cursor.rowcount
+                    if cursor.rowcount < batch_size:
+                        return deleted
+        except sqlite3.Error as e:
+            print(f"Error al borrar claves de idempotencia vencidas: {e}")
+            return None
+
+
+class IdempotencyCleanupWorker(threading.Thread):
+    """Hilo en segundo plano que borra las claves vencidas cada `interval` segundos."""
+    def __init__(self, interval=IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS):
+        super().__init__(name="IdempotencyCleanupThread", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            IdempotencyKeyModel.delete_expired()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_cleanup_worker = None
+
+
+def start_idempotency_cleanup_worker(interval=IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS):
+    """Inicia la limpieza periódica de claves vencidas (una sola vez). Devuelve el hilo."""
+    global _cleanup_worker
+    if _cleanup_worker is not None and _cleanup_worker.is_alive():
+        return _cleanup_worker
+    _cleanup_worker = IdempotencyCleanupWorker(interval)
+    _cleanup_worker.start()
+    return _cleanup_worker
+
+
+def stop_idempotency_cleanup_worker(timeout=5.0):
+    global _cleanup_worker
+    worker, _cleanup_worker = _cleanup_worker, None
+    if worker is not None:
+        worker.stop()
+        worker.join(timeout)
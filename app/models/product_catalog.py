@@ -0,0 +1,311 @@
+# app/models/product_catalog.py
+"""
+Catálogo de productos en memoria, compartido por la interfaz y la API del mismo proceso.
+
+Se carga una sola vez desde la tabla products y guarda cada columna en un arreglo compacto
+(una posición por producto), con índices por id y por nombre en minúsculas (varios productos
+pueden compartirlo si sus nombres solo difieren en mayúsculas). ProductModel y
+SaleModel le avisan después de cada escritura confirmada para que actualice solo las filas
+tocadas; las lecturas (búsqueda por id o nombre, prefijo, stock bajo) no consultan SQLite.
+
+El conjunto de productos con stock bajo (activos con stock <= su punto de reorden) se mantiene
+al guardar cada fila, así la alerta se arma en O(alertas); low_stock_version solo cambia cuando
+ese conjunto cambia, para que las vistas no redibujen el aviso en vano.
+"""
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left, insort
+
+from database.db_connection import get_connection, get_db_path
+
+_PRODUCT_COLUMNS = "id, name, quantity_available, sale_price, purchase_price, is_active, reorder_point, reorder_qty"
+# Mayor que cualquier carácter: cota superior de un rango de prefijo en la lista ordenada.
+_PREFIX_UPPER_BOUND_CHAR = "\U0010ffff"
+
+
+class ProductCatalog:
+    def __init__(self):
+        # RLock: la API (otro hilo) y el escritor de group commit también lo usan.
+        self._lock = threading.RLock()
+        self._loaded_db_path = None
+        self.version = 0 # Aumenta con cada cambio; las vistas lo comparan para no redibujar en vano
+        self.low_stock_version = 0 # Aumenta solo cuando cambia el conjunto de productos con stock bajo
+        self._low_stock_ids = set()
+        self._reset_storage()
+
+    def _reset_storage(self):
+        self._ids = array('q')
+        self._names = []
+        self._quantities = array('q')
+        self._sale_prices = array('d')
+        self._purchase_prices = array('d')
+        self._active_flags = bytearray()
+        self._reorder_points = array('q')
+        self._reorder_quantities = array('q')
+        self._slot_by_id = {}
+        self._slots_by_name = {}   # nombre en minúsculas -> [posiciones] (nombres que solo difieren en mayúsculas)
+        self._sorted_name_keys = [] # [(nombre en minúsculas, id)] ordenada, para búsquedas por prefijo
+
+    # --- Carga y actualizaciones ---
+
+    def ensure_loaded(self):
+        """Carga el catálogo si aún no está cargado (o si cambió la base de datos configurada)."""
+        db_path = get_db_path()
+        if self._loaded_db_path == db_path:
+            return True
+        with self._lock:
+            if self._loaded_db_path == db_path:
+                return True
+            return self.reload()
+
+    def reload(self):
+        """Vuelve a leer toda la tabla products. Devuelve False si la consulta falla."""
+        with self._lock:
+            try:
+                with get_connection() as conn:
+                    rows = conn.execute(f"SELECT {_PRODUCT_COLUMNS} FROM products").fetchall()
+            except sqlite3.Error as e:
+                print(f"Error loading product catalog: {e}")
+                return False
+            previous_low_stock_ids = self._low_stock_ids
+            self._low_stock_ids = set()
+            self._reset_storage()
+            for row in rows:
+                self._store_row(row)
+            self._sorted_name_keys.sort()
+            self._loaded_db_path = get_db_path()
+            self.version += 1
+            if self._low_stock_ids != previous_low_stock_ids:
+                self.low_stock_version += 1
+            return True
+
+    def invalidate(self):
+        """
+        Descarta el contenido; la próxima lectura recarga la tabla completa. El conjunto de stock
+        bajo se conserva hasta esa recarga para compararlo con el nuevo.
+        """
+        with self._lock:
+            self._reset_storage()
+            self._loaded_db_path = None
+            self.version += 1
+
+    def refresh_products(self, product_ids):
+        """
+        Relee de la base solo los productos indicados (tras una escritura ya confirmada).
+        La lectura y la actualización se hacen bajo el mismo lock, así dos escritores
+        concurrentes no pueden dejar en memoria una versión más vieja que la de la base.
+        """
+        unique_ids = list(dict.fromkeys(int(product_id) for product_id in product_ids))
+        if not unique_ids:
+            return
+        with self._lock:
+            if self._loaded_db_path is None:
+                return # Sin cargar: la primera lectura traerá los datos actuales
+            try:
+                with get_connection() as conn:
+                    rows = []
+                    for start in range(0, len(unique_ids), 500):
+                        chunk = unique_ids[start:start + 500]
+                        placeholders = ", ".join("?" for _ in chunk)
+                        rows.extend(conn.execute(
+                            f"SELECT {_PRODUCT_COLUMNS} FROM products WHERE id IN ({placeholders})", chunk
+                        ).fetchall())
+            except sqlite3.Error as e:
+                print(f"Error refreshing product catalog: {e}")
+                self.invalidate()
+                return
+            low_stock_changed = False
+            for row in rows:
+                low_stock_changed |= self._store_row(row, keep_sorted=True)
+            self.version += 1
+            if low_stock_changed:
+                self.low_stock_version += 1
+
+    def _store_row(self, row, keep_sorted=False):
+        """Guarda o actualiza la fila. Devuelve True si cambió lo que muestra la alerta de stock bajo."""
+        product_id = row['id']
+        name = row['name']
+        name_key = name.lower()
+        slot = self._slot_by_id.get(product_id)
+        was_low_stock = product_id in self._low_stock_ids
+        is_low_stock = bool(row['is_active']) and row['quantity_available'] <= row['reorder_point']
+        if is_low_stock:
+            self._low_stock_ids.add(product_id)
+        else:
+            self._low_stock_ids.discard(product_id)
+        low_stock_changed = was_low_stock != is_low_stock
+        if slot is None:
+            slot = len(self._ids)
+            self._ids.append(product_id)
+            self._names.append(name)
+            self._quantities.append(row['quantity_available'])
+            self._sale_prices.append(row['sale_price'])
+            self._purchase_prices.append(row['purchase_price'])
+            self._active_flags.append(1 if row['is_active'] else 0)
+            self._reorder_points.append(row['reorder_point'])
+            self._reorder_quantities.append(row['reorder_qty'])
+            self._slot_by_id[product_id] = slot
+        else:
+            old_key = self._names[slot].lower()
+            # La alerta muestra el nombre y la cantidad a pedir de cada producto.
+            low_stock_changed |= is_low_stock and (
+                self._names[slot] != name or self._reorder_quantities[slot] != row['reorder_qty']
+            )
+            if old_key != name_key:
+                old_slots = self._slots_by_name.get(old_key)
+                if old_slots is not None and slot in old_slots:
+                    old_slots.remove(slot)
+                    if not old_slots:
+                        del self._slots_by_name[old_key]
+                position = bisect_left(self._sorted_name_keys, (old_key, product_id))
+                if position < len(self._sorted_name_keys) and self._sorted_name_keys[position] == (old_key, product_id):
+                    del self._sorted_name_keys[position]
+            self._names[slot] = name
+            self._quantities[slot] = row['quantity_available']
+            self._sale_prices[slot] = row['sale_price']
+            self._purchase_prices[slot] = row['purchase_price']
+            self._active_flags[slot] = 1 if row['is_active'] else 0
+            self._reorder_points[slot] = row['reorder_point']
+            self._reorder_quantities[slot] = row['reorder_qty']
+            if old_key == name_key:
+                return low_stock_changed
+        self._slots_by_name.setdefault(name_key, []).append(slot)
+        if keep_sorted:
+            insort(self._sorted_name_keys, (name_key, product_id))
+        else:
+            self._sorted_name_keys.append((name_key, product_id))
+        return low_stock_changed
+
+    # --- Lecturas (sin SQLite) ---
+
+    def _product_at(self, slot):
+        return {
+            'id': self._ids[slot],
+            'name': self._names[slot],
+            'quantity_available': self._quantities[slot],
+            'sale_price': self._sale_prices[slot],
+            'purchase_price': self._purchase_prices[slot],
+            'is_active': self._active_flags[slot],
+            'reorder_point': self._reorder_points[slot],
+            'reorder_qty': self._reorder_quantities[slot],
+        }
+
+    def get_by_id(self, product_id):
+        self.ensure_loaded()
+        with self._lock:
+            slot = self._slot_by_id.get(product_id)
+            return self._product_at(slot) if slot is not None else None
+
+    def get_by_name(self, name, active_only=False):
+        """
+        Búsqueda exacta por nombre, sin distinguir mayúsculas. Si varios productos coinciden
+        (nombres que solo difieren en mayúsculas), se prefiere el escrito igual que `name`.
+        """
+        self.ensure_loaded()
+        name = name.strip()
+        with self._lock:
+            slots = [
+                slot for slot in self._slots_by_name.get(name.lower(), ())
+                if not active_only or self._active_flags[slot]
+            ]
+            if not slots:
+                return None
+            slot = next((slot for slot in slots if self._names[slot] == name), slots[0])
+            return self._product_at(slot)
+
+    def get_all(self, active_only=False):
+        """Todos los productos ordenados por nombre."""
+        return self.search_prefix("", active_only=active_only)
+
+    def search_prefix(self, prefix, active_only=False, limit=None):
+        """Productos cuyo nombre empieza por `prefix` (sin distinguir mayúsculas), ordenados por nombre."""
+        self.ensure_loaded()
+        prefix_key = prefix.strip().lower()
+        results = []
+        with self._lock:
+            start = bisect_left(self._sorted_name_keys, (prefix_key,))
+            end = bisect_left(self._sorted_name_keys, (prefix_key + _PREFIX_UPPER_BOUND_CHAR,), start)
+            for name_key, product_id in self._sorted_name_keys[start:end]:
+                slot = self._slot_by_id[product_id]
+                if active_only and not self._active_flags[slot]:
+                    continue
+                results.append(self._product_at(slot))
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    def search_contains(self, term, active_only=False):
+        """Productos cuyo nombre contiene `term` (como el LIKE '%term%' de ProductModel), ordenados por nombre."""
+        self.ensure_loaded()
+        term_key = term.strip().lower()
+        with self._lock:
+            return [
+                self._product_at(self._slot_by_id[product_id])
+                for name_key, product_id in self._sorted_name_keys
+                if term_key in name_key and (not active_only or self._active_flags[self._slot_by_id[product_id]])
+            ]
+
+    def get_low_stock(self, threshold=None):
+        """
+        Productos activos con stock bajo, ordenados por cantidad y nombre. Sin threshold, los que
+        están en o bajo su punto de reorden (del conjunto mantenido, O(alertas)); con threshold,
+        recorre todo el catálogo con ese umbral común.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            if threshold is None:
+                slots = [self._slot_by_id[product_id] for product_id in self._low_stock_ids]
+            else:
+                slots = [
+                    slot for slot, quantity in enumerate(self._quantities)
+                    if quantity <= threshold and self._active_flags[slot]
+                ]
+            slots.sort(key=lambda slot: (self._quantities[slot], self._names[slot]))
+            return [self._product_at(slot) for slot in slots]
+
+    def get_low_stock_alerts(self):
+        """(low_stock_version, productos con stock bajo según su punto de reorden), leídos juntos."""
+        self.ensure_loaded()
+        with self._lock:
+            return self.low_stock_version, self.get_low_stock()
+
+    def get_columns(self, active_only=False):
+        """
+        Copia de los productos en columnas {campo: lista}, ordenadas por nombre, sin crear un
+        diccionario por producto (para las tablas de las vistas con catálogos grandes).
+        """
+        self.ensure_loaded()
+        with self._lock:
+            slots = [self._slot_by_id[product_id] for _, product_id in self._sorted_name_keys]
+            if active_only:
+                slots = [slot for slot in slots if self._active_flags[slot]]
+            return {
+                'id': [self._ids[slot] for slot in slots],
+                'name': [self._names[slot] for slot in slots],
+                'quantity_available': [self._quantities[slot] for slot in slots],
+                'sale_price': [self._sale_prices[slot] for slot in slots],
+                'purchase_price': [self._purchase_prices[slot] for slot in slots],
+                'is_active': [self._active_flags[slot] for slot in slots],
+            }
+
+    def get_all_names(self, active_only=False):
+        """Nombres ordenados, para los autocompletados."""
+        self.ensure_loaded()
+        with self._lock:
+            slots = (self._slot_by_id[product_id] for _, product_id in self._sorted_name_keys)
+            return [self._names[slot] for slot in slots if not active_only or self._active_flags[slot]]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_product_catalog():
+    """Catálogo único del proceso (se crea en el primer uso y se carga en la primera lectura)."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ProductCatalog()
+    return _catalog
@@ -1,209 +1,703 @@
 # app/models/product_model.py
 import sqlite3 # Importar para sqlite3.Error
-from database.db_connection import create_connection
+import base64
+import json
+from database.db_connection import get_connection, transaction, fold_search_text
+from database.stock_ledger import (
+    MOVEMENT_INITIAL, MOVEMENT_SALE, MOVEMENT_ADJUSTMENT, MOVEMENT_RESTOCK, MOVEMENT_RETURN,
+    RECORD_SET_QUANTITY_BY_ID_SQL, RECORD_SET_QUANTITY_BY_NAME_SQL, RECORD_STOCK_MOVEMENT_SQL, record_set_quantity, find_stock_drift
+)
+from app.models.product_catalog import get_product_catalog
+from app.models.change_events import ProductsUpserted, StockChanged, publish_change
+
+# Mayor que cualquier carácter: cota superior para búsquedas por prefijo con rangos de índice.
+_PREFIX_UPPER_BOUND_CHAR = "\U0010ffff"
+
+DEFAULT_SEARCH_LIMIT = 50
+# Punto de reorden de un producto nuevo (el umbral fijo de stock bajo que usaban las vistas).
+DEFAULT_REORDER_POINT = 5
+# Búsqueda aproximada: candidatos que se piden al índice y fracción mínima de trigramas del término
+# que debe aparecer en el nombre para aceptarlos.
+FUZZY_CANDIDATE_LIMIT = 200
+FUZZY_MIN_SIMILARITY = 0.5
+
+# Alta masiva: inserta por nombre o, si el nombre ya existe, actualiza stock y precios.
+# El estado (is_active) de un producto existente no cambia.
+# Todas las filas de una importación comparten la row_version reservada al empezar (ver
+# migración 11): el trigger de versión no tiene que actualizar cada fila otra vez.
+_BULK_UPSERT_PRODUCT_SQL = """
+    INSERT INTO products (name, quantity_available, sale_price, purchase_price, row_version)
+    VALUES (?, ?, ?, ?, (SELECT last_row_version FROM sync_state WHERE id = 1))
+    ON CONFLICT(name) DO UPDATE SET
+        quantity_available = excluded.quantity_available,
+        sale_price = excluded.sale_price,
+        purchase_price = excluded.purchase_price,
+        row_version = excluded.row_version
+"""
+BULK_WRITE_BATCH_SIZE = 5000
+
+_PRODUCT_FIELDS = ("id", "name", "quantity_available", "sale_price", "purchase_price", "is_active", "reorder_point", "reorder_qty")
+_SEARCH_RESULT_COLUMNS = ", ".join(f"p.{field}" for field in _PRODUCT_FIELDS)
+
+
+# Operaciones masivas por filtro: columnas de precio que se pueden ajustar y modos de stock.
+BULK_PRICE_FIELDS = ("sale_price", "purchase_price")
+STOCK_MODE_SET = "set"       # Conteo físico: la cantidad pasa a ser la contada
+STOCK_MODE_ADJUST = "adjust" # Suma (o resta) la cantidad indicada
+STOCK_MODES = (STOCK_MODE_SET, STOCK_MODE_ADJUST)
+# Tipos de movimiento que se pueden registrar a mano (las ventas y altas los registran solas).
+MANUAL_MOVEMENT_TYPES = (MOVEMENT_RESTOCK, MOVEMENT_ADJUSTMENT, MOVEMENT_RETURN)
+
+
+class _BulkWriteCancelled(Exception):
+    """Cancelación pedida a mitad de una escritura masiva; deshace la transacción."""
+
+
+def _bulk_filter_clauses(product_ids=None, name_prefix=None, is_active=None, min_price=None, max_price=None):
+    """
+    Condiciones WHERE (con sus parámetros) que seleccionan los productos de una operación masiva.
+    Con product_ids se genera una cláusula por cada bloque de 500 ids (límite de variables de
+    SQLite); sin ids, una sola cláusula. Sin ningún filtro se seleccionan todos los productos.
+    """
+    conditions = []
+    params = []
+    if name_prefix:
+        conditions.append("name COLLATE NOCASE >= ? AND name COLLATE NOCASE < ?")
+        params.extend([name_prefix, name_prefix + _PREFIX_UPPER_BOUND_CHAR])
+    if is_active is not None:
+        conditions.append("is_active = ?")
+        params.append(1 if is_active else 0)
+    if min_price is not None:
+        conditions.append("sale_price >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        conditions.append("sale_price <= ?")
+        params.append(max_price)
+    if product_ids is None:
+        yield " AND ".join(conditions) or "1", params
+        return
+    unique_ids = list(dict.fromkeys(int(product_id) for product_id in product_ids))
+    for start in range(0, len(unique_ids), 500):
+        chunk = unique_ids[start:start + 500]
+        id_condition = f"id IN ({', '.join('?' for _ in chunk)})"
+        yield " AND ".join(conditions + [id_condition]), params + chunk
+
+
+def _product_dict(row):
+    return {field: row[field] for field in _PRODUCT_FIELDS}
+
+def _quote_fts_string(text):
+    return '"' + text.replace('"', '""') + '"'
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _fuzzy_word_expression(word):
+    """
+    Expresión MATCH que acepta la palabra con un error de tipeo: un error solo rompe los trigramas
+    que lo rodean, así que al menos una de las dos mitades de la palabra aparece intacta.
+    Las palabras cortas (sin dos mitades de 3 letras) aceptan cualquiera de sus trigramas.
+    """
+    if len(word) >= 6:
+        middle = len(word) // 2
+        parts = (word[:middle], word[middle:])
+    else:
+        parts = sorted(_trigrams(word))
+    return "(" + " OR ".join(_quote_fts_string(part) for part in parts) + ")"
+
 
 class ProductModel:
     @staticmethod
-    def add_product(name, quantity_available, sale_price, purchase_price):
-        conn = create_connection()
-        if conn:
-            try:
+    def add_product(name, quantity_available, sale_price, purchase_price, reorder_point=DEFAULT_REORDER_POINT, reorder_qty=0):
+        try:
+            with get_connection() as conn, transaction(conn):
                 cursor = conn.cursor()
                 cursor.execute(
-                    "INSERT INTO products (name, quantity_available, sale_price, purchase_price) VALUES (?, ?, ?, ?)",
-                    (name, quantity_available, sale_price, purchase_price)
+                    """INSERT INTO products (name, quantity_available, sale_price, purchase_price, reorder_point, reorder_qty)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (name, quantity_available, sale_price, purchase_price, reorder_point, reorder_qty)
                 )
-                conn.commit()
-                return cursor.lastrowid
-            except sqlite3.Error as e:
-                print(f"Error adding product: {e}")
-                return None
-            finally:
-                conn.close()
-        return None
+                if quantity_available:
+                    conn.execute(RECORD_STOCK_MOVEMENT_SQL, (cursor.lastrowid, MOVEMENT_INITIAL, quantity_available, None, None))
+            get_product_catalog().refresh_products([cursor.lastrowid])
+            publish_change(ProductsUpserted((cursor.lastrowid,)))
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            print(f"Error adding product: {e}")
+            return None
+
+    @staticmethod
+    def bulk_upsert_products(product_rows, batch_size=BULK_WRITE_BATCH_SIZE, progress_callback=None, should_cancel=None):
+        """
+        Inserta o actualiza (por nombre) muchos productos en UNA transacción, con executemany por
+        lotes. product_rows: lista de tuplas (name, quantity_available, sale_price, purchase_price)
+        ya validadas; si un nombre se repite vale la última fila. Los cambios de stock quedan en
+        stock_movements ('initial' para los nuevos, 'adjustment' para los existentes).
+        progress_callback(escritas, total) se llama tras cada lote; si should_cancel() devuelve
+        True antes de cada lote o justo antes del commit se deshace todo.
+        Devuelve (insertados, actualizados), o None si falla o se cancela (la tabla queda como estaba).
+        """
+        product_rows = list({row[0]: row for row in product_rows}.values())
+        total_rows = len(product_rows)
+        try:
+            with get_connection() as conn, transaction(conn):
+                # Los ids nuevos son mayores que el máximo actual (AUTOINCREMENT): así se cuentan
+                # los insertados sin consultar nombre por nombre.
+                max_id_before = conn.execute("SELECT COALESCE(MAX(id), 0) FROM products").fetchone()[0]
+                # Indexar fila por fila desde el trigger de products_fts es varias veces más lento que
+                # un solo INSERT ... SELECT al final. El trigger se quita y se vuelve a crear con su
+                # mismo SQL dentro de esta transacción, así ninguna otra conexión lo ve ausente.
+                fts_insert_trigger = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_products_fts_insert'"
+                ).fetchone()
+                if fts_insert_trigger is not None:
+                    conn.execute("DROP TRIGGER trg_products_fts_insert")
+                conn.execute("UPDATE sync_state SET last_row_version = last_row_version + 1 WHERE id = 1")
+                for start in range(0, total_rows, batch_size):
+                    if should_cancel is not None and should_cancel():
+                        raise _BulkWriteCancelled()
+                    batch = product_rows[start:start + batch_size]
+                    # Diferencia de stock de los que ya existen, leída antes de pisar el saldo.
+                    conn.executemany(RECORD_SET_QUANTITY_BY_NAME_SQL, [
+                        (MOVEMENT_ADJUSTMENT, quantity, "Importación masiva", name, quantity)
+                        for name, quantity, _, _ in batch
+                    ])
+                    conn.executemany(_BULK_UPSERT_PRODUCT_SQL, batch)
+                    if progress_callback is not None:
+                        progress_callback(min(start + batch_size, total_rows), total_rows)
+                if fts_insert_trigger is not None:
+                    conn.execute(
+                        "INSERT INTO products_fts (rowid, name_folded) SELECT id, fold_search_text(name) FROM products WHERE id > ?",
+                        (max_id_before,)
+                    )
+                    conn.execute(fts_insert_trigger['sql'])
+                conn.execute(
+                    """INSERT INTO stock_movements (product_id, movement_type, quantity_change, note)
+                       SELECT id, ?, quantity_available, 'Importación masiva' FROM products
+                       WHERE id > ? AND quantity_available <> 0""",
+                    (MOVEMENT_INITIAL, max_id_before)
+                )
+                inserted = conn.execute("SELECT COUNT(*) FROM products WHERE id > ?", (max_id_before,)).fetchone()[0]
+                # Una cancelación durante el último lote también se deshace.
+                if should_cancel is not None and should_cancel():
+                    raise _BulkWriteCancelled()
+        except _BulkWriteCancelled:
+            print("Bulk product upsert cancelled; nothing was written.")
+            return None
+        except sqlite3.Error as e:
+            print(f"Error bulk upserting products: {e}")
+            return None
+        # Una sola invalidación: la próxima lectura recarga el catálogo completo de una vez.
+        get_product_catalog().invalidate()
+        publish_change(ProductsUpserted(None))
+        return inserted, total_rows - inserted
 
     @staticmethod
     def get_all_products_for_management():
         """Obtener TODOS los productos (activos e inactivos) para la vista de gestión."""
-        conn = create_connection()
-        if conn:
-            try:
+        try:
+            with get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    "SELECT id, name, quantity_available, sale_price, purchase_price, is_active FROM products ORDER BY name ASC"
+                    "SELECT id, name, quantity_available, sale_price, purchase_price, is_active, reorder_point, reorder_qty FROM products ORDER BY name ASC"
                 )
                 return cursor.fetchall()
-            except sqlite3.Error as e:
-                print(f"Error fetching all products for management: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
+        except sqlite3.Error as e:
+            print(f"Error fetching all products for management: {e}")
+            return []
 
     @staticmethod
     def get_active_products_for_sale():
         """Obtener solo los productos activos (para ventas, etc.)."""
-        conn = create_connection()
-        if conn:
-            try:
+        try:
+            with get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    "SELECT id, name, quantity_available, sale_price, purchase_price, is_active FROM products WHERE is_active = 1 ORDER BY name ASC"
+                    "SELECT id, name, quantity_available, sale_price, purchase_price, is_active, reorder_point, reorder_qty FROM products WHERE is_active = 1 ORDER BY name ASC"
                 )
                 return cursor.fetchall()
-            except sqlite3.Error as e:
-                print(f"Error fetching active products: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
+        except sqlite3.Error as e:
+            print(f"Error fetching active products: {e}")
+            return []
 
     @staticmethod
     def search_products_for_management(search_term):
         """Buscar TODOS los productos (activos e inactivos) por nombre para la vista de gestión."""
-        conn = create_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT id, name, quantity_available, sale_price, purchase_price, is_active FROM products WHERE name LIKE ? ORDER BY name ASC",
-                    (f"%{search_term}%",)
-                )
-                return cursor.fetchall()
-            except sqlite3.Error as e:
-                print(f"Error searching products for management: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
+        return ProductModel.search_products_ranked(search_term, active_only=False, limit=None)
 
     @staticmethod
     def search_active_products_for_sale(search_term):
         """Buscar solo productos ACTIVOS por nombre (para ventas, etc.)."""
-        conn = create_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT id, name, quantity_available, sale_price, purchase_price, is_active FROM products WHERE name LIKE ? AND is_active = 1 ORDER BY name ASC",
-                    (f"%{search_term}%",)
-                )
-                return cursor.fetchall()
-            except sqlite3.Error as e:
-                print(f"Error searching active products: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
+        return ProductModel.search_products_ranked(search_term, active_only=True, limit=None)
+
+    @staticmethod
+    def search_products_ranked(search_term, active_only=False, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        Búsqueda por nombre sin distinguir mayúsculas ni tildes, ordenada por relevancia.
+        Primero los nombres que contienen todas las palabras del término (los que empiezan por él
+        y los más cortos antes); si faltan resultados, se completan con coincidencias aproximadas
+        por trigramas, que toleran errores de tipeo ("tornilo" encuentra "Tornillo").
+        Usa el índice products_fts; sin él (SQLite sin FTS5 trigram) recorre la tabla.
+        Devuelve una lista de diccionarios de producto ([] si no hay término o hay error).
+        """
+        words = fold_search_text(search_term or "").split()
+        if not words:
+            return []
+        indexed_words = [word for word in words if len(word) >= 3] # El trigram no indexa términos más cortos
+        try:
+            with get_connection() as conn:
+                use_fts = bool(indexed_words) and ProductModel._products_fts_available(conn)
+                results = ProductModel._search_substring_matches(conn, words, indexed_words if use_fts else [], active_only, limit)
+                if use_fts and (limit is None or len(results) < limit):
+                    seen_ids = {product['id'] for product in results}
+                    remaining = None if limit is None else limit - len(results)
+                    results.extend(ProductModel._search_fuzzy_matches(conn, indexed_words, seen_ids, active_only, remaining))
+                return results
+        except sqlite3.Error as e:
+            print(f"Error searching products: {e}")
+            return []
+
+    @staticmethod
+    def _products_fts_available(conn):
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+        ).fetchone() is not None
+
+    @staticmethod
+    def _search_substring_matches(conn, words, indexed_words, active_only, limit):
+        conditions = [f"instr({'f.name_folded' if indexed_words else 'fold_search_text(p.name)'}, ?) > 0" for _ in words]
+        params = list(words)
+        if indexed_words:
+            # Cada palabra entre comillas es una frase de trigramas: equivale a "contiene la palabra".
+            source = "products_fts f JOIN products p ON p.id = f.rowid"
+            conditions.insert(0, "products_fts MATCH ?")
+            params.insert(0, " AND ".join(_quote_fts_string(word) for word in indexed_words))
+            folded_column = "f.name_folded"
+        else:
+            source = "products p"
+            folded_column = "fold_search_text(p.name)"
+        if active_only:
+            conditions.append("p.is_active = 1")
+        query = (
+            f"SELECT {_SEARCH_RESULT_COLUMNS} FROM {source} WHERE {' AND '.join(conditions)} "
+            f"ORDER BY instr({folded_column}, ?) = 1 DESC, length(p.name) ASC, p.name ASC LIMIT ?"
+        )
+        params.extend([words[0], -1 if limit is None else limit])
+        return [_product_dict(row) for row in conn.execute(query, params)]
+
+    @staticmethod
+    def _search_fuzzy_matches(conn, indexed_words, seen_ids, active_only, limit):
+        term_trigrams = set()
+        for word in indexed_words:
+            term_trigrams.update(_trigrams(word))
+        match_expression = " AND ".join(_fuzzy_word_expression(word) for word in indexed_words)
+        query = (
+            f"SELECT {_SEARCH_RESULT_COLUMNS}, f.name_folded FROM products_fts f JOIN products p ON p.id = f.rowid "
+            f"WHERE products_fts MATCH ?{' AND p.is_active = 1' if active_only else ''} ORDER BY rank LIMIT ?"
+        )
+        candidates = []
+        for row in conn.execute(query, (match_expression, FUZZY_CANDIDATE_LIMIT)):
+            if row['id'] in seen_ids:
+                continue
+            # Fracción de los trigramas del término presentes en el nombre (no penaliza nombres largos).
+            similarity = len(term_trigrams & _trigrams(row['name_folded'])) / len(term_trigrams)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                candidates.append((-similarity, len(row['name']), row['name'], _product_dict(row)))
+        candidates.sort(key=lambda candidate: candidate[:3])
+        if limit is not None:
+            candidates = candidates[:limit]
+        return [candidate[3] for candidate in candidates]
+
+    @staticmethod
+    def encode_page_cursor(name, product_id):
+        """Cursor opaco con la clave (nombre, id) de la última fila de una página."""
+        payload = json.dumps([name, product_id], ensure_ascii=False).encode("utf-8")
+        return base64.urlsafe_b64encode(payload).decode("ascii")
+
+    @staticmethod
+    def decode_page_cursor(page_cursor):
+        """Devuelve (nombre, id) de un cursor; lanza ValueError si no es válido."""
+        try:
+            name, product_id = json.loads(base64.urlsafe_b64decode(page_cursor.encode("ascii")))
+        except (ValueError, TypeError, UnicodeError) as e:
+            raise ValueError(f"Cursor de paginación inválido: {page_cursor!r}") from e
+        if not isinstance(name, str) or not isinstance(product_id, int):
+            raise ValueError(f"Cursor de paginación inválido: {page_cursor!r}")
+        return name, product_id
+
+    @staticmethod
+    def get_products_page(limit=100, page_cursor=None, include_inactive=False, name_prefix=None,
+                          min_price=None, max_price=None, min_stock=None, max_stock=None):
+        """
+        Página de productos ordenada por nombre (sin distinguir mayúsculas) e id, con paginación
+        por cursor: cada página continúa desde la clave de la anterior con un rango sobre el índice,
+        así el coste no crece con la profundidad como con OFFSET.
+        Devuelve (filas, next_cursor); next_cursor es None en la última página.
+        Lanza ValueError si el cursor no es válido; ante error de base de datos devuelve (None, None).
+        """
+        conditions = []
+        params = []
+        if not include_inactive:
+            conditions.append("is_active = 1")
+        if page_cursor:
+            last_name, last_id = ProductModel.decode_page_cursor(page_cursor)
+            # Equivale a (name, id) > (?, ?), escrito así para que SQLite lo use como rango del índice.
+            conditions.append("name COLLATE NOCASE >= ? AND (name COLLATE NOCASE > ? OR id > ?)")
+            params.extend([last_name, last_name, last_id])
+        if name_prefix:
+            # Rango en lugar de LIKE para que SQLite use el índice NOCASE.
+            conditions.append("name COLLATE NOCASE >= ? AND name COLLATE NOCASE < ?")
+            params.extend([name_prefix, name_prefix + _PREFIX_UPPER_BOUND_CHAR])
+        if min_price is not None:
+            conditions.append("sale_price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("sale_price <= ?")
+            params.append(max_price)
+        if min_stock is not None:
+            conditions.append("quantity_available >= ?")
+            params.append(min_stock)
+        if max_stock is not None:
+            conditions.append("quantity_available <= ?")
+            params.append(max_stock)
+
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (
+            "SELECT id, name, quantity_available, sale_price, purchase_price, is_active, reorder_point, reorder_qty FROM products "
+            f"{where_clause} ORDER BY name COLLATE NOCASE ASC, id ASC LIMIT ?"
+        )
+        # Se pide una fila de más para saber si hay otra página sin hacer un COUNT.
+        params.append(limit + 1)
+        try:
+            with get_connection() as conn:
+                rows = conn.execute(query, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error fetching products page: {e}")
+            return None, None
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = ProductModel.encode_page_cursor(rows[-1]['name'], rows[-1]['id'])
+        return rows, next_cursor
 
     @staticmethod
     def get_product_by_id(product_id):
-        conn = create_connection()
-        if conn:
-            try:
+        try:
+            with get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    "SELECT id, name, quantity_available, sale_price, purchase_price, is_active FROM products WHERE id = ?",
+                    "SELECT id, name, quantity_available, sale_price, purchase_price, is_active, reorder_point, reorder_qty FROM products WHERE id = ?",
                     (product_id,)
                 )
                 return cursor.fetchone()
-            except sqlite3.Error as e:
-                print(f"Error fetching product by ID: {e}")
-                return None
-            finally:
-                conn.close()
-        return None
-
-    @staticmethod
-    def update_product(product_id, name, quantity_available, sale_price, purchase_price):
-        conn = create_connection()
-        if conn:
-            try:
+        except sqlite3.Error as e:
+            print(f"Error fetching product by ID: {e}")
+            return None
+
+    @staticmethod
+    def get_products_by_ids(product_ids, conn=None):
+        """
+        Obtiene varios productos con una sola consulta WHERE id IN (...).
+        Devuelve un diccionario {product_id: fila}; los IDs inexistentes no aparecen.
+        Si se pasa `conn`, se consulta dentro de esa conexión (y de su transacción abierta).
+        """
+        unique_ids = list(dict.fromkeys(int(product_id) for product_id in product_ids))
+        if not unique_ids:
+            return {}
+        try:
+            if conn is not None:
+                return ProductModel._fetch_products_by_ids(conn, unique_ids)
+            with get_connection() as pooled_conn:
+                return ProductModel._fetch_products_by_ids(pooled_conn, unique_ids)
+        except sqlite3.Error as e:
+            print(f"Error fetching products by IDs: {e}")
+            if conn is not None:
+                raise # Dentro de una transacción del llamador, que decida él
+            return {}
+
+    @staticmethod
+    def _fetch_products_by_ids(conn, unique_ids, chunk_size=500):
+        products_by_id = {}
+        # Trozos por debajo del límite de parámetros de SQLite (999 en versiones antiguas)
+        for start in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[start:start + chunk_size]
+            placeholders = ", ".join("?" for _ in chunk)
+            for row in conn.execute(
+                f"SELECT id, name, quantity_available, sale_price, purchase_price, is_active, reorder_point, reorder_qty FROM products WHERE id IN ({placeholders})",
+                chunk
+            ):
+                products_by_id[row['id']] = row
+        return products_by_id
+
+    @staticmethod
+    def update_product(product_id, name, quantity_available, sale_price, purchase_price, reorder_point=None, reorder_qty=None):
+        """reorder_point / reorder_qty en None conservan el valor actual."""
+        try:
+            with get_connection() as conn, transaction(conn):
                 cursor = conn.cursor()
+                record_set_quantity(cursor, product_id, quantity_available, note="Edición del producto")
                 cursor.execute(
                     """UPDATE products
-                       SET name = ?, quantity_available = ?, sale_price = ?, purchase_price = ?
+                       SET name = ?, quantity_available = ?, sale_price = ?, purchase_price = ?,
+                           reorder_point = COALESCE(?, reorder_point), reorder_qty = COALESCE(?, reorder_qty)
                        WHERE id = ?""",
-                    (name, quantity_available, sale_price, purchase_price, product_id)
+                    (name, quantity_available, sale_price, purchase_price, reorder_point, reorder_qty, product_id)
                 )
-                conn.commit()
-                return cursor.rowcount > 0
-            except sqlite3.Error as e:
-                print(f"Error updating product: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
+            if cursor.rowcount > 0:
+                get_product_catalog().refresh_products([product_id])
+                publish_change(ProductsUpserted((product_id,)))
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error updating product: {e}")
+            return False
 
     @staticmethod
     def soft_delete_product(product_id):
-        conn = create_connection()
-        if conn:
-            try:
+        try:
+            with get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     "UPDATE products SET is_active = 0 WHERE id = ?", (product_id,)
                 )
                 conn.commit()
-                return cursor.rowcount > 0
-            except sqlite3.Error as e:
-                print(f"Error soft deleting product: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
+            if cursor.rowcount > 0:
+                get_product_catalog().refresh_products([product_id])
+                publish_change(ProductsUpserted((product_id,)))
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error soft deleting product: {e}")
+            return False
 
     @staticmethod
     def restore_product(product_id):
-        conn = create_connection()
-        if conn:
-            try:
+        try:
+            with get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     "UPDATE products SET is_active = 1 WHERE id = ?", (product_id,)
                 )
                 conn.commit()
-                return cursor.rowcount > 0
-            except sqlite3.Error as e:
-                print(f"Error restoring product: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
+            if cursor.rowcount > 0:
+                get_product_catalog().refresh_products([product_id])
+                publish_change(ProductsUpserted((product_id,)))
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error restoring product: {e}")
+            return False
 
     @staticmethod
     def update_stock(product_id, quantity_sold):
-        conn = create_connection()
-        if conn:
-            try:
+        try:
+            with get_connection() as conn, transaction(conn):
                 cursor = conn.cursor()
                 cursor.execute(
                     "UPDATE products SET quantity_available = quantity_available - ? WHERE id = ?",
                     (quantity_sold, product_id)
                 )
-                conn.commit()
-                return cursor.rowcount > 0
-            except sqlite3.Error as e:
-                print(f"Error updating stock: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
-
-    @staticmethod
-    def get_low_stock_products(threshold=0):
-        conn = create_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT id, name, quantity_available, is_active FROM products WHERE quantity_available <= ? AND is_active = 1 ORDER BY quantity_available ASC, name ASC",
-                    (threshold,)
+                if cursor.rowcount > 0:
+                    conn.execute(RECORD_STOCK_MOVEMENT_SQL, (product_id, MOVEMENT_SALE, -quantity_sold, None, None))
+            if cursor.rowcount > 0:
+                get_product_catalog().refresh_products([product_id])
+                publish_change(StockChanged((product_id,)))
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error updating stock: {e}")
+            return False
+
+    @staticmethod
+    def record_stock_movement(product_id, quantity_change, movement_type=MOVEMENT_RESTOCK, note=None):
+        """
+        Suma quantity_change al stock (reposición, devolución o ajuste) y lo registra en
+        stock_movements en la misma transacción. Devuelve False si el producto no existe, si el
+        stock quedaría negativo o ante error. Lanza ValueError si el tipo no es uno de MANUAL_MOVEMENT_TYPES.
+        """
+        if movement_type not in MANUAL_MOVEMENT_TYPES:
+            raise ValueError(f"Tipo de movimiento no válido: {movement_type!r}.")
+        try:
+            with get_connection() as conn, transaction(conn):
+                cursor = conn.execute(
+                    "UPDATE products SET quantity_available = quantity_available + ? WHERE id = ? AND quantity_available + ? >= 0",
+                    (quantity_change, product_id, quantity_change)
                 )
+                if cursor.rowcount > 0:
+                    conn.execute(RECORD_STOCK_MOVEMENT_SQL, (product_id, movement_type, quantity_change, None, note))
+            if cursor.rowcount > 0:
+                get_product_catalog().refresh_products([product_id])
+                publish_change(StockChanged((product_id,)))
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error recording stock movement: {e}")
+            return False
+
+    @staticmethod
+    def get_stock_movements(product_id, limit=100):
+        """Últimos movimientos de stock de un producto, del más reciente al más antiguo ([] si hay error)."""
+        try:
+            with get_connection() as conn:
+                return conn.execute(
+                    """SELECT id, product_id, movement_type, quantity_change, sale_id, note, created_at
+                       FROM stock_movements WHERE product_id = ? ORDER BY id DESC LIMIT ?""",
+                    (product_id, limit)
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error fetching stock movements: {e}")
+            return []
+
+    @staticmethod
+    def verify_stock_ledger():
+        """
+        Recalcula el saldo de todos los productos desde stock_movements (una consulta agrupada)
+        y devuelve los que no coinciden con quantity_available ([] si todo cuadra, None si falla).
+        """
+        with get_connection() as conn:
+            return find_stock_drift(conn)
+
+    @staticmethod
+    def bulk_adjust_prices(percent=None, amount=None, price_field="sale_price", product_ids=None,
+                           name_prefix=None, is_active=None, min_price=None, max_price=None):
+        """
+        Cambia el precio de todos los productos del filtro con un solo UPDATE por bloque, en una
+        transacción: percent (8 = +8 %, -10 = -10 %) o amount (suma fija), redondeado a 2 decimales.
+        Los filtros son los de _bulk_filter_clauses (min/max_price comparan el precio de venta actual).
+        Devuelve la cantidad de productos modificados, o None ante error de base de datos.
+        Lanza ValueError si los parámetros no son válidos o si algún precio quedaría fuera de rango
+        (venta <= 0, compra < 0); en ese caso no se modifica nada.
+        """
+        if price_field not in BULK_PRICE_FIELDS:
+            raise ValueError(f"Campo de precio no válido: {price_field!r}.")
+        if (percent is None) == (amount is None):
+            raise ValueError("Indique un porcentaje o un monto, no ambos.")
+        if percent is not None:
+            new_price_sql, change = f"ROUND({price_field} * (1 + ? / 100.0), 2)", percent
+        else:
+            new_price_sql, change = f"ROUND({price_field} + ?, 2)", amount
+        invalid_price_sql = f"{new_price_sql} <= 0" if price_field == "sale_price" else f"{new_price_sql} < 0"
+        clauses = list(_bulk_filter_clauses(product_ids, name_prefix, is_active, min_price, max_price))
+        updated = 0
+        try:
+            with get_connection() as conn, transaction(conn):
+                for where_clause, params in clauses:
+                    # Se verifica antes de actualizar: después, el filtro por precio ya no
+                    # seleccionaría las mismas filas.
+                    invalid = conn.execute(
+                        f"SELECT name FROM products WHERE {where_clause} AND {invalid_price_sql} LIMIT 1",
+                        params + [change]
+                    ).fetchone()
+                    if invalid is not None:
+                        raise ValueError(f"El precio de '{invalid['name']}' quedaría en cero o negativo.")
+                    cursor = conn.execute(
+                        f"UPDATE products SET {price_field} = {new_price_sql} WHERE {where_clause}", [change] + params
+                    )
+                    updated += cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Error bulk adjusting prices: {e}")
+            return None
+        if updated:
+            get_product_catalog().invalidate()
+            publish_change(ProductsUpserted(None))
+        return updated
+
+    @staticmethod
+    def bulk_update_stock(stock_entries, mode=STOCK_MODE_SET, movement_type=MOVEMENT_ADJUSTMENT, note=None):
+        """
+        Aplica una planilla de stock en una transacción: stock_entries son (product_id, cantidad).
+        mode STOCK_MODE_SET reemplaza la cantidad (conteo físico; si un id se repite vale la
+        última fila); STOCK_MODE_ADJUST la suma. Cada cambio queda en stock_movements con
+        movement_type (uno de MANUAL_MOVEMENT_TYPES).
+        Devuelve la cantidad de filas aplicadas, o None ante error de base de datos.
+        Lanza ValueError (sin modificar nada) si un producto no existe o su stock quedaría negativo.
+        """
+        if mode not in STOCK_MODES:
+            raise ValueError(f"Modo de stock no válido: {mode!r}.")
+        if movement_type not in MANUAL_MOVEMENT_TYPES:
+            raise ValueError(f"Tipo de movimiento no válido: {movement_type!r}.")
+        entries = [(int(quantity), int(product_id)) for product_id, quantity in stock_entries]
+        if mode == STOCK_MODE_SET:
+            entries = [(quantity, product_id) for product_id, quantity in {entry[1]: entry[0] for entry in entries}.items()]
+        if not entries:
+            return 0
+        new_quantity_sql = "?" if mode == STOCK_MODE_SET else "quantity_available + ?"
+        try:
+            with get_connection() as conn, transaction(conn):
+                if mode == STOCK_MODE_SET: # Antes del UPDATE: la diferencia sale del saldo actual
+                    conn.executemany(RECORD_SET_QUANTITY_BY_ID_SQL, [
+                        (movement_type, quantity, note, product_id, quantity) for quantity, product_id in entries
+                    ])
+                # rowcount (y no total_changes) para no contar las filas que tocan los triggers.
+                updated_count = conn.executemany(
+                    f"UPDATE products SET quantity_available = {new_quantity_sql} WHERE id = ?", entries
+                ).rowcount
+                if updated_count != len(entries):
+                    found_ids = set(ProductModel._fetch_products_by_ids(conn, list({entry[1] for entry in entries})))
+                    missing_ids = sorted({entry[1] for entry in entries} - found_ids)
+                    raise ValueError(f"Productos no encontrados: {', '.join(map(str, missing_ids))}.")
+                if mode == STOCK_MODE_ADJUST:
+                    conn.executemany(RECORD_STOCK_MOVEMENT_SQL, [
+                        (product_id, movement_type, quantity, None, note) for quantity, product_id in entries if quantity
+                    ])
+                for where_clause, params in _bulk_filter_clauses(product_ids=[entry[1] for entry in entries]):
+                    negative = conn.execute(
+                        f"SELECT name FROM products WHERE {where_clause} AND quantity_available < 0 LIMIT 1", params
+                    ).fetchone()
+                    if negative is not None:
+                        raise ValueError(f"El stock de '{negative['name']}' quedaría negativo.")
+        except sqlite3.Error as e:
+            print(f"Error bulk updating stock: {e}")
+            return None
+        get_product_catalog().invalidate()
+        publish_change(StockChanged(tuple(product_id for _, product_id in entries)))
+        return len(entries)
+
+    @staticmethod
+    def bulk_set_active(is_active, product_ids=None, name_prefix=None, min_price=None, max_price=None):
+        """
+        Activa o desactiva (soft delete) todos los productos del filtro en una transacción.
+        Solo cuenta los que cambian de estado. Devuelve esa cantidad, o None ante error.
+        """
+        target = 1 if is_active else 0
+        updated = 0
+        try:
+            with get_connection() as conn, transaction(conn):
+                for where_clause, params in _bulk_filter_clauses(product_ids, name_prefix, None, min_price, max_price):
+                    cursor = conn.execute(
+                        f"UPDATE products SET is_active = ? WHERE {where_clause} AND is_active <> ?",
+                        [target] + params + [target]
+                    )
+                    updated += cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Error bulk setting product status: {e}")
+            return None
+        if updated:
+            get_product_catalog().invalidate()
+            publish_change(ProductsUpserted(None))
+        return updated
+
+    @staticmethod
+    def get_low_stock_products(threshold=None):
+        """
+        Productos activos con stock bajo, ordenados por cantidad y nombre. Sin threshold, cada
+        producto se compara con su propio reorder_point y se lee solo el índice parcial
+        idx_products_low_stock (O(alertas)); con threshold, se usa ese umbral para todos.
+        """
+        try:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                if threshold is None:
+                    cursor.execute(
+                        # INDEXED BY: con estadísticas, el planificador prefiere idx_products_active_stock
+                        # y recorre todos los activos.
+                        """SELECT id, name, quantity_available, is_active, reorder_point, reorder_qty
+                           FROM products INDEXED BY idx_products_low_stock
+                           WHERE is_active = 1 AND quantity_available <= reorder_point
+                           ORDER BY quantity_available ASC, name ASC"""
+                    )
+                else:
+                    cursor.execute(
+                        "SELECT id, name, quantity_available, is_active, reorder_point, reorder_qty FROM products WHERE quantity_available <= ? AND is_active = 1 ORDER BY quantity_available ASC, name ASC",
+                        (threshold,)
+                    )
                 return cursor.fetchall()
-            except sqlite3.Error as e:
-                print(f"Error fetching low stock products: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
\ No newline at end of file
+        except sqlite3.Error as e:
+            print(f"Error fetching low stock products: {e}")
+            return []
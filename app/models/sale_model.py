@@ -1,163 +1,751 @@
-from database.db_connection import create_connection
+import sqlite3
+from concurrent.futures import Future
+from datetime import date, timedelta
+from database.db_connection import get_connection, create_connection, transaction
+from database.group_commit import GroupCommitWriter, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_DELAY_MS
+from database.daily_sales_summary import (
+    UPSERT_SALE_INTO_DAILY_SUMMARY_SQL, rebuild_daily_sales_summary
+)
+from database.stock_ledger import RECORD_SALE_STOCK_MOVEMENTS_SQL
+from app.models.product_model import ProductModel
+from app.models.product_catalog import get_product_catalog
+from app.models.cash_session_model import CashSessionModel, CashSessionClosedError
+from app.models.change_events import SalePosted, HistoryCleared, publish_change
+from app.models.idempotency_model import IdempotencyKeyModel
+
+# Descuenta el stock de todos los productos de la venta en una sola sentencia.
+# La condición quantity_available >= pedido evita vender más de lo que hay:
+# si algún producto no alcanza, esa fila no se actualiza y la venta se rechaza.
+# Los productos toman la row_version de la venta (ver migración 11), sin pasar por el trigger.
+if sqlite3.sqlite_version_info >= (3, 33, 0):
+    _DECREMENT_STOCK_FOR_SALE_SQL = """
+        UPDATE products
+        SET quantity_available = quantity_available - cart.requested,
+            row_version = (SELECT row_version FROM sales WHERE id = :sale_id)
+        FROM (
+            SELECT product_id, SUM(quantity_sold) AS requested
+            FROM sale_items WHERE sale_id = :sale_id GROUP BY product_id
+        ) AS cart
+        WHERE products.id = cart.product_id
+          AND products.quantity_available >= cart.requested
+    """
+else: # SQLite sin UPDATE ... FROM: misma lógica con subconsultas correlacionadas
+    _DECREMENT_STOCK_FOR_SALE_SQL = """
+        UPDATE products
+        SET quantity_available = quantity_available - (
+            SELECT SUM(si.quantity_sold) FROM sale_items si
+            WHERE si.sale_id = :sale_id AND si.product_id = products.id
+        ),
+            row_version = (SELECT row_version FROM sales WHERE id = :sale_id)
+        WHERE id IN (SELECT product_id FROM sale_items WHERE sale_id = :sale_id)
+          AND quantity_available >= (
+            SELECT SUM(si.quantity_sold) FROM sale_items si
+            WHERE si.sale_id = :sale_id AND si.product_id = products.id
+          )
+    """
+
+_STOCK_SHORTFALLS_FOR_SALE_SQL = """
+    SELECT cart.product_id, p.name, COALESCE(p.quantity_available, 0) AS quantity_available, cart.requested
+    FROM (
+        SELECT product_id, SUM(quantity_sold) AS requested
+        FROM sale_items WHERE sale_id = :sale_id GROUP BY product_id
+    ) AS cart
+    LEFT JOIN products p ON p.id = cart.product_id
+    WHERE p.id IS NULL OR p.quantity_available < cart.requested
+"""
+
+
+def _next_day(date_str):
+    """'YYYY-MM-DD' del día siguiente: cota superior exclusiva para filtrar sale_timestamp por rango."""
+    return (date.fromisoformat(date_str) + timedelta(days=1)).isoformat()
+
+
+def _publish_events(events):
+    for event in (events if isinstance(events, list) else [events]):
+        publish_change(event)
+
+
+def _cash_base_by_day(conn, start_date=None, end_date=None, user_id=None):
+    """
+    {'YYYY-MM-DD': suma de las bases de las cajas abiertas ese día} entre start_date y end_date
+    (inclusivas; None = sin límite), opcionalmente de un usuario. Una sola consulta agrupada,
+    por rango sobre idx_cash_sessions_opened_at. Lanza sqlite3.Error.
+    """
+    conditions, params = [], []
+    if start_date:
+        conditions.append("opened_at >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("opened_at < ?")
+        params.append(_next_day(end_date))
+    if user_id is not None:
+        conditions.append("user_id = ?")
+        params.append(user_id)
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return dict(conn.execute(
+        f"SELECT SUBSTR(opened_at, 1, 10), SUM(base_amount) FROM cash_sessions {where_clause} GROUP BY 1", params
+    ).fetchall())
+
+
+def _daily_summary_dict(row, base_by_day):
+    """Fila de daily_sales_summary con los nombres de campos que usa el historial."""
+    return {
+        'sale_date': row['sale_date'],
+        'base_amount': base_by_day.get(row['sale_date'], 0.0),
+        'sale_count': row['sale_count'],
+        'item_count': row['item_count'],
+        'total_day_sales_value': row['revenue'],
+        'total_day_cost_value': row['cost'],
+        'net_profit': row['revenue'] - row['cost'],
+    }
+
+
+class SaleValidationError(Exception):
+    """La venta no es válida con el estado actual del catálogo; no se guardó nada."""
+
+
+class ProductUnavailableError(SaleValidationError):
+    """Un producto de la venta no existe o está inactivo."""
+    def __init__(self, product_id):
+        self.product_id = product_id
+        super().__init__(f"Producto con ID {product_id} no encontrado o está inactivo.")
+
+
+class InsufficientStockError(SaleValidationError):
+    """La venta pide más unidades de las disponibles para uno o más productos."""
+    def __init__(self, shortfalls):
+        # shortfalls: lista de dicts {'product_id', 'name', 'quantity_available', 'requested'}
+        self.shortfalls = shortfalls
+        detail = "; ".join(
+            f"'{s['name']}' (ID: {s['product_id']}). Disponibles: {s['quantity_available']}, Solicitados: {s['requested']}"
+            for s in shortfalls
+        )
+        super().__init__(f"Stock insuficiente para {detail}")
+
 
 class SaleModel:
-    @staticmethod
-    def create_sale(user_id, initial_cash, total_amount, items):
+    # Escritor de group commit compartido (None = modo desactivado, cada venta hace su propio commit)
+    _group_commit_writer = None
+
+    @classmethod
+    def enable_group_commit(cls, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_delay_ms=DEFAULT_MAX_DELAY_MS):
+        """Activa el modo group commit: las ventas se agrupan en transacciones por lotes."""
+        if cls._group_commit_writer is None:
+            writer = GroupCommitWriter(max_batch_size=max_batch_size, max_delay_ms=max_delay_ms)
+            writer.start()
+            cls._group_commit_writer = writer
+            print(f"Group commit de ventas activado (lote máx. {max_batch_size}, espera máx. {max_delay_ms} ms).")
+        return cls._group_commit_writer
+
+    @classmethod
+    def disable_group_commit(cls):
+        """Desactiva el modo group commit, confirmando antes las ventas encoladas."""
+        writer, cls._group_commit_writer = cls._group_commit_writer, None
+        if writer is not None:
+            writer.stop()
+
+    @classmethod
+    def is_group_commit_enabled(cls):
+        return cls._group_commit_writer is not None
+
+    @classmethod
+    def _submit_write(cls, job, product_ids=(), make_event=None):
         """
-        Crea una nueva venta y sus items.
-        items: lista de diccionarios, cada uno con:
-               {'product_id': id, 'quantity_sold': cant, 'price_per_unit': precio_venta_actual}
+        Ejecuta `job(cursor)` en una transacción de escritura y devuelve un Future con su resultado.
+        Con group commit activo el trabajo se encola en el escritor único; si no, se ejecuta en este
+        mismo hilo y el Future ya viene resuelto. Tras un commit exitoso se actualizan en el catálogo
+        en memoria los productos `product_ids` y se publica make_event(resultado) (un evento o una
+        lista de eventos), si se indicó, antes de entregar el resultado.
         """
-        conn = create_connection()
-        if conn:
+        def _after_commit(result):
+            # La escritura ya se confirmó: un fallo aquí no debe impedir entregar el resultado
+            # (el Future quedaría sin resolver o el llamador reintentaría una venta ya guardada).
             try:
-                cursor = conn.cursor()
-                # 1. Crear la venta principal
-                cursor.execute(
-                    "INSERT INTO sales (user_id, initial_cash, total_amount) VALUES (?, ?, ?)",
-                    (user_id, initial_cash, total_amount)
+                get_product_catalog().refresh_products(product_ids)
+                if make_event is not None:
+                    _publish_events(make_event(result))
+            except Exception as e:
+                print(f"Error after committing a sale write (catalog/events): {e}")
+                get_product_catalog().invalidate() # La próxima lectura recarga el catálogo completo
+
+        writer = cls._group_commit_writer
+        if writer is not None:
+            try:
+                write_future = writer.submit(job)
+            except RuntimeError:
+                write_future = None # El escritor se detuvo entre la comprobación y el envío: registrar directamente
+            if write_future is not None:
+                result_future = Future()
+
+                def _on_write_done(done_future):
+                    error = done_future.exception()
+                    if error is not None:
+                        result_future.set_exception(error)
+                        return
+                    try:
+                        _after_commit(done_future.result())
+                    finally:
+                        result_future.set_result(done_future.result())
+
+                write_future.add_done_callback(_on_write_done)
+                return result_future
+
+        future = Future()
+        try:
+            with get_connection() as conn:
+                with transaction(conn):
+                    result = job(conn.cursor())
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        _after_commit(result)
+        future.set_result(result)
+        return future
+
+    @classmethod
+    def submit_sale(cls, user_id, initial_cash, total_amount, items, cash_session_id=None):
+        """
+        Envía una venta ya valorada y devuelve un Future que se resuelve con su sale_id
+        (o con la excepción: InsufficientStockError, CashSessionClosedError, sqlite3.Error...).
+        """
+        if not items:
+            future = Future()
+            future.set_exception(ValueError("La venta no tiene items."))
+            return future
+        product_ids = tuple(dict.fromkeys(item['product_id'] for item in items))
+        return cls._submit_write(
+            lambda cursor: cls._insert_sale(cursor, user_id, initial_cash, total_amount, items, cash_session_id),
+            product_ids=product_ids,
+            make_event=lambda sale_id: SalePosted(product_ids, sale_id, user_id, cash_session_id)
+        )
+
+    @classmethod
+    def submit_cart_sale(cls, user_id, initial_cash, cart_items, cash_session_id=None):
+        """
+        Envía una venta a partir de un carrito [(product_id, quantity_sold), ...].
+        Los precios, el estado activo y el stock se leen y validan con una sola consulta dentro
+        de la misma transacción que escribe la venta, así no hay lecturas previas que puedan
+        quedar obsoletas. El Future se resuelve con (sale_id, total_amount) o con
+        ProductUnavailableError / InsufficientStockError / CashSessionClosedError / ValueError.
+        """
+        if not cart_items:
+            future = Future()
+            future.set_exception(ValueError("La venta debe contener al menos un producto."))
+            return future
+        product_ids = tuple(dict.fromkeys(product_id for product_id, _ in cart_items))
+        return cls._submit_write(
+            lambda cursor: cls._insert_cart_sale(cursor, user_id, initial_cash, cart_items, cash_session_id),
+            product_ids=product_ids,
+            make_event=lambda result: SalePosted(product_ids, result[0], user_id, cash_session_id)
+        )
+
+    @classmethod
+    def submit_idempotent_cart_sale(cls, idempotency_key, request_hash, user_id, initial_cash, cart_items,
+                                    cash_session_id=None):
+        """
+        submit_cart_sale con clave de idempotencia (ver app.models.idempotency_model): la clave y
+        el resultado se guardan en la misma transacción que la venta. Si la clave ya estaba
+        registrada no se escribe nada ni se publica ningún evento. El Future se resuelve con
+        (sale_id, total_amount, repetida), o con IdempotencyKeyReusedError si la clave se usó con
+        otro request_hash, además de los errores de submit_cart_sale.
+        """
+        if not cart_items:
+            future = Future()
+            future.set_exception(ValueError("La venta debe contener al menos un producto."))
+            return future
+
+        def _job(cursor):
+            stored = IdempotencyKeyModel.find_response(cursor, idempotency_key, request_hash)
+            if stored is not None:
+                return stored['sale_id'], stored['total_amount'], True, None
+            sale_id, total_amount = cls._insert_cart_sale(cursor, user_id, initial_cash, cart_items, cash_session_id)
+            expires_at = IdempotencyKeyModel.save_response(
+                cursor, idempotency_key, request_hash, {'sale_id': sale_id, 'total_amount': total_amount}
+            )
+            return sale_id, total_amount, False, expires_at
+
+        product_ids = tuple(dict.fromkeys(product_id for product_id, _ in cart_items))
+        write_future = cls._submit_write(
+            _job,
+            product_ids=product_ids,
+            make_event=lambda result: [] if result[2] else SalePosted(product_ids, result[0], user_id, cash_session_id)
+        )
+        result_future = Future()
+
+        def _on_done(done_future):
+            error = done_future.exception()
+            if error is not None:
+                result_future.set_exception(error)
+                return
+            sale_id, total_amount, replayed, expires_at = done_future.result()
+            if not replayed:
+                IdempotencyKeyModel.remember(
+                    idempotency_key, request_hash, {'sale_id': sale_id, 'total_amount': total_amount}, expires_at
                 )
-                sale_id = cursor.lastrowid
-                conn.commit() # Cometer la venta principal primero para obtener el sale_id
-
-                # 2. Insertar los items de la venta y actualizar stock
-                if sale_id:
-                    for item in items:
-                        subtotal = item['quantity_sold'] * item['price_per_unit']
-                        cursor.execute(
-                            """INSERT INTO sale_items
-                               (sale_id, product_id, quantity_sold, price_per_unit, subtotal)
-                               VALUES (?, ?, ?, ?, ?)""",
-                            (sale_id, item['product_id'], item['quantity_sold'], item['price_per_unit'], subtotal)
-                        )
-                        # Actualizar stock del producto (llamando a la función de ProductModel o directamente)
-                        # Es mejor tener la lógica de update_stock en ProductModel y llamarla
-                        # from app.models.product_model import ProductModel (cuidado con imports circulares)
-                        # ProductModel.update_stock(item['product_id'], item['quantity_sold'])
-                        # O directamente aquí si se prefiere, pero centralizar es mejor:
-                        cursor.execute(
-                           "UPDATE products SET quantity_available = quantity_available - ? WHERE id = ?",
-                           (item['quantity_sold'], item['product_id'])
+            result_future.set_result((sale_id, total_amount, replayed))
+
+        write_future.add_done_callback(_on_done)
+        return result_future
+
+    @staticmethod
+    def _insert_cart_sale(cursor, user_id, initial_cash, cart_items, cash_session_id=None):
+        requested_by_product = {}
+        for product_id, quantity_sold in cart_items:
+            if quantity_sold <= 0:
+                raise ValueError(f"La cantidad vendida para el producto ID {product_id} debe ser mayor a cero.")
+            requested_by_product[product_id] = requested_by_product.get(product_id, 0) + quantity_sold
+
+        products_by_id = ProductModel.get_products_by_ids(requested_by_product.keys(), conn=cursor.connection)
+        shortfalls = []
+        for product_id, requested in requested_by_product.items():
+            product = products_by_id.get(product_id)
+            if not product or not product['is_active']:
+                raise ProductUnavailableError(product_id)
+            if requested > product['quantity_available']:
+                shortfalls.append({'product_id': product_id, 'name': product['name'],
+                                   'quantity_available': product['quantity_available'], 'requested': requested})
+        if shortfalls:
+            raise InsufficientStockError(shortfalls)
+
+        items = [{'product_id': product_id, 'quantity_sold': quantity_sold,
+                  'price_per_unit': products_by_id[product_id]['sale_price']}
+                 for product_id, quantity_sold in cart_items]
+        total_amount = sum(item['quantity_sold'] * item['price_per_unit'] for item in items)
+        sale_id = SaleModel._insert_sale(cursor, user_id, initial_cash, total_amount, items, cash_session_id)
+        return sale_id, total_amount
+
+    @classmethod
+    def submit_offline_sales(cls, user_id, offline_sales):
+        """
+        Registra un lote de ventas hechas en una terminal sin conexión, en una sola transacción.
+        offline_sales: [{'client_sale_id', 'sale_timestamp' ('YYYY-MM-DD HH:MM:SS' UTC),
+                         'initial_cash', 'items': [{'product_id', 'quantity_sold', 'price_per_unit'}]}]
+        Se respetan los precios y la hora de la terminal. Cada venta va en su propio SAVEPOINT: una
+        rechazada (producto inexistente, stock insuficiente...) no impide las demás. Reenviar el lote
+        es seguro: una venta cuyo client_sale_id ya existe no se vuelve a registrar.
+        El Future se resuelve con [{'client_sale_id', 'status' ('created' | 'duplicate' | 'rejected'),
+        'sale_id', 'error'}] en el orden recibido.
+        """
+        product_ids = tuple(dict.fromkeys(
+            item['product_id'] for offline_sale in offline_sales for item in offline_sale['items']
+        ))
+        product_ids_by_sale = {
+            offline_sale['client_sale_id']: tuple(dict.fromkeys(item['product_id'] for item in offline_sale['items']))
+            for offline_sale in offline_sales
+        }
+        return cls._submit_write(
+            lambda cursor: cls._insert_offline_sales(cursor, user_id, offline_sales),
+            product_ids=product_ids,
+            make_event=lambda results: [
+                SalePosted(product_ids_by_sale[result['client_sale_id']], result['sale_id'], user_id, None)
+                for result in results if result['status'] == 'created'
+            ]
+        )
+
+    @staticmethod
+    def _insert_offline_sales(cursor, user_id, offline_sales):
+        results = []
+        for offline_sale in offline_sales:
+            client_sale_id = offline_sale['client_sale_id']
+            result = {'client_sale_id': client_sale_id, 'status': 'created', 'sale_id': None, 'error': None}
+            existing = cursor.execute("SELECT id FROM sales WHERE client_sale_id = ?", (client_sale_id,)).fetchone()
+            if existing:
+                result.update(status='duplicate', sale_id=existing[0])
+                results.append(result)
+                continue
+            try:
+                items = offline_sale['items']
+                if not items:
+                    raise ValueError("La venta no tiene items.")
+                for item in items:
+                    if item['quantity_sold'] <= 0:
+                        raise ValueError(
+                            f"La cantidad vendida para el producto ID {item['product_id']} debe ser mayor a cero."
                         )
-                    conn.commit() # Cometer todos los items y actualizaciones de stock
-                    return sale_id
-                else:
-                    conn.rollback() # Si no se pudo crear la venta, deshacer
-                    return None
+                total_amount = sum(item['quantity_sold'] * item['price_per_unit'] for item in items)
+                with transaction(cursor.connection): # SAVEPOINT: deshace solo esta venta si falla
+                    result['sale_id'] = SaleModel._insert_sale(
+                        cursor, user_id, offline_sale.get('initial_cash', 0.0), total_amount, items,
+                        sale_timestamp=offline_sale['sale_timestamp'], client_sale_id=client_sale_id
+                    )
+            except (SaleValidationError, ValueError, sqlite3.IntegrityError) as e:
+                result.update(status='rejected', error=str(e))
+            results.append(result)
+        return results
 
-            except Exception as e:
-                print(f"Error creating sale: {e}")
-                if conn: # Asegurarse que la conexión existe antes de rollback
-                    conn.rollback()
-                return None
-            finally:
-                if conn:
-                    conn.close()
-        return None
+    @staticmethod
+    def _insert_sale(cursor, user_id, initial_cash, total_amount, items, cash_session_id=None,
+                     sale_timestamp=None, client_sale_id=None):
+        """
+        Escribe la venta, sus items, el descuento de stock (con sus movimientos en stock_movements)
+        y su suma en daily_sales_summary (y en su sesión de caja, si tiene) usando la transacción
+        ya abierta por el llamador. Lanza InsufficientStockError (o sqlite3.Error) sin confirmar
+        nada; el llamador decide si deshace la transacción completa.
+        sale_timestamp ('YYYY-MM-DD HH:MM:SS' UTC, None = ahora) y client_sale_id son para las
+        ventas cargadas desde una terminal sin conexión.
+        """
+        if cash_session_id is not None:
+            CashSessionModel.add_sale_to_session(cursor, cash_session_id, total_amount)
+        cursor.execute(
+            """INSERT INTO sales (user_id, initial_cash, total_amount, cash_session_id, sale_timestamp, client_sale_id)
+               VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)""",
+            (user_id, initial_cash, total_amount, cash_session_id, sale_timestamp, client_sale_id)
+        )
+        sale_id = cursor.lastrowid
+
+        # El costo y el nombre se copian del producto en esta misma transacción, así los reportes
+        # de ganancias conservan los valores del momento de la venta. Las líneas toman la
+        # row_version que el trigger le dio a la venta.
+        cursor.executemany(
+            """INSERT INTO sale_items
+               (sale_id, product_id, quantity_sold, price_per_unit, subtotal, unit_cost_at_sale, product_name,
+                row_version)
+               VALUES (?, ?, ?, ?, ?,
+                       (SELECT purchase_price FROM products WHERE id = ?),
+                       (SELECT name FROM products WHERE id = ?),
+                       (SELECT row_version FROM sales WHERE id = ?))""",
+            [(sale_id, item['product_id'], item['quantity_sold'], item['price_per_unit'],
+              item['quantity_sold'] * item['price_per_unit'], item['product_id'], item['product_id'], sale_id)
+             for item in items]
+        )
+
+        distinct_product_count = len({item['product_id'] for item in items})
+        cursor.execute("SAVEPOINT sale_stock_check")
+        cursor.execute(_DECREMENT_STOCK_FOR_SALE_SQL, {"sale_id": sale_id})
+        if cursor.rowcount != distinct_product_count:
+            # Volver al estado previo al descuento para informar exactamente qué faltó.
+            cursor.execute("ROLLBACK TO sale_stock_check")
+            shortfalls = [dict(row) for row in cursor.execute(_STOCK_SHORTFALLS_FOR_SALE_SQL, {"sale_id": sale_id})]
+            cursor.execute("RELEASE sale_stock_check")
+            raise InsufficientStockError(shortfalls)
+        cursor.execute("RELEASE sale_stock_check")
+        # Un movimiento 'sale' por producto en stock_movements, igual al descuento recién hecho.
+        cursor.execute(RECORD_SALE_STOCK_MOVEMENTS_SQL, {"sale_id": sale_id})
+        # Totales del día (ingresos, costo, unidades, base).
+        cursor.execute(UPSERT_SALE_INTO_DAILY_SUMMARY_SQL, {"sale_id": sale_id})
+        return sale_id
 
     @staticmethod
-    def get_sales_history_grouped_by_date():
-        conn = create_connection()
-        if not conn:
-            return {}
+    def create_sale(user_id, initial_cash, total_amount, items, cash_session_id=None):
+        """
+        Crea una nueva venta y sus items en una única transacción (BEGIN IMMEDIATE):
+        o se guardan la venta, todos sus items y el descuento de stock, o no se guarda nada.
+        Con group commit activo la transacción es compartida con otras ventas del mismo lote.
+        items: lista de diccionarios, cada uno con:
+               {'product_id': id, 'quantity_sold': cant, 'price_per_unit': precio_venta_actual}
+        cash_session_id: sesión de caja abierta a la que se suma la venta (o None).
+        Devuelve el sale_id, o None si falla (incluido stock insuficiente o caja cerrada).
+        """
         try:
-            cursor = conn.cursor()
-            # Usar STRFTIME para agrupar por día, y los nombres de columna correctos
-            query = """
+            return SaleModel.submit_sale(user_id, initial_cash, total_amount, items, cash_session_id).result()
+        except (SaleValidationError, CashSessionClosedError, ValueError) as e:
+            print(f"Error creating sale: {e}")
+            return None
+        except sqlite3.Error as e:
+            print(f"Error creating sale: {e}")
+            return None
+
+    @staticmethod
+    def get_sales_history_grouped_by_date():
+        """Todo el historial como {fecha 'YYYY-MM-DD': día}, ver get_sales_history."""
+        return {day['sale_date']: day for day in SaleModel.get_sales_history()}
+
+    @staticmethod
+    def get_sales_history(start_date=None, end_date=None, user_id=None, product_id=None, batch_size=500):
+        """
+        Historial agrupado por día entre start_date y end_date ('YYYY-MM-DD', inclusivas; None = sin
+        límite), opcionalmente solo las ventas de un usuario y/o las líneas de un producto.
+
+        Es un generador: produce un día a la vez, del más reciente al más antiguo, leyendo las filas
+        con fetchmany, así un rango grande no se carga entero en memoria. El filtro de fechas es un
+        rango sobre sale_timestamp (idx_sales_timestamp, o idx_sales_user_timestamp con user_id).
+        Como iter_sale_line_batches, usa una conexión propia (create_connection) que se cierra al
+        terminar o al cerrar el generador, desde cualquier hilo: la del pool se ata al hilo que la
+        pidió y no debe quedar abierta entre yields.
+        Cada día: {'sale_date', 'base_amount', 'sale_count', 'items', 'total_day_sales_value',
+                   'total_day_cost_value', 'net_profit'}
+        """
+        conditions, params = [], []
+        if start_date:
+            conditions.append("s.sale_timestamp >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("s.sale_timestamp < ?")
+            params.append(_next_day(end_date))
+        if user_id is not None:
+            conditions.append("s.user_id = ?")
+            params.append(user_id)
+        if product_id is not None:
+            conditions.append("si.product_id = ?")
+            params.append(product_id)
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
             SELECT
-                s.id as sale_id,
-                STRFTIME('%Y-%m-%d', s.sale_timestamp) as sale_date_group,
-                s.initial_cash,
-                si.product_id,
-                p.name as product_name,
-                p.purchase_price,
-                p.sale_price as product_current_sale_price, -- Precio actual del producto, puede ser diferente al de la venta
+                s.id AS sale_id,
+                SUBSTR(s.sale_timestamp, 1, 10) AS sale_date_group,
+                COALESCE(si.product_name, 'N/A') AS product_name,
+                COALESCE(si.unit_cost_at_sale, 0) AS purchase_price, -- Costo guardado al vender
                 si.quantity_sold,
-                si.price_per_unit as price_at_sale -- Precio al que se vendió
+                si.price_per_unit AS price_at_sale -- Precio al que se vendió
             FROM sales s
             JOIN sale_items si ON s.id = si.sale_id
-            JOIN products p ON si.product_id = p.id
-            ORDER BY s.sale_timestamp DESC, s.id ASC, p.name ASC;
-            """
-            # Nota: sale_timestamp ya incluye la hora, STRFTIME('%Y-%m-%d', s.sale_timestamp) la trunca a día.
-            cursor.execute(query)
-            raw_sales_data = cursor.fetchall()
-
-            history_by_date = {}
-            daily_base_cache = {} # Para almacenar la base_inicial por día
-
-            for row in raw_sales_data:
-                date_str = row['sale_date_group']
-
-                # Almacenar/recuperar la base inicial para ese día
-                # Asumimos que la base_inicial es la misma para todas las ventas de un mismo día
-                # o que la tomamos de la primera venta registrada para ese día.
-                # Una mejor aproximación sería tener una tabla separada para 'bases diarias'.
-                # Por ahora, si múltiples ventas en un día tienen diferentes 'initial_cash',
-                # esta lógica tomará la de la primera que procese para esa fecha.
-                if date_str not in daily_base_cache:
-                    # Podríamos hacer una subconsulta para obtener la base_inicial de la primera venta del día
-                    # o simplemente tomar la que viene con la primera fila que encontremos para esa fecha.
-                    # Aquí, la tomaremos de la fila actual la primera vez que veamos la fecha.
-                    daily_base_cache[date_str] = row['initial_cash']
-
-
-                if date_str not in history_by_date:
-                    history_by_date[date_str] = {
-                        'base_amount': daily_base_cache[date_str], # Usar la base cacheada
-                        'items': [],
-                        'total_day_sales_value': 0, # Valor total de ventas del día
-                        'total_day_cost_value': 0   # Costo total de los productos vendidos ese día
-                    }
-
-                item_total_sale_price = row['quantity_sold'] * row['price_at_sale']
-                item_total_cost_price = row['quantity_sold'] * row['purchase_price'] # Costo basado en el precio de compra
-
-                history_by_date[date_str]['items'].append({
-                    'sale_id': row['sale_id'], # Puede ser útil para depurar o enlazar
-                    'product_name': row['product_name'],
-                    'quantity': row['quantity_sold'],
-                    'unit_sale_price_at_transaction': row['price_at_sale'],
-                    'total_sale_price': item_total_sale_price,
-                    'unit_purchase_price': row['purchase_price'], # Para referencia
-                    'total_cost_price': item_total_cost_price # Para referencia
-                })
-                history_by_date[date_str]['total_day_sales_value'] += item_total_sale_price
-                history_by_date[date_str]['total_day_cost_value'] += item_total_cost_price
-
-            # Calcular ganancias netas por día
-            for date_str, data in history_by_date.items():
-                data['net_profit'] = data['total_day_sales_value'] - data['total_day_cost_value']
-
-            return history_by_date
-
-        except Exception as e:
+            {where_clause}
+            ORDER BY s.sale_timestamp DESC, s.id ASC, si.product_name ASC
+        """
+        conn = create_connection()
+        if conn is None:
+            print("Error fetching sales history: no se pudo abrir una conexión.")
+            return
+        try:
+            base_by_day = _cash_base_by_day(conn, start_date, end_date, user_id)
+            cursor = conn.execute(query, params)
+            current_day = None
+            last_sale_id = None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    if current_day is None or row['sale_date_group'] != current_day['sale_date']:
+                        if current_day is not None:
+                            yield SaleModel._finish_history_day(current_day)
+                        current_day = {
+                            'sale_date': row['sale_date_group'],
+                            'base_amount': base_by_day.get(row['sale_date_group'], 0.0),
+                            'sale_count': 0,
+                            'items': [],
+                            'total_day_sales_value': 0,
+                            'total_day_cost_value': 0,
+                        }
+                    if row['sale_id'] != last_sale_id:
+                        current_day['sale_count'] += 1
+                        last_sale_id = row['sale_id']
+                    item_total_sale_price = row['quantity_sold'] * row['price_at_sale']
+                    item_total_cost_price = row['quantity_sold'] * row['purchase_price']
+                    current_day['items'].append({
+                        'sale_id': row['sale_id'],
+                        'product_name': row['product_name'],
+                        'quantity': row['quantity_sold'],
+                        'unit_sale_price_at_transaction': row['price_at_sale'],
+                        'total_sale_price': item_total_sale_price,
+                        'unit_purchase_price': row['purchase_price'],
+                        'total_cost_price': item_total_cost_price,
+                    })
+                    current_day['total_day_sales_value'] += item_total_sale_price
+                    current_day['total_day_cost_value'] += item_total_cost_price
+            if current_day is not None:
+                yield SaleModel._finish_history_day(current_day)
+        except sqlite3.Error as e:
             print(f"Error fetching sales history: {e}")
-            return {}
         finally:
-            if conn:
-                conn.close()
+            conn.close()
 
     @staticmethod
-    def delete_all_sales_history():
+    def _finish_history_day(day):
+        day['net_profit'] = day['total_day_sales_value'] - day['total_day_cost_value']
+        return day
+
+    @staticmethod
+    def _sale_line_range_filter(start_date, end_date):
+        conditions, params = [], []
+        if start_date:
+            conditions.append("s.sale_timestamp >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("s.sale_timestamp < ?")
+            params.append(_next_day(end_date))
+        return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+    @staticmethod
+    def count_sale_lines(start_date=None, end_date=None):
+        """Cantidad de líneas vendidas en el rango (para mostrar el progreso de una exportación)."""
+        where_clause, params = SaleModel._sale_line_range_filter(start_date, end_date)
+        try:
+            with get_connection() as conn:
+                return conn.execute(
+                    f"SELECT COUNT(*) FROM sales s JOIN sale_items si ON si.sale_id = s.id {where_clause}", params
+                ).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error counting sale lines: {e}")
+            return 0
+
+    @staticmethod
+    def iter_sale_line_batches(start_date=None, end_date=None, batch_size=1000):
+        """
+        Líneas vendidas entre start_date y end_date ('YYYY-MM-DD', inclusivas; None = sin límite),
+        en orden cronológico, como listas de hasta `batch_size` filas (sqlite3.Row) leídas con
+        fetchmany: la memoria usada no depende del tamaño del rango.
+        Usa una conexión propia (create_connection), no una del pool, porque el consumidor puede
+        tardar (escritura a disco, respuesta HTTP) y avanzar el generador desde distintos hilos.
+        Lanza sqlite3.Error si la consulta falla.
+        """
+        where_clause, params = SaleModel._sale_line_range_filter(start_date, end_date)
         conn = create_connection()
-        if conn:
-            try:
+        if conn is None:
+            raise sqlite3.OperationalError("No se pudo abrir una conexión para exportar.")
+        try:
+            cursor = conn.execute(
+                f"""
+                SELECT s.id AS sale_id, s.sale_timestamp, s.user_id, s.cash_session_id,
+                       si.product_id, si.product_name, si.quantity_sold, si.price_per_unit,
+                       si.subtotal, si.unit_cost_at_sale
+                FROM sales s
+                JOIN sale_items si ON si.sale_id = s.id
+                {where_clause}
+                ORDER BY s.sale_timestamp ASC, s.id ASC, si.id ASC
+                """,
+                params
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+    @staticmethod
+    def get_recent_sale_days(before_date=None, limit=30):
+        """
+        Fechas ('YYYY-MM-DD') con ventas, de la más reciente a la más antigua, anteriores a
+        `before_date` (exclusiva). Lee las claves de daily_sales_summary (una fila por día).
+        """
+        try:
+            with get_connection() as conn:
+                if before_date is None:
+                    rows = conn.execute(
+                        "SELECT sale_date FROM daily_sales_summary ORDER BY sale_date DESC LIMIT ?", (limit,)
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        "SELECT sale_date FROM daily_sales_summary WHERE sale_date < ? ORDER BY sale_date DESC LIMIT ?",
+                        (before_date, limit)
+                    ).fetchall()
+            return [row['sale_date'] for row in rows]
+        except sqlite3.Error as e:
+            print(f"Error fetching sale days: {e}")
+            return []
+
+    @staticmethod
+    def get_daily_sales_summaries(start_date, end_date):
+        """
+        Totales por día entre start_date y end_date (ambas 'YYYY-MM-DD', inclusivas), del más
+        reciente al más antiguo, leídos de daily_sales_summary: O(días), sin recorrer las líneas.
+        Cada día: {'sale_date', 'base_amount', 'sale_count', 'item_count',
+                   'total_day_sales_value', 'total_day_cost_value', 'net_profit'}
+        """
+        try:
+            with get_connection() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT sale_date, sale_count, item_count, revenue, cost
+                    FROM daily_sales_summary
+                    WHERE sale_date >= ? AND sale_date <= ?
+                    ORDER BY sale_date DESC
+                    """,
+                    (start_date, end_date)
+                ).fetchall()
+                base_by_day = _cash_base_by_day(conn, start_date, end_date)
+            return [_daily_summary_dict(row, base_by_day) for row in rows]
+        except sqlite3.Error as e:
+            print(f"Error fetching daily sales summaries: {e}")
+            return []
+
+    @staticmethod
+    def get_daily_summaries_for_sales(sale_ids):
+        """
+        Totales (como get_daily_sales_summaries) de los días en que se registraron estas ventas,
+        para actualizar solo esos días en el historial. Búsquedas por clave en sales y en
+        daily_sales_summary.
+        """
+        sale_ids = list(dict.fromkeys(sale_ids))
+        if not sale_ids:
+            return []
+        try:
+            with get_connection() as conn:
+                rows = {}
+                for start in range(0, len(sale_ids), 500):
+                    chunk = sale_ids[start:start + 500]
+                    placeholders = ", ".join("?" for _ in chunk)
+                    for row in conn.execute(
+                        f"""
+                        SELECT sale_date, sale_count, item_count, revenue, cost
+                        FROM daily_sales_summary
+                        WHERE sale_date IN (SELECT SUBSTR(sale_timestamp, 1, 10) FROM sales WHERE id IN ({placeholders}))
+                        """,
+                        chunk
+                    ):
+                        rows[row['sale_date']] = row
+                if not rows:
+                    return []
+                base_by_day = _cash_base_by_day(conn, min(rows), max(rows))
+            return [_daily_summary_dict(rows[sale_date], base_by_day) for sale_date in sorted(rows, reverse=True)]
+        except sqlite3.Error as e:
+            print(f"Error fetching daily summaries for sales: {e}")
+            return []
+
+    @staticmethod
+    def rebuild_daily_sales_summary():
+        """Recalcula daily_sales_summary desde sales/sale_items. Devuelve la cantidad de días o None."""
+        with get_connection() as conn:
+            return rebuild_daily_sales_summary(conn)
+
+    @staticmethod
+    def get_sale_items_for_day(sale_date):
+        """Líneas vendidas en un día ('YYYY-MM-DD'), con el mismo formato que los 'items' del historial agrupado."""
+        try:
+            with get_connection() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT s.id AS sale_id, COALESCE(si.product_name, 'N/A') AS product_name,
+                           COALESCE(si.unit_cost_at_sale, 0) AS purchase_price,
+                           si.quantity_sold, si.price_per_unit AS price_at_sale
+                    FROM sales s
+                    JOIN sale_items si ON s.id = si.sale_id
+                    WHERE s.sale_timestamp >= ? AND s.sale_timestamp < ?
+                    ORDER BY s.sale_timestamp DESC, s.id ASC, si.product_name ASC
+                    """,
+                    (sale_date, _next_day(sale_date))
+                ).fetchall()
+            return [{
+                'sale_id': row['sale_id'],
+                'product_name': row['product_name'],
+                'quantity': row['quantity_sold'],
+                'unit_sale_price_at_transaction': row['price_at_sale'],
+                'total_sale_price': row['quantity_sold'] * row['price_at_sale'],
+                'unit_purchase_price': row['purchase_price'],
+                'total_cost_price': row['quantity_sold'] * row['purchase_price'],
+            } for row in rows]
+        except sqlite3.Error as e:
+            print(f"Error fetching sale items for {sale_date}: {e}")
+            return []
+
+    @staticmethod
+    def delete_all_sales_history():
+        try:
+            with get_connection() as conn:
                 cursor = conn.cursor()
                 # Borrar en orden para respetar las FK
                 cursor.execute("DELETE FROM sale_items;")
                 cursor.execute("DELETE FROM sales;")
-                # Si tuvieras una tabla de 'bases diarias' independiente, borrarla también.
+                cursor.execute("DELETE FROM daily_sales_summary;")
+                # Las cajas cerradas solo resumen ventas borradas; las abiertas vuelven a cero.
+                cursor.execute("DELETE FROM cash_sessions WHERE closed_at IS NOT NULL;")
+                cursor.execute("UPDATE cash_sessions SET sales_total = 0, sale_count = 0;")
+                # Las claves de idempotencia apuntan a ventas borradas.
+                IdempotencyKeyModel.clear_all(cursor)
+                # Las terminales remotas lo reciben como un reinicio de ventas (ver SyncModel).
+                cursor.execute("""
+                    UPDATE sync_state
+                    SET last_row_version = last_row_version + 1, history_reset_version = last_row_version + 1
+                    WHERE id = 1;
+                """)
                 conn.commit()
-                return True
-            except Exception  as e:
-                print(f"Error deleting sales history: {e}")
-                if conn:
-                    conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
+            publish_change(HistoryCleared())
+            return True
+        except Exception  as e:
+            print(f"Error deleting sales history: {e}")
+            return False
 
     # Puedes añadir más funciones, como obtener ventas por rango de fechas, etc.
     # @staticmethod
@@ -0,0 +1,81 @@
+# app/models/sync_model.py
+"""
+Cambios para las terminales remotas (GET /api/v1/sync).
+
+Cada fila de products, sales y sale_items lleva una row_version global y creciente (migración 11):
+la terminal guarda la última versión que aplicó y pide solo lo posterior, que en cada tabla es un
+recorrido por rango de su índice de row_version. Las filas se devuelven en formato compacto
+(nombres de columnas una vez y luego listas de valores) y por lotes de ~limit filas. Las filas
+de una misma versión (una venta, sus líneas y el stock que descontó) nunca se separan entre
+lotes, así un lote puede pasar un poco de limit.
+"""
+import sqlite3
+from heapq import merge
+from itertools import islice
+
+from database.db_connection import get_connection, transaction
+
+# Columnas que se envían de cada tabla (row_version siempre al final).
+SYNC_TABLE_COLUMNS = {
+    "products": ("id", "name", "quantity_available", "sale_price", "purchase_price", "is_active",
+                 "reorder_point", "reorder_qty", "row_version"),
+    "sales": ("id", "user_id", "sale_timestamp", "initial_cash", "total_amount", "cash_session_id",
+              "client_sale_id", "row_version"),
+    "sale_items": ("id", "sale_id", "product_id", "quantity_sold", "price_per_unit", "subtotal",
+                   "product_name", "row_version"),
+}
+DEFAULT_SYNC_BATCH_SIZE = 500
+
+
+class SyncModel:
+    @staticmethod
+    def get_changes(since, limit=DEFAULT_SYNC_BATCH_SIZE):
+        """
+        Filas con row_version > since, leídas en una sola transacción de lectura (todas las tablas
+        ven el mismo momento). Devuelve:
+            {'since', 'next_since', 'has_more', 'sales_reset', 'resync_required',
+             'products' | 'sales' | 'sale_items': {'columns': [...], 'rows': [[...], ...]}}
+        next_since es el valor para la siguiente llamada; con has_more hay que seguir pidiendo.
+        sales_reset: se borró el historial después de since; la terminal debe borrar sus ventas
+        antes de aplicar el lote. resync_required: since es mayor que la versión actual (la base
+        se restauró o es otra); la terminal debe volver a empezar desde 0.
+        Devuelve None si la consulta falla.
+        """
+        try:
+            with get_connection() as conn:
+                with transaction(conn, mode="DEFERRED"):
+                    state = conn.execute(
+                        "SELECT last_row_version, history_reset_version FROM sync_state WHERE id = 1"
+                    ).fetchone()
+                    last_row_version, history_reset_version = (state[0], state[1]) if state else (0, 0)
+                    if since > last_row_version:
+                        return {'since': since, 'next_since': 0, 'has_more': True, 'sales_reset': True,
+                                'resync_required': True,
+                                **{table: {'columns': list(columns), 'rows': []}
+                                   for table, columns in SYNC_TABLE_COLUMNS.items()}}
+
+                    # Primero solo las versiones (lecturas del índice) para decidir dónde cortar el lote.
+                    versions_by_table = [
+                        [row[0] for row in conn.execute(
+                            f"SELECT row_version FROM {table} WHERE row_version > ? ORDER BY row_version LIMIT ?",
+                            (since, limit + 1)
+                        )]
+                        for table in SYNC_TABLE_COLUMNS
+                    ]
+                    first_versions = list(islice(merge(*versions_by_table), limit + 1))
+                    has_more = len(first_versions) > limit
+                    upper_version = first_versions[limit - 1] if has_more else last_row_version
+
+                    changes = {'since': since, 'next_since': upper_version, 'has_more': has_more,
+                               'sales_reset': since < history_reset_version, 'resync_required': False}
+                    for table, columns in SYNC_TABLE_COLUMNS.items():
+                        rows = conn.execute(
+                            f"SELECT {', '.join(columns)} FROM {table} "
+                            f"WHERE row_version > ? AND row_version <= ? ORDER BY row_version",
+                            (since, upper_version)
+                        )
+                        changes[table] = {'columns': list(columns), 'rows': [list(row) for row in rows]}
+                    return changes
+        except sqlite3.Error as e:
+            print(f"Error al leer cambios para sincronizar: {e}")
+            return None
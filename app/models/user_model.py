@@ -1,5 +1,5 @@
 
-from database.db_connection import create_connection # Asumiendo que db_connection.py está en el directorio 'database'
+from database.db_connection import get_connection # Asumiendo que db_connection.py está en el directorio 'database'
 import hashlib # Para hashear contraseñas
 
 # (Si tienes funciones de hashing separadas, asegúrate que coincidan con la lógica de abajo)
@@ -14,9 +14,8 @@ def verify_password(stored_password_hash, provided_password):
 class UserModel:
     @staticmethod
     def create_user(username, email, password):
-        conn = create_connection()
-        if conn:
-            try:
+        try:
+            with get_connection() as conn:
                 cursor = conn.cursor()
                 hashed_pass = hash_password(password) # Hashear la contraseña
                 cursor.execute(
@@ -25,20 +24,16 @@ class UserModel:
                 )
                 conn.commit()
                 return cursor.lastrowid
-            except Exception as e:
-                print(f"Error creating user: {e}")
-                # Podrías querer verificar si el error es por email/username duplicado (UNIQUE constraint)
-                # e.g., if "UNIQUE constraint failed: users.email" in str(e):
-                return None
-            finally:
-                conn.close()
-        return None
+        except Exception as e:
+            print(f"Error creating user: {e}")
+            # Podrías querer verificar si el error es por email/username duplicado (UNIQUE constraint)
+            # e.g., if "UNIQUE constraint failed: users.email" in str(e):
+            return None
 
     @staticmethod
     def get_user_by_username(username):
-        conn = create_connection()
-        if conn:
-            try:
+        try:
+            with get_connection() as conn:
                 cursor = conn.cursor()
                 # Seleccionar todos los campos necesarios para la autenticación y gestión
                 cursor.execute(
@@ -46,37 +41,29 @@ class UserModel:
                     (username,)
                 )
                 return cursor.fetchone() # Devuelve un objeto sqlite3.Row o None
-            except Exception as e:
-                print(f"Error fetching user by username: {e}")
-                return None
-            finally:
-                conn.close()
-        return None
+        except Exception as e:
+            print(f"Error fetching user by username: {e}")
+            return None
 
     @staticmethod
     def get_user_by_email(email): # Para la función "olvidé contraseña"
-        conn = create_connection()
-        if conn:
-            try:
+        try:
+            with get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     "SELECT id, username, email, password_hash FROM users WHERE email = ?",
                     (email,)
                 )
                 return cursor.fetchone()
-            except Exception as e:
-                print(f"Error fetching user by email: {e}")
-                return None
-            finally:
-                conn.close()
-        return None
+        except Exception as e:
+            print(f"Error fetching user by email: {e}")
+            return None
 
     # Si necesitas actualizar la contraseña:
     @staticmethod
     def update_password_by_email(email, new_password):
-        conn = create_connection()
-        if conn:
-            try:
+        try:
+            with get_connection() as conn:
                 cursor = conn.cursor()
                 hashed_new_pass = hash_password(new_password)
                 cursor.execute(
@@ -85,9 +72,6 @@ class UserModel:
                 )
                 conn.commit()
                 return cursor.rowcount > 0 # True si se actualizó
-            except Exception as e:
-                print(f"Error updating password: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
\ No newline at end of file
+        except Exception as e:
+            print(f"Error updating password: {e}")
+            return False
@@ -0,0 +1,35 @@
+# app/views/change_event_bridge.py
+"""
+Puente entre el bus de cambios (app.models.change_events) y las vistas.
+
+Los eventos se publican en el hilo que hizo la escritura (interfaz, API o group commit); el puente
+los reemite con una señal que las vistas conectan en cola (Qt.QueuedConnection), así cada vista
+los procesa en el hilo de la interfaz y después de terminar lo que estaba haciendo.
+"""
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+
+from app.models.change_events import get_change_event_bus
+
+
+class ChangeEventBridge(QObject):
+    change_published = pyqtSignal(object) # Evento de app.models.change_events
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # emit es seguro desde cualquier hilo; Qt encola la entrega a los receptores.
+        self._unsubscribe = get_change_event_bus().subscribe(self.change_published.emit)
+
+    def connect_view(self, slot):
+        """Conecta un slot de vista; siempre en cola, aunque el evento se publique en el hilo de la interfaz."""
+        self.change_published.connect(slot, Qt.QueuedConnection)
+
+
+_bridge = None
+
+
+def get_change_event_bridge():
+    """Puente único; se crea en el primer uso, que debe ser en el hilo de la interfaz."""
+    global _bridge
+    if _bridge is None:
+        _bridge = ChangeEventBridge()
+    return _bridge
@@ -0,0 +1,236 @@
+# app/views/history_tree_model.py
+"""
+Modelo de árbol perezoso para el historial de ventas.
+
+Primero solo se cargan los resúmenes de los días más recientes. Las líneas vendidas de un día
+se piden a la base cuando el usuario expande ese día, y los días más antiguos se cargan por
+páginas cuando la vista llega al final (canFetchMore/fetchMore en ambos niveles). Con un filtro
+de fechas, los días del rango llegan ya con sus líneas desde HistoryController.get_sales_history.
+Las ventas nuevas se aplican con apply_day_summaries: solo se tocan las filas de sus días.
+"""
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QDate
+from PyQt5.QtGui import QFont
+
+from app.controllers.history_controller import HistoryController
+
+HISTORY_HEADERS = ("Fecha / Detalle de Venta", "Cantidad", "Precio Unit.", "Subtotal")
+DAYS_PAGE_SIZE = 30
+
+# internalId de los índices: 0 para un día; fila_del_día + 1 para las filas hijas de ese día.
+_DAY_NODE_ID = 0
+
+
+class HistoryTreeModel(QAbstractItemModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._days = []              # Resúmenes diarios cargados (del más reciente al más antiguo)
+        self._day_children = []      # Por día: None (sin cargar) o lista de filas hijas
+        self._next_before_date = None
+        self._has_more_days = False
+        self._date_range = None      # (inicio, fin) si hay un filtro de fechas
+        self._bold_font = QFont()
+        self._bold_font.setBold(True)
+
+    # --- Carga ---
+
+    def reload(self):
+        """Vuelve a empezar desde la primera página (o desde el rango filtrado)."""
+        self.beginResetModel()
+        self._days = []
+        self._day_children = []
+        self._next_before_date = None
+        if self._date_range is None:
+            self._has_more_days = True
+        else:
+            self._has_more_days = False
+            # Rango filtrado: una sola consulta trae los días con sus líneas ya agrupadas.
+            for day in HistoryController.get_sales_history(*self._date_range):
+                self._days.append(day)
+                self._day_children.append(self._build_day_children(day, day['items']))
+        self.endResetModel()
+        if self._date_range is None:
+            self.fetchMore(QModelIndex())
+
+    def set_date_range(self, start_date=None, end_date=None):
+        """Limita el historial a un rango de fechas 'YYYY-MM-DD' (inclusivo); sin fechas, muestra todo."""
+        self._date_range = (start_date, end_date) if start_date and end_date else None
+        self.reload()
+
+    def date_range(self):
+        """(inicio, fin) del filtro de fechas actual, o (None, None) si se muestra todo."""
+        return self._date_range or (None, None)
+
+    def _append_days(self, summaries):
+        self._days.extend(summaries)
+        self._day_children.extend([None] * len(summaries))
+
+    def _load_day_children(self, day_row):
+        day_summary = self._days[day_row]
+        return self._build_day_children(day_summary, HistoryController.get_sale_items_for_day(day_summary['sale_date']))
+
+    def _build_day_children(self, day_summary, items):
+        children = []
+        for item in items:
+            children.append((
+                f"    🛍️ {item.get('product_name', 'N/A')}",
+                str(item.get('quantity', 0)),
+                f"${item.get('unit_sale_price_at_transaction', 0.0):.2f}",
+                f"${item.get('total_sale_price', 0.0):.2f}",
+                True,
+            ))
+        if not children:
+            children.append(("    (No se vendieron items individuales este día)", "", "", "", False))
+        # Resumen del día (no seleccionable), como en la versión anterior del historial.
+        children.append((f"    💵 Base del Día: ${day_summary.get('base_amount', 0.0):.2f}", "", "", "", False))
+        children.append((f"    💰 Total Ventas del Día: ${day_summary.get('total_day_sales_value', 0.0):.2f}", "", "", "", False))
+        children.append((f"    📈 Ganancias del Día: ${day_summary.get('net_profit', 0.0):.2f}", "", "", "", False))
+        return children
+
+    def apply_day_summaries(self, summaries):
+        """
+        Actualiza los días ya cargados con sus nuevos totales (y sus líneas, si estaban cargadas) e
+        inserta en su lugar los días que aún no estaban. Un día más antiguo que todos los cargados
+        se ignora si quedan páginas por pedir: llegará con fetchMore.
+        """
+        for summary in summaries:
+            sale_date = summary['sale_date']
+            if self._date_range is not None and not (self._date_range[0] <= sale_date <= self._date_range[1]):
+                continue
+            row = 0
+            while row < len(self._days) and self._days[row]['sale_date'] > sale_date:
+                row += 1
+            if row < len(self._days) and self._days[row]['sale_date'] == sale_date:
+                self._days[row] = summary
+                day_index = self.index(row, 0)
+                self.dataChanged.emit(day_index, self.index(row, len(HISTORY_HEADERS) - 1))
+                if self._day_children[row] is not None:
+                    self._replace_day_children(day_index, self._load_day_children(row))
+                continue
+            if row == len(self._days) and self._has_more_days:
+                continue
+            self._insert_day(row, summary)
+
+    def _insert_day(self, row, summary):
+        """
+        Inserta un día en medio de los cargados. Es un cambio de layout y no un insertRows porque
+        el internalId de las filas hijas guarda la fila de su día: hay que moverlo también en los
+        índices persistentes (selección, días expandidos).
+        """
+        self.layoutAboutToBeChanged.emit()
+        self._days.insert(row, summary)
+        self._day_children.insert(row, None)
+        old_indexes = self.persistentIndexList()
+        new_indexes = []
+        for old_index in old_indexes:
+            if old_index.internalId() == _DAY_NODE_ID:
+                day_row = old_index.row()
+                new_indexes.append(self.createIndex(day_row + (day_row >= row), old_index.column(), _DAY_NODE_ID))
+            else:
+                day_row = old_index.internalId() - 1
+                new_indexes.append(self.createIndex(old_index.row(), old_index.column(), day_row + (day_row >= row) + 1))
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+    def _replace_day_children(self, day_index, children):
+        day_row = day_index.row()
+        old_count = len(self._day_children[day_row])
+        self.beginRemoveRows(day_index, 0, old_count - 1)
+        self._day_children[day_row] = []
+        self.endRemoveRows()
+        self.beginInsertRows(day_index, 0, len(children) - 1)
+        self._day_children[day_row] = children
+        self.endInsertRows()
+
+    def is_empty(self):
+        return not self._days and not self._has_more_days
+
+    # --- Carga incremental ---
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return self._has_more_days
+        if parent.internalId() == _DAY_NODE_ID:
+            return self._day_children[parent.row()] is None
+        return False
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not parent.isValid():
+            if not self._has_more_days:
+                return
+            summaries, next_before_date = HistoryController.get_daily_summaries_page(
+                before_date=self._next_before_date, limit=DAYS_PAGE_SIZE
+            )
+            self._next_before_date = next_before_date
+            self._has_more_days = next_before_date is not None
+            if summaries:
+                first_row = len(self._days)
+                self.beginInsertRows(QModelIndex(), first_row, first_row + len(summaries) - 1)
+                self._append_days(summaries)
+                self.endInsertRows()
+            return
+        if parent.internalId() == _DAY_NODE_ID and self._day_children[parent.row()] is None:
+            children = self._load_day_children(parent.row())
+            self.beginInsertRows(parent, 0, len(children) - 1)
+            self._day_children[parent.row()] = children
+            self.endInsertRows()
+
+    # --- Interfaz de QAbstractItemModel ---
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, _DAY_NODE_ID)
+        return self.createIndex(row, column, parent.row() + 1)
+
+    def parent(self, index):
+        if not index.isValid() or index.internalId() == _DAY_NODE_ID:
+            return QModelIndex()
+        return self.createIndex(index.internalId() - 1, 0, _DAY_NODE_ID)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self._days)
+        if parent.internalId() == _DAY_NODE_ID and parent.column() == 0:
+            return len(self._day_children[parent.row()] or ())
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(HISTORY_HEADERS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return bool(self._days) or self._has_more_days
+        return parent.internalId() == _DAY_NODE_ID and parent.column() == 0
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        if index.internalId() == _DAY_NODE_ID:
+            return Qt.ItemIsEnabled # Fecha: no seleccionable
+        child = self._day_children[index.internalId() - 1][index.row()]
+        return (Qt.ItemIsEnabled | Qt.ItemIsSelectable) if child[4] else Qt.NoItemFlags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if index.internalId() == _DAY_NODE_ID:
+            day_summary = self._days[index.row()]
+            if role == Qt.DisplayRole:
+                if index.column() == 0:
+                    q_date_obj = QDate.fromString(day_summary['sale_date'], "yyyy-MM-dd")
+                    return q_date_obj.toString("dd/MM/yyyy") if q_date_obj.isValid() else day_summary['sale_date']
+                if index.column() == 3:
+                    return f"${day_summary.get('total_day_sales_value', 0.0):.2f}"
+                return None
+            if role == Qt.FontRole:
+                return self._bold_font
+            return None
+        if role == Qt.DisplayRole:
+            return self._day_children[index.internalId() - 1][index.row()][index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HISTORY_HEADERS[section]
+        return None
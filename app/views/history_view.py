@@ -1,22 +1,57 @@
 # app/views/history_view.py
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QTreeWidget, QTreeWidgetItem, QHeaderView,
-    QDateEdit, QPushButton, QMessageBox, QFrame # QFrame para agrupar filtros
+    QTreeView, QHeaderView, QAbstractItemView,
+    QDateEdit, QPushButton, QMessageBox, QFrame, # QFrame para agrupar filtros
+    QFileDialog, QProgressDialog
 )
-from PyQt5.QtCore import QDate, Qt
-from PyQt5.QtGui import QFont # Para poner texto en negrita
+from PyQt5.QtCore import QDate, Qt, QThreadPool, QTimer
 # Importar el controlador actualizado
-from app.controllers.history_controller import HistoryController # Usa los métodos estáticos
+from app.controllers.history_controller import HistoryController, EXPORT_FORMAT_CSV, EXPORT_FORMAT_NDJSON # Usa los métodos estáticos
+from .history_tree_model import HistoryTreeModel
+from .workers import FunctionWorker
+from app.models.change_events import SalePosted, HistoryCleared
+from .change_event_bridge import get_change_event_bridge
+
+# Las ventas que llegan juntas (p. ej. por la API) se aplican al historial en una sola consulta.
+SALE_EVENTS_COALESCE_MS = 200
 
 class HistoryView(QWidget):
     def __init__(self):
         super().__init__()
         # No es necesario instanciar el controlador si usas métodos estáticos
         # self.controller = HistoryController()
-        self.all_history_data_cache = {} # Cache para todos los datos del historial
+        # Modelo perezoso: resúmenes diarios por páginas, líneas vendidas al expandir cada día
+        self.history_model = HistoryTreeModel(self)
+        # La exportación corre fuera del hilo de la interfaz, una a la vez
+        self.export_thread_pool = QThreadPool(self)
+        self.export_thread_pool.setMaxThreadCount(1)
+        self.active_export_worker = None
+        self.export_progress_dialog = None
+        self.pending_sale_ids = []
+        self.sale_events_timer = QTimer(self)
+        self.sale_events_timer.setSingleShot(True)
+        self.sale_events_timer.setInterval(SALE_EVENTS_COALESCE_MS)
+        self.sale_events_timer.timeout.connect(self.apply_pending_sales)
         self.init_ui()
-        self.load_and_display_history() # Carga inicial de todo el historial
+        self.load_and_display_history() # Carga inicial (primera página de días)
+        get_change_event_bridge().connect_view(self.on_change_event)
+
+    def on_change_event(self, event):
+        """Ventas nuevas: se actualizan solo sus días. Historial borrado: se recarga (vacío)."""
+        if isinstance(event, SalePosted):
+            self.pending_sale_ids.append(event.sale_id)
+            if not self.sale_events_timer.isActive():
+                self.sale_events_timer.start()
+        elif isinstance(event, HistoryCleared):
+            self.pending_sale_ids = []
+            self.sale_events_timer.stop()
+            self.load_and_display_history()
+
+    def apply_pending_sales(self):
+        sale_ids, self.pending_sale_ids = self.pending_sale_ids, []
+        self.history_model.apply_day_summaries(HistoryController.get_daily_summaries_for_sales(sale_ids))
+        self.no_history_label.setVisible(self.history_model.is_empty())
 
     def init_ui(self):
         main_layout = QVBoxLayout(self)
@@ -46,8 +81,13 @@ class HistoryView(QWidget):
         date_filter_layout.addWidget(self.apply_date_filter_button)
 
         self.show_all_history_button = QPushButton("🔄 Mostrar Todo")
-        self.show_all_history_button.clicked.connect(self.load_and_display_history) # Recarga todo
+        self.show_all_history_button.clicked.connect(self.handle_show_all_history) # Quita el filtro
         date_filter_layout.addWidget(self.show_all_history_button)
+
+        self.export_history_button = QPushButton("📤 Exportar")
+        self.export_history_button.setToolTip("Exporta las ventas mostradas (fecha filtrada o todo) a CSV o NDJSON")
+        self.export_history_button.clicked.connect(self.handle_export_history)
+        date_filter_layout.addWidget(self.export_history_button)
         date_filter_layout.addStretch()
         filter_controls_layout.addLayout(date_filter_layout)
         # Aquí podrías añadir más filtros si es necesario (ej. por rango de fechas, etc.)
@@ -55,9 +95,10 @@ class HistoryView(QWidget):
         # --- Fin Sección de Filtros ---
 
         # --- Árbol para mostrar el Historial ---
-        self.history_tree_widget = QTreeWidget()
+        self.history_tree_widget = QTreeView()
         self.history_tree_widget.setObjectName("historyTree") # Para CSS
-        self.history_tree_widget.setHeaderLabels(["Fecha / Detalle de Venta", "Cantidad", "Precio Unit.", "Subtotal"])
+        self.history_tree_widget.setModel(self.history_model) # Encabezados definidos en el modelo
+        self.history_tree_widget.setUniformRowHeights(True) # Evita medir cada fila al desplazarse
         header = self.history_tree_widget.header()
         header.setSectionResizeMode(0, QHeaderView.Interactive)
         header.setSectionResizeMode(1, QHeaderView.Interactive)
@@ -70,9 +111,14 @@ class HistoryView(QWidget):
         header.setStretchLastSection(False) # Importante
 
         self.history_tree_widget.setAlternatingRowColors(True)
-        self.history_tree_widget.setEditTriggers(QTreeWidget.NoEditTriggers) # No editable
+        self.history_tree_widget.setEditTriggers(QAbstractItemView.NoEditTriggers) # No editable
         # self.history_tree_widget.doubleClicked.connect(self.show_details_for_selected_item) # Si quieres detalles al doble clic
         main_layout.addWidget(self.history_tree_widget)
+
+        self.no_history_label = QLabel("No hay historial de ventas disponible.")
+        self.no_history_label.setAlignment(Qt.AlignCenter)
+        self.no_history_label.hide()
+        main_layout.addWidget(self.no_history_label)
         # --- Fin Árbol de Historial ---
 
         # --- Botón para Borrar Historial ---
@@ -88,86 +134,92 @@ class HistoryView(QWidget):
         self.setLayout(main_layout)
 
     def load_and_display_history(self, date_to_filter_ymd=None): # date_to_filter_ymd en formato 'YYYY-MM-DD'
-        """Carga todos los datos del historial y los muestra, opcionalmente filtrados por una fecha."""
-        if not self.all_history_data_cache or date_to_filter_ymd is None: # Cargar del controlador solo si no hay cache o se pide todo
-            self.all_history_data_cache = HistoryController.get_formatted_sales_history()
+        """
+        Recarga el historial desde la primera página de días, opcionalmente limitado a una fecha.
+        Solo se consultan los resúmenes diarios; el detalle de cada día se carga al expandirlo.
+        """
+        if date_to_filter_ymd:
+            self.history_model.set_date_range(date_to_filter_ymd, date_to_filter_ymd)
+        else:
+            self.history_model.reload() # Mantiene el filtro actual, si lo hay
+        self.no_history_label.setVisible(self.history_model.is_empty())
+        if date_to_filter_ymd and self.history_model.rowCount() > 0:
+            # Con una sola fecha filtrada, mostrar su detalle directamente
+            self.history_tree_widget.expand(self.history_model.index(0, 0))
+
+    def handle_apply_date_filter(self):
+        """Aplica el filtro por la fecha seleccionada en QDateEdit."""
+        selected_qdate = self.date_filter_edit.date()
+        date_to_filter_ymd_str = selected_qdate.toString("yyyy-MM-dd") # Formato YYYY-MM-DD
+        self.load_and_display_history(date_to_filter_ymd=date_to_filter_ymd_str)
 
-        self.history_tree_widget.clear() # Limpiar el árbol
+    def handle_show_all_history(self):
+        """Quita el filtro de fecha y vuelve a paginar todo el historial."""
+        self.history_model.set_date_range()
+        self.no_history_label.setVisible(self.history_model.is_empty())
 
-        if not self.all_history_data_cache:
-            # Opcional: Mostrar un mensaje en el árbol si no hay historial
-            no_data_item = QTreeWidgetItem(self.history_tree_widget, ["No hay historial de ventas disponible."])
+    def handle_export_history(self):
+        """Pide el archivo destino y exporta en segundo plano, con diálogo de progreso."""
+        if self.active_export_worker is not None:
+            return
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Exportar Historial de Ventas", "historial_ventas.csv",
+            "CSV (*.csv);;NDJSON (*.ndjson)"
+        )
+        if not file_path:
             return
+        if selected_filter.startswith("NDJSON") or file_path.lower().endswith(".ndjson"):
+            export_format = EXPORT_FORMAT_NDJSON
+        else:
+            export_format = EXPORT_FORMAT_CSV
+        start_date, end_date = self.history_model.date_range()
 
-        # Ordenar las fechas (claves del diccionario) de forma descendente
-        try:
-            sorted_dates_ymd = sorted(
-                self.all_history_data_cache.keys(),
-                key=lambda d: QDate.fromString(d, "yyyy-MM-dd"),
-                reverse=True
-            )
-        except Exception: # Fallback si las fechas no son parseables (no debería ocurrir)
-            sorted_dates_ymd = sorted(self.all_history_data_cache.keys(), reverse=True)
-
-
-        bold_font = QFont()
-        bold_font.setBold(True)
-
-        for sale_date_ymd_str in sorted_dates_ymd:
-            if date_to_filter_ymd and sale_date_ymd_str != date_to_filter_ymd:
-                continue # Omitir si no es la fecha filtrada
-
-            daily_sale_data = self.all_history_data_cache[sale_date_ymd_str]
-            
-            # Formatear fecha a DD/MM/YYYY para mostrar
-            q_date_obj = QDate.fromString(sale_date_ymd_str, "yyyy-MM-dd")
-            display_date_str = q_date_obj.toString("dd/MM/yyyy") if q_date_obj.isValid() else sale_date_ymd_str
-
-            # Crear el item principal para la fecha
-            date_tree_item = QTreeWidgetItem(self.history_tree_widget, [display_date_str])
-            date_tree_item.setFont(0, bold_font) # Fecha en negrita
-            date_tree_item.setFlags(date_tree_item.flags() & ~Qt.ItemIsSelectable) # No seleccionable como tal
-
-            # Añadir los items de producto vendidos ese día
-            if daily_sale_data.get('items'):
-                for item_detail in daily_sale_data['items']:
-                    # Formato: ["  Producto", "Cantidad", "Precio Unit.", "Subtotal"]
-                    product_sub_item = QTreeWidgetItem(date_tree_item)
-                    product_sub_item.setText(0, f"    🛍️ {item_detail.get('product_name', 'N/A')}") # Nombre indentado
-                    product_sub_item.setText(1, str(item_detail.get('quantity', 0)))
-                    product_sub_item.setText(2, f"${item_detail.get('unit_sale_price_at_transaction', 0.0):.2f}")
-                    product_sub_item.setText(3, f"${item_detail.get('total_sale_price', 0.0):.2f}")
-            else:
-                no_items_today = QTreeWidgetItem(date_tree_item, ["    (No se vendieron items individuales este día)"])
-                no_items_today.setDisabled(True)
+        self.export_progress_dialog = QProgressDialog("Exportando historial de ventas...", "Cancelar", 0, 0, self)
+        self.export_progress_dialog.setWindowTitle("Exportar")
+        self.export_progress_dialog.setWindowModality(Qt.WindowModal)
+        self.export_progress_dialog.setMinimumDuration(300)
+        self.export_progress_dialog.canceled.connect(self.cancel_export)
 
+        worker = FunctionWorker(
+            HistoryController.export_sales_history, file_path, start_date, end_date, export_format,
+            with_progress=True
+        )
+        worker.signals.progress.connect(self.on_export_progress)
+        worker.signals.finished.connect(lambda written, path=file_path: self.on_export_finished(written, path))
+        worker.signals.failed.connect(self.on_export_failed)
+        self.active_export_worker = worker
+        self.export_history_button.setEnabled(False)
+        self.export_thread_pool.start(worker)
 
-            # Añadir la información de resumen del día (Base, Total Ventas, Ganancias)
-            summary_font = QFont() # Podría ser diferente si quieres
-            # summary_font.setItalic(True)
+    def on_export_progress(self, written_lines, total_lines):
+        if self.export_progress_dialog is not None:
+            self.export_progress_dialog.setMaximum(max(total_lines, 1))
+            self.export_progress_dialog.setValue(min(written_lines, max(total_lines, 1)))
 
-            base_amount_str = f"    💵 Base del Día: ${daily_sale_data.get('base_amount', 0.0):.2f}"
-            base_info_item = QTreeWidgetItem(date_tree_item, [base_amount_str])
-            base_info_item.setFont(0, summary_font)
-            base_info_item.setDisabled(True) # No interactuable
+    def on_export_finished(self, written_lines, file_path):
+        self.finish_export()
+        if written_lines is None:
+            QMessageBox.critical(self, "Error de Exportación", "No se pudo exportar el historial de ventas.")
+        else:
+            QMessageBox.information(self, "Exportación Completa", f"Se exportaron {written_lines} líneas a:\n{file_path}")
 
-            total_sales_str = f"    💰 Total Ventas del Día: ${daily_sale_data.get('total_day_sales_value', 0.0):.2f}"
-            total_sales_item = QTreeWidgetItem(date_tree_item, [total_sales_str])
-            total_sales_item.setFont(0, summary_font)
-            total_sales_item.setDisabled(True)
+    def on_export_failed(self, error_message):
+        self.finish_export()
+        QMessageBox.critical(self, "Error de Exportación", f"No se pudo exportar el historial de ventas.\n{error_message}")
 
-            profit_str = f"    📈 Ganancias del Día: ${daily_sale_data.get('net_profit', 0.0):.2f}"
-            profit_item = QTreeWidgetItem(date_tree_item, [profit_str])
-            profit_item.setFont(0, summary_font)
-            profit_item.setDisabled(True)
-            
-            self.history_tree_widget.expandItem(date_tree_item) # Expandir por defecto para ver detalles
+    def cancel_export(self):
+        if self.active_export_worker is not None:
+            self.active_export_worker.cancel() # Se detiene tras el lote en curso; el archivo queda incompleto
+        self.finish_export()
+        QMessageBox.information(self, "Exportación Cancelada", "La exportación fue cancelada; el archivo quedó incompleto.")
 
-    def handle_apply_date_filter(self):
-        """Aplica el filtro por la fecha seleccionada en QDateEdit."""
-        selected_qdate = self.date_filter_edit.date()
-        date_to_filter_ymd_str = selected_qdate.toString("yyyy-MM-dd") # Formato YYYY-MM-DD
-        self.load_and_display_history(date_to_filter_ymd=date_to_filter_ymd_str)
+    def finish_export(self):
+        self.active_export_worker = None
+        self.export_history_button.setEnabled(True)
+        if self.export_progress_dialog is not None:
+            dialog, self.export_progress_dialog = self.export_progress_dialog, None
+            dialog.canceled.disconnect(self.cancel_export) # close() no debe contarse como cancelación
+            dialog.close()
 
     def handle_confirm_delete_all_history(self):
         """Pide confirmación y luego borra todo el historial de ventas."""
@@ -185,12 +237,10 @@ class HistoryView(QWidget):
             success = HistoryController.clear_all_sales_history()
             if success:
                 QMessageBox.information(self, "Historial Eliminado", "Todo el historial de ventas ha sido eliminado.")
-                self.all_history_data_cache.clear() # Limpiar cache
-                self.load_and_display_history() # Recargar la vista (mostrará que está vacía)
             else:
                 QMessageBox.critical(self, "Error de Eliminación", "No se pudo eliminar el historial de ventas.")
 
-    # La función show_sale_details que tenías antes no aplica directamente al QTreeWidget
+    # La función show_sale_details que tenías antes no aplica directamente al árbol
     # de la misma manera. Si quieres ver detalles de una venta específica (un grupo de items bajo una fecha),
     # podrías implementar algo al hacer doble clic en un item de producto dentro del árbol,
     # pero la información principal ya está visible.
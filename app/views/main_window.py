@@ -171,29 +171,9 @@ class MainWindow(QMainWindow):
         return button
 
     def switch_view(self, index, clicked_button):
-        """Cambia la vista en el QStackedWidget, actualiza el estilo del botón activo,
-           y refresca los datos de la vista que se va a mostrar si es necesario."""
-        
-        # --- LÓGICA DE REFRESCO AÑADIDA AQUÍ ---
-        if index == 0: # SalesView (Índice 0)
-            if hasattr(self, 'sales_view_instance') and self.sales_view_instance:
-                print("MainWindow: Refrescando productos para SalesView...")
-                self.sales_view_instance.load_products_for_autocompleter_and_cache()
-                self.sales_view_instance.display_low_stock_warning() # También refrescar aviso
-
-        elif index == 1: # ProductsView (Índice 1)
-            if hasattr(self, 'products_view_instance') and self.products_view_instance:
-                print("MainWindow: Refrescando tabla de productos en ProductsView...")
-                self.products_view_instance.load_products_and_setup_completer() # Este método debe recargar todo
-
-        elif index == 2: # HistoryView (Índice 2)
-            if hasattr(self, 'history_view_instance') and self.history_view_instance:
-                print("MainWindow: Refrescando historial de ventas en HistoryView...")
-                if hasattr(self.history_view_instance, 'all_history_data_cache'): # Verificar si el cache existe
-                    self.history_view_instance.all_history_data_cache.clear()
-                self.history_view_instance.load_and_display_history()
-        # --- FIN LÓGICA DE REFRESCO ---
-        
+        """Cambia la vista en el QStackedWidget y actualiza el estilo del botón activo.
+           No se recarga nada: cada vista se mantiene al día con los eventos de cambios
+           (app.views.change_event_bridge), incluidos los hechos desde la API."""
         self.content_display_area.setCurrentIndex(index) # Cambiar la vista actual
         
         # Actualizar estilos de los botones del sidebar
@@ -0,0 +1,197 @@
+# app/views/product_table_model.py
+"""
+Modelo de tabla para la grilla de productos.
+
+Guarda los productos como columnas (una secuencia por campo) en lugar de una fila de
+QTableWidgetItem por celda: el texto de cada celda se formatea solo cuando la vista lo pide
+en data(), y las filas se entregan a la vista por lotes (canFetchMore/fetchMore).
+El ordenamiento y el filtro por estado pasan por ProductSortFilterProxyModel.
+Los cambios avisados por el bus de eventos se aplican con update_products, solo en las filas tocadas.
+"""
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+
+# (encabezado, campo del producto)
+PRODUCT_TABLE_COLUMNS = (
+    ("ID", "id"),
+    ("Nombre Producto", "name"),
+    ("Cant. Disp.", "quantity_available"),
+    ("Precio Compra", "purchase_price"),
+    ("Precio Venta", "sale_price"),
+    ("Estado", "is_active"),
+)
+PRODUCT_FIELDS = tuple(field for _, field in PRODUCT_TABLE_COLUMNS)
+FETCH_BATCH_SIZE = 500 # Filas que se añaden a la vista cada vez que pide más
+
+STATUS_FILTER_ALL = "all"
+STATUS_FILTER_ACTIVE = "active"
+STATUS_FILTER_INACTIVE = "inactive"
+
+
+def columns_from_products(products):
+    """Convierte una lista de productos (dicts o sqlite3.Row) en columnas {campo: lista}."""
+    return {field: [product[field] for product in products] for field in PRODUCT_FIELDS}
+
+
+class ProductTableModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._columns = columns_from_products([])
+        self._total_rows = 0
+        self._loaded_rows = 0 # Filas ya expuestas a la vista
+        self._row_by_id = None # id -> fila; se arma al primer update_products tras cada carga u orden
+
+    # --- Datos ---
+
+    def set_snapshot(self, columns):
+        """Reemplaza todos los productos por un nuevo juego de columnas {campo: secuencia}."""
+        self.beginResetModel()
+        self._columns = {field: columns[field] for field in PRODUCT_FIELDS}
+        self._total_rows = len(self._columns['id'])
+        self._loaded_rows = min(self._total_rows, FETCH_BATCH_SIZE)
+        self._row_by_id = None
+        self.endResetModel()
+
+    def set_products(self, products):
+        self.set_snapshot(columns_from_products(products))
+
+    def update_products(self, products, append_missing=False):
+        """
+        Actualiza en su lugar las filas de estos productos (dicts con todos los campos) y avisa a
+        la vista solo por esas filas. Los que no están en la tabla se agregan al final si
+        append_missing (tabla con el catálogo completo); si no, se ignoran (p. ej. una búsqueda).
+        """
+        if self._row_by_id is None:
+            self._row_by_id = {product_id: row for row, product_id in enumerate(self._columns['id'])}
+        last_column = len(PRODUCT_TABLE_COLUMNS) - 1
+        for product in products:
+            row = self._row_by_id.get(product['id'])
+            if row is not None:
+                for field in PRODUCT_FIELDS:
+                    self._columns[field][row] = product[field]
+                if row < self._loaded_rows:
+                    self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+            elif append_missing:
+                row = self._total_rows
+                all_rows_loaded = self._loaded_rows == self._total_rows
+                if all_rows_loaded:
+                    self.beginInsertRows(QModelIndex(), row, row)
+                for field in PRODUCT_FIELDS:
+                    self._columns[field].append(product[field])
+                self._row_by_id[product['id']] = row
+                self._total_rows += 1
+                if all_rows_loaded: # Si no, la fila llega a la vista con el próximo fetchMore
+                    self._loaded_rows += 1
+                    self.endInsertRows()
+
+    def value_at(self, row, field):
+        return self._columns[field][row]
+
+    def total_row_count(self):
+        return self._total_rows
+
+    def sort_snapshot(self, column, order=Qt.AscendingOrder):
+        """Reordena las columnas completas (no solo las filas cargadas) por la columna indicada."""
+        field = PRODUCT_TABLE_COLUMNS[column][1]
+        values = self._columns[field]
+        sort_key = (lambda row: values[row].lower()) if field == 'name' else values.__getitem__
+        permutation = sorted(range(self._total_rows), key=sort_key, reverse=(order == Qt.DescendingOrder))
+        self.layoutAboutToBeChanged.emit()
+        self._columns = {name: [column_values[row] for row in permutation] for name, column_values in self._columns.items()}
+        self._row_by_id = None
+        # Mantener la selección sobre el mismo producto aunque cambie de fila.
+        new_row_by_old_row = {old_row: new_row for new_row, old_row in enumerate(permutation)}
+        old_indexes = self.persistentIndexList()
+        new_indexes = []
+        for old_index in old_indexes:
+            new_row = new_row_by_old_row.get(old_index.row(), -1)
+            new_indexes.append(self.index(new_row, old_index.column()) if 0 <= new_row < self._loaded_rows else QModelIndex())
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+    # --- Interfaz de QAbstractTableModel ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded_rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(PRODUCT_TABLE_COLUMNS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded_rows < self._total_rows
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        new_loaded_rows = min(self._total_rows, self._loaded_rows + FETCH_BATCH_SIZE)
+        if new_loaded_rows == self._loaded_rows:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded_rows, new_loaded_rows - 1)
+        self._loaded_rows = new_loaded_rows
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        field = PRODUCT_TABLE_COLUMNS[index.column()][1]
+        value = self._columns[field][index.row()]
+        if role == Qt.DisplayRole:
+            if field in ('purchase_price', 'sale_price'):
+                return f"${value:.2f}"
+            if field == 'is_active':
+                return "Activo" if value else "Inactivo"
+            return str(value)
+        if role == Qt.UserRole: # Valor sin formato
+            return value
+        if role == Qt.TextAlignmentRole and field in ('id', 'quantity_available', 'purchase_price', 'sale_price'):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return PRODUCT_TABLE_COLUMNS[section][0]
+        return super().headerData(section, orientation, role)
+
+
+class ProductSortFilterProxyModel(QSortFilterProxyModel):
+    """
+    Filtra por estado (todos / activos / inactivos) y ordena por columna.
+    El orden se delega a ProductTableModel.sort_snapshot, que ordena el juego completo de
+    columnas de una vez, en lugar de comparar celda por celda solo las filas ya cargadas.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.status_filter = STATUS_FILTER_ALL
+        self.sort_column = -1 # -1: orden en que llegaron los productos (nombre o relevancia)
+        self.sort_order = Qt.AscendingOrder
+
+    def set_status_filter(self, status_filter):
+        if status_filter != self.status_filter:
+            self.status_filter = status_filter
+            self.invalidateFilter()
+            self.fetch_until_rows(FETCH_BATCH_SIZE)
+
+    def fetch_until_rows(self, minimum_rows):
+        """
+        Pide lotes al modelo base hasta que el filtro deje pasar `minimum_rows` filas o no queden
+        más. Sin esto, un filtro que descarta casi todo el primer lote dejaría la grilla vacía
+        aunque haya coincidencias más abajo (la vista solo pide más al llegar al final).
+        """
+        source_model = self.sourceModel()
+        while self.rowCount() < minimum_rows and source_model.canFetchMore():
+            source_model.fetchMore()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.status_filter == STATUS_FILTER_ALL:
+            return True
+        is_active = bool(self.sourceModel().value_at(source_row, 'is_active'))
+        return is_active if self.status_filter == STATUS_FILTER_ACTIVE else not is_active
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column, self.sort_order = column, order
+        self.apply_current_sort()
+
+    def apply_current_sort(self):
+        """Vuelve a aplicar el orden elegido por el usuario (p. ej. tras cargar otros productos)."""
+        if self.sort_column >= 0:
+            self.sourceModel().sort_snapshot(self.sort_column, self.sort_order)
+        self.fetch_until_rows(FETCH_BATCH_SIZE)
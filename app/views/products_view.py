@@ -1,13 +1,26 @@
 # app/views/products_view.py
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox,
-    QDialog, QFormLayout, QSpinBox, QDoubleSpinBox, QCheckBox, QFrame,
-    QCompleter # <--- IMPORTACIÓN IMPORTANTE
+    QPushButton, QTableView, QHeaderView, QMessageBox, QAbstractItemView,
+    QDialog, QFormLayout, QSpinBox, QDoubleSpinBox, QCheckBox, QFrame, QComboBox,
+    QCompleter, # <--- IMPORTACIÓN IMPORTANTE
+    QFileDialog, QProgressDialog
 )
-from PyQt5.QtCore import Qt, QStringListModel, QEvent # QStringListModel para el QCompleter
+from PyQt5.QtCore import Qt, QStringListModel, QEvent, QTimer, QThreadPool # QStringListModel para el QCompleter
 from PyQt5.QtGui import QPalette, QColor, QIntValidator, QDoubleValidator, QValidator 
-from app.controllers.products_controller import ProductsController
+from app.controllers.products_controller import ProductsController, PRODUCT_VIEW_SEARCH_LIMIT, DEFAULT_REORDER_POINT
+from .workers import FunctionWorker
+from app.models.change_events import ProductsUpserted, StockChanged
+from .change_event_bridge import get_change_event_bridge
+from .product_table_model import (
+    ProductTableModel, ProductSortFilterProxyModel,
+    STATUS_FILTER_ALL, STATUS_FILTER_ACTIVE, STATUS_FILTER_INACTIVE
+)
+
+# Espera tras la última tecla antes de buscar, para no consultar en cada pulsación.
+SEARCH_DEBOUNCE_MS = 250
+# Errores de importación que se listan en el resumen (el resto solo se cuenta).
+IMPORT_ERRORS_SHOWN = 10
 # ProductFormDialog debería estar aquí o importado si está en dialogs.py
 # class ProductFormDialog(QDialog): ... (como lo teníamos antes)
 
@@ -70,6 +83,16 @@ class ProductFormDialog(QDialog):
         self.sale_price_lineedit.setValidator(self.sale_price_validator)
         form_layout.addRow("Precio de Venta ($):", self.sale_price_lineedit)
 
+        # Umbral de la alerta de stock bajo y cantidad sugerida al reponer (0 = sin sugerencia).
+        self.reorder_point_spinbox = QSpinBox()
+        self.reorder_point_spinbox.setRange(0, 99999)
+        self.reorder_point_spinbox.setValue(DEFAULT_REORDER_POINT)
+        form_layout.addRow("Punto de Reorden:", self.reorder_point_spinbox)
+
+        self.reorder_qty_spinbox = QSpinBox()
+        self.reorder_qty_spinbox.setRange(0, 99999)
+        form_layout.addRow("Cantidad a Pedir:", self.reorder_qty_spinbox)
+
         for le in [self.quantity_lineedit, self.purchase_price_lineedit, self.sale_price_lineedit]:
             le.installEventFilter(self)
             le.textChanged.connect(lambda text, line_edit=le: self.update_lineedit_appearance(line_edit))
@@ -148,6 +171,11 @@ class ProductFormDialog(QDialog):
                 sale_price_val = self.product_data_to_edit['sale_price']
             # --- CAMBIO AQUÍ ---
             self.sale_price_lineedit.setText(f"{float(sale_price_val):.2f}")
+
+            if 'reorder_point' in self.product_data_to_edit.keys():
+                self.reorder_point_spinbox.setValue(self.product_data_to_edit['reorder_point'])
+            if 'reorder_qty' in self.product_data_to_edit.keys():
+                self.reorder_qty_spinbox.setValue(self.product_data_to_edit['reorder_qty'])
             
             # Actualizar apariencia después de poblar
             self.update_lineedit_appearance(self.quantity_lineedit)
@@ -231,7 +259,9 @@ class ProductFormDialog(QDialog):
         print(f"DEBUG get_data - Datos validados: Cant: {quantity}, Compra: {purchase_price}, Venta: {sale_price}") # DEBUG FINAL
         
         return {'name': name, 'quantity_available': quantity,
-                'purchase_price': purchase_price, 'sale_price': sale_price}
+                'purchase_price': purchase_price, 'sale_price': sale_price,
+                'reorder_point': self.reorder_point_spinbox.value(),
+                'reorder_qty': self.reorder_qty_spinbox.value()}
 
     def on_accept_data(self):
         if self.get_data() is not None:
@@ -244,8 +274,30 @@ class ProductsView(QWidget):
         super().__init__()
         self.current_selected_product_id = None
         self.all_product_names_cache = [] # Cache de nombres para el completer
+        self.loaded_catalog_version = None # Versión del catálogo mostrada en la tabla
+        self.displayed_low_stock_version = None # Versión del conjunto de stock bajo mostrada en el aviso
+
+        # Búsqueda en segundo plano: un solo hilo, así una búsqueda vieja nunca adelanta a una nueva.
+        self.search_thread_pool = QThreadPool(self)
+        self.search_thread_pool.setMaxThreadCount(1)
+        self.search_debounce_timer = QTimer(self)
+        self.search_debounce_timer.setSingleShot(True)
+        self.search_debounce_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_debounce_timer.timeout.connect(self.run_product_search)
+        self.search_generation = 0        # Aumenta con cada búsqueda; las respuestas viejas se descartan
+        self.active_search_worker = None
+        self.last_search_term = None      # Término y resultados de la última búsqueda mostrada,
+        self.last_search_results = None   # para filtrarlos en memoria si el nuevo término los extiende (ver remember_search_results)
+        # La importación masiva corre fuera del hilo de la interfaz, una a la vez
+        self.import_thread_pool = QThreadPool(self)
+        self.import_thread_pool.setMaxThreadCount(1)
+        self.active_import_worker = None
+        self.import_cancel_requested = False # Se pidió cancelar; se espera el resultado real
+        self.import_progress_dialog = None
         self.setup_ui()
         self.load_products_and_setup_completer() # Carga inicial y configuración del completer
+        # Altas, ediciones y ventas (de esta ventana o de la API) llegan como eventos en cola.
+        get_change_event_bridge().connect_view(self.on_change_event)
 
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -261,6 +313,14 @@ class ProductsView(QWidget):
         self.add_product_button.setStyleSheet("padding: 7px 10px; font-size: 10pt;")
         self.add_product_button.clicked.connect(self.open_add_product_dialog)
         title_bar_layout.addWidget(self.add_product_button)
+        self.import_products_button = QPushButton("📥 Importar")
+        self.import_products_button.setStyleSheet("padding: 7px 10px; font-size: 10pt;")
+        self.import_products_button.setToolTip(
+            "Importa productos desde CSV o JSON (name, quantity_available, sale_price, purchase_price).\n"
+            "Si el nombre ya existe, se actualizan su stock y precios."
+        )
+        self.import_products_button.clicked.connect(self.handle_import_products)
+        title_bar_layout.addWidget(self.import_products_button)
         layout.addLayout(title_bar_layout)
 
         search_layout = QHBoxLayout()
@@ -276,7 +336,21 @@ class ProductsView(QWidget):
         
         self.search_input_lineedit.textChanged.connect(self.filter_products_by_name_in_table) # Filtra la tabla en tiempo real
         search_layout.addWidget(self.search_input_lineedit)
+        search_layout.addWidget(QLabel("Mostrar:"))
+        self.status_filter_combobox = QComboBox()
+        self.status_filter_combobox.addItem("Todos", STATUS_FILTER_ALL)
+        self.status_filter_combobox.addItem("Activos", STATUS_FILTER_ACTIVE)
+        self.status_filter_combobox.addItem("Inactivos", STATUS_FILTER_INACTIVE)
+        self.status_filter_combobox.currentIndexChanged.connect(self.on_status_filter_changed)
+        search_layout.addWidget(self.status_filter_combobox)
         layout.addLayout(search_layout)
+        # Aviso cuando la búsqueda tiene más coincidencias de las que se muestran
+        self.search_truncated_label = QLabel(
+            f"Se muestran los primeros {PRODUCT_VIEW_SEARCH_LIMIT} resultados; escriba un nombre más específico para ver el resto."
+        )
+        self.search_truncated_label.setStyleSheet("color: #8a6d3b; font-style: italic;")
+        self.search_truncated_label.hide()
+        layout.addWidget(self.search_truncated_label)
 
         self.low_stock_warning_frame = QFrame()
         self.low_stock_warning_frame.setObjectName("lowStockWarning")
@@ -297,17 +371,24 @@ class ProductsView(QWidget):
         """)
         layout.addWidget(self.low_stock_warning_frame)
 
-        self.products_tablewidget = QTableWidget()
-        self.products_tablewidget.setColumnCount(6)
-        self.products_tablewidget.setHorizontalHeaderLabels(["ID", "Nombre Producto", "Cant. Disp.", "Precio Compra", "Precio Venta", "Estado"])
-        header = self.products_tablewidget.horizontalHeader()
+        # Grilla virtualizada: las celdas se formatean al pintarse y las filas se cargan por lotes.
+        self.products_table_model = ProductTableModel(self)
+        self.products_proxy_model = ProductSortFilterProxyModel(self)
+        self.products_proxy_model.setSourceModel(self.products_table_model)
+        self.products_tableview = QTableView()
+        self.products_tableview.setModel(self.products_proxy_model)
+        header = self.products_tableview.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.Stretch)
         for i in [0, 2, 5]: header.setSectionResizeMode(i, QHeaderView.ResizeToContents)
-        self.products_tablewidget.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.products_tablewidget.setSelectionBehavior(QTableWidget.SelectRows)
-        self.products_tablewidget.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
-        self.products_tablewidget.itemSelectionChanged.connect(self.on_product_selection_changed)
-        layout.addWidget(self.products_tablewidget)
+        header.setResizeContentsPrecision(0) # Medir solo las filas visibles, no todas las cargadas
+        header.setSortIndicator(-1, Qt.AscendingOrder) # Sin orden de columna: el de llegada (nombre/relevancia)
+        self.products_tableview.setSortingEnabled(True)
+        self.products_tableview.verticalHeader().setVisible(False)
+        self.products_tableview.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.products_tableview.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.products_tableview.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.products_tableview.selectionModel().selectionChanged.connect(self.on_product_selection_changed)
+        layout.addWidget(self.products_tableview)
 
         action_buttons_layout = QHBoxLayout()
         self.edit_product_button = QPushButton("✏️ Editar")
@@ -325,57 +406,160 @@ class ProductsView(QWidget):
     def update_completer_model(self):
         """Actualiza el modelo de datos para el QCompleter."""
         # Obtener todos los nombres de productos (activos e inactivos) para las sugerencias de búsqueda
-        all_products_for_completer = ProductsController.get_all_products_for_management_view()
-        self.all_product_names_cache = [p['name'] for p in all_products_for_completer] if all_products_for_completer else []
+        self.all_product_names_cache = ProductsController.get_product_names_for_completer()
         
         completer_model = QStringListModel(self.all_product_names_cache)
         self.products_view_completer.setModel(completer_model)
 
     def load_products_and_setup_completer(self, search_term=None):
         """Carga productos en la tabla y actualiza el modelo del completer."""
-        self.products_tablewidget.setRowCount(0)
+        self.cancel_pending_search()
+        self.loaded_catalog_version = ProductsController.get_catalog_version()
         
         if search_term:
-            products_data = ProductsController.search_products_for_management_view(search_term)
+            products_data, truncated = ProductsController.search_products_for_management_view(search_term)
+            self.remember_search_results(search_term, products_data, truncated)
+            self.populate_products_table(products_data, truncated)
         else:
-            products_data = ProductsController.get_all_products_for_management_view()
+            self.remember_search_results(None, None)
+            self.populate_products_table_snapshot(ProductsController.get_products_snapshot_for_management_view())
 
-        if not products_data:
-            self.update_completer_model() # Actualizar completer incluso si la tabla está vacía (para que sepa todos los nombres)
-            self.check_and_display_low_stock()
-            return
-
-        for row_index, product_row in enumerate(products_data):
-            self.products_tablewidget.insertRow(row_index)
-            self.products_tablewidget.setItem(row_index, 0, QTableWidgetItem(str(product_row['id'])))
-            self.products_tablewidget.setItem(row_index, 1, QTableWidgetItem(product_row['name']))
-            self.products_tablewidget.setItem(row_index, 2, QTableWidgetItem(str(product_row['quantity_available'])))
-            self.products_tablewidget.setItem(row_index, 3, QTableWidgetItem(f"${product_row['purchase_price']:.2f}"))
-            self.products_tablewidget.setItem(row_index, 4, QTableWidgetItem(f"${product_row['sale_price']:.2f}"))
-            status_text = "Activo" if product_row['is_active'] else "Inactivo"
-            status_item = QTableWidgetItem(status_text)
-            self.products_tablewidget.setItem(row_index, 5, status_item)
+        self.update_completer_model() # Actualizar el modelo del QCompleter
+        self.check_and_display_low_stock()
 
+    def populate_products_table(self, products_data, truncated=False):
+        """
+        Muestra en la grilla la lista de productos recibida (p. ej. resultados de búsqueda).
+        truncated: la búsqueda tenía más coincidencias; se muestra el aviso.
+        """
+        self.clear_product_selection()
+        self.search_truncated_label.setVisible(truncated)
+        self.products_table_model.set_products(products_data or [])
+        self.products_proxy_model.apply_current_sort()
+
+    def populate_products_table_snapshot(self, product_columns):
+        """Muestra en la grilla un juego de columnas {campo: lista} (catálogo completo)."""
+        self.clear_product_selection()
+        self.search_truncated_label.hide()
+        self.products_table_model.set_snapshot(product_columns)
+        self.products_proxy_model.apply_current_sort()
+
+    def clear_product_selection(self):
         self.current_selected_product_id = None
         self.edit_product_button.setEnabled(False)
         self.delete_restore_button.setEnabled(False)
         self.delete_restore_button.setText("🗑️ Desactivar")
-        
-        self.update_completer_model() # Actualizar el modelo del QCompleter
+
+    def on_status_filter_changed(self):
+        self.products_proxy_model.set_status_filter(self.status_filter_combobox.currentData())
+
+    def on_change_event(self, event):
+        """Aplica un cambio del bus: solo las filas de los productos tocados, o todo si fue masivo."""
+        if not isinstance(event, (ProductsUpserted, StockChanged)):
+            return
+        if event.product_ids is None:
+            self.refresh_products_if_catalog_changed()
+            return
+        products = [product for product in map(ProductsController.get_product_details, event.product_ids) if product]
+        self.loaded_catalog_version = ProductsController.get_catalog_version()
+        self.products_table_model.update_products(products, append_missing=self.last_search_term is None)
+        self.remember_search_results(self.last_search_term, None) # Los resultados guardados ya no sirven para filtrar
+        if isinstance(event, ProductsUpserted):
+            self.update_completer_model() # Pudo cambiar un nombre o agregarse un producto
+        if self.current_selected_product_id in event.product_ids:
+            self.on_product_selection_changed() # El estado del seleccionado pudo cambiar
         self.check_and_display_low_stock()
 
+    def refresh_products_if_catalog_changed(self):
+        """Recarga la tabla (con el filtro actual) solo si el catálogo cambió desde la última carga."""
+        if ProductsController.get_catalog_version() != self.loaded_catalog_version:
+            self.load_products_and_setup_completer(search_term=self.search_input_lineedit.text().strip() or None)
+
     def filter_products_by_name_in_table(self): # Renombrado para claridad
-        """Filtra los productos en la tabla según el texto de búsqueda."""
+        """Se llama en cada tecla: solo reinicia la espera; la búsqueda corre al dejar de escribir."""
+        self.search_debounce_timer.start()
+
+    def run_product_search(self):
+        """
+        Filtra la tabla según el texto de búsqueda sin bloquear la interfaz.
+        Si el término extiende el anterior y aquellos resultados se guardaron para filtrar (ver
+        remember_search_results), se filtran en memoria; si no, se busca en un hilo de fondo y solo
+        se muestra la respuesta más reciente.
+        """
         search_term = self.search_input_lineedit.text().strip()
-        # No necesitamos actualizar el completer aquí, solo la tabla.
-        # El completer se actualiza cuando se cargan todos los productos.
-        self.load_products_and_setup_completer(search_term=search_term)
+        self.cancel_pending_search()
 
+        if not search_term:
+            self.remember_search_results(None, None)
+            self.populate_products_table_snapshot(ProductsController.get_products_snapshot_for_management_view())
+            return
 
-    def check_and_display_low_stock(self, threshold=5):
-        low_stock_products = ProductsController.get_low_stock_products_for_alert(threshold=threshold)
+        narrowed_results = self.narrow_last_search_results(search_term)
+        if narrowed_results:
+            self.remember_search_results(search_term, narrowed_results)
+            self.populate_products_table(narrowed_results)
+            return
+
+        generation = self.search_generation
+        worker = FunctionWorker(ProductsController.search_products_for_management_view, search_term)
+        worker.signals.finished.connect(
+            lambda response, generation=generation, term=search_term: self.on_search_results_ready(generation, term, *response)
+        )
+        self.active_search_worker = worker
+        self.search_thread_pool.start(worker)
+
+    def on_search_results_ready(self, generation, search_term, results, truncated):
+        if generation != self.search_generation:
+            return # Llegó tarde: ya se pidió otra búsqueda
+        self.active_search_worker = None
+        self.remember_search_results(search_term, results, truncated)
+        self.populate_products_table(results, truncated)
+
+    def cancel_pending_search(self):
+        """Invalida la búsqueda en curso (su respuesta se ignorará) y la espera pendiente."""
+        self.search_debounce_timer.stop()
+        self.search_generation += 1
+        if self.active_search_worker is not None:
+            self.active_search_worker.cancel()
+            self.active_search_worker = None
+
+    def remember_search_results(self, search_term, results, truncated=False):
+        """
+        Guarda el término mostrado y, si sirven para filtrar en memoria el siguiente término, sus
+        resultados: solo si la búsqueda no se cortó en el límite (contiene todos los nombres que
+        pueden coincidir) y no trajo coincidencias aproximadas, que un filtro por texto no reproduce.
+        """
+        self.last_search_term = search_term
+        if (results is None or truncated
+                or len(ProductsController.filter_products_by_search_term(results, search_term)) != len(results)):
+            self.last_search_results = None
+        else:
+            self.last_search_results = list(results)
+
+    def narrow_last_search_results(self, search_term):
+        """
+        Resultados del nuevo término obtenidos filtrando los anteriores, o None si hay que consultar.
+        Solo es válido si el término nuevo empieza por el anterior y los resultados anteriores se
+        guardaron para filtrar (completos y sin coincidencias aproximadas).
+        """
+        if self.last_search_term is None or self.last_search_results is None:
+            return None
+        if not search_term.lower().startswith(self.last_search_term.lower()):
+            return None
+        return ProductsController.filter_products_by_search_term(self.last_search_results, search_term) or None
+
+
+    def check_and_display_low_stock(self):
+        """Redibuja el aviso solo si cambió el conjunto de productos bajo su punto de reorden."""
+        low_stock_version, low_stock_products = ProductsController.get_low_stock_alerts()
+        if low_stock_version == self.displayed_low_stock_version:
+            return
+        self.displayed_low_stock_version = low_stock_version
         if low_stock_products:
-            product_names = [p['name'] for p in low_stock_products]
+            product_names = [
+                f"{p['name']} (pedir {p['reorder_qty']})" if p['reorder_qty'] > 0 else p['name']
+                for p in low_stock_products
+            ]
             alert_message = f"⚠️ Stock Bajo: {', '.join(product_names)}"
             if len(alert_message) > 100: alert_message = alert_message[:97] + "..."
             self.low_stock_label.setText(alert_message)
@@ -384,12 +568,11 @@ class ProductsView(QWidget):
             self.low_stock_warning_frame.hide()
             
     def on_product_selection_changed(self):
-        selected_items = self.products_tablewidget.selectedItems()
-        if selected_items:
-            selected_row = selected_items[0].row()
-            self.current_selected_product_id = int(self.products_tablewidget.item(selected_row, 0).text())
-            product_status_text = self.products_tablewidget.item(selected_row, 5).text()
-            is_currently_active = (product_status_text == "Activo")
+        selected_rows = self.products_tableview.selectionModel().selectedRows()
+        if selected_rows:
+            source_row = self.products_proxy_model.mapToSource(selected_rows[0]).row()
+            self.current_selected_product_id = self.products_table_model.value_at(source_row, 'id')
+            is_currently_active = bool(self.products_table_model.value_at(source_row, 'is_active'))
             self.edit_product_button.setEnabled(True)
             self.delete_restore_button.setEnabled(True)
             if is_currently_active:
@@ -409,14 +592,100 @@ class ProductsView(QWidget):
             if data:
                 product_id = ProductsController.add_new_product(
                     name=data['name'], quantity_available=data['quantity_available'],
-                    sale_price=data['sale_price'], purchase_price=data['purchase_price']
+                    sale_price=data['sale_price'], purchase_price=data['purchase_price'],
+                    reorder_point=data['reorder_point'], reorder_qty=data['reorder_qty']
                 )
                 if product_id:
                     QMessageBox.information(self, "Éxito", f"Producto '{data['name']}' agregado.")
-                    self.load_products_and_setup_completer() # Recargar y actualizar completer
                 else:
                     QMessageBox.warning(self, "Error", "No se pudo agregar el producto.")
 
+    def handle_import_products(self):
+        """Pide el archivo e importa en segundo plano, con diálogo de progreso."""
+        if self.active_import_worker is not None:
+            return
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Importar Productos", "", "CSV o JSON (*.csv *.json);;CSV (*.csv);;JSON (*.json)"
+        )
+        if not file_path:
+            return
+
+        self.import_progress_dialog = QProgressDialog("Validando productos...", "Cancelar", 0, 0, self)
+        self.import_progress_dialog.setWindowTitle("Importar")
+        self.import_progress_dialog.setWindowModality(Qt.WindowModal)
+        self.import_progress_dialog.setMinimumDuration(300)
+        self.import_progress_dialog.canceled.connect(self.cancel_import)
+
+        # report_after_cancel: una cancelación que llega tras el commit no deshace nada, así que
+        # siempre se espera el resultado real para informarlo.
+        worker = FunctionWorker(ProductsController.import_products_from_file, file_path,
+                                with_progress=True, report_after_cancel=True)
+        worker.signals.progress.connect(self.on_import_progress)
+        worker.signals.finished.connect(self.on_import_finished)
+        worker.signals.failed.connect(self.on_import_failed)
+        self.active_import_worker = worker
+        self.import_products_button.setEnabled(False)
+        self.import_thread_pool.start(worker)
+
+    def on_import_progress(self, done_rows, total_rows):
+        if self.import_progress_dialog is None:
+            return
+        if total_rows == 0: # Validando: aún no se sabe cuántas filas se escribirán
+            self.import_progress_dialog.setLabelText(f"Validando productos... ({done_rows} filas leídas)")
+            return
+        self.import_progress_dialog.setLabelText("Guardando productos...")
+        self.import_progress_dialog.setMaximum(total_rows)
+        self.import_progress_dialog.setValue(min(done_rows, total_rows))
+
+    def on_import_finished(self, report):
+        cancelled = self.import_cancel_requested
+        self.finish_import()
+        if report is None and cancelled:
+            QMessageBox.information(self, "Importación Cancelada", "La importación fue cancelada; no se guardó ningún producto.")
+            return
+        if report is None:
+            QMessageBox.critical(self, "Error de Importación",
+                                 "No se pudo importar el archivo (formato o columnas inválidas, o error al guardar).\n"
+                                 "No se guardó ningún producto.")
+            return
+        self.refresh_products_if_catalog_changed()
+        summary = (f"Filas leídas: {report['total_rows']}\n"
+                   f"Productos nuevos: {report['inserted']}\n"
+                   f"Productos actualizados: {report['updated']}\n"
+                   f"Filas con errores: {len(report['errors'])}")
+        if cancelled:
+            summary = "La cancelación llegó cuando los productos ya estaban guardados.\n\n" + summary
+        if not report['errors']:
+            QMessageBox.information(self, "Importación Completa", summary)
+            return
+        error_lines = [f"Fila {error['row']}: {error['error']}" for error in report['errors'][:IMPORT_ERRORS_SHOWN]]
+        if len(report['errors']) > IMPORT_ERRORS_SHOWN:
+            error_lines.append(f"... y {len(report['errors']) - IMPORT_ERRORS_SHOWN} más.")
+        QMessageBox.warning(self, "Importación con Errores", summary + "\n\n" + "\n".join(error_lines))
+
+    def on_import_failed(self, error_message):
+        self.finish_import()
+        QMessageBox.critical(self, "Error de Importación", f"No se pudieron importar los productos.\n{error_message}")
+
+    def cancel_import(self):
+        """
+        Pide cancelar y espera al worker: si la transacción aún no terminó se deshace, pero si ya
+        hizo commit los productos quedan guardados. on_import_finished informa lo que pasó.
+        """
+        if self.active_import_worker is None:
+            return
+        self.import_cancel_requested = True
+        self.active_import_worker.cancel()
+
+    def finish_import(self):
+        self.active_import_worker = None
+        self.import_cancel_requested = False
+        self.import_products_button.setEnabled(True)
+        if self.import_progress_dialog is not None:
+            dialog, self.import_progress_dialog = self.import_progress_dialog, None
+            dialog.canceled.disconnect(self.cancel_import) # close() no debe contarse como cancelación
+            dialog.close()
+
     def open_edit_product_dialog(self):
         if not self.current_selected_product_id:
             QMessageBox.warning(self, "Sin Selección", "Seleccione un producto para editar.")
@@ -432,11 +701,11 @@ class ProductsView(QWidget):
                 success = ProductsController.update_existing_product(
                     product_id=self.current_selected_product_id, name=data['name'],
                     quantity_available=data['quantity_available'], sale_price=data['sale_price'],
-                    purchase_price=data['purchase_price']
+                    purchase_price=data['purchase_price'],
+                    reorder_point=data['reorder_point'], reorder_qty=data['reorder_qty']
                 )
                 if success:
                     QMessageBox.information(self, "Éxito", f"Producto '{data['name']}' actualizado.")
-                    self.load_products_and_setup_completer() # Recargar y actualizar completer
                 else:
                     QMessageBox.warning(self, "Error", "No se pudo actualizar el producto.")
 
@@ -463,6 +732,5 @@ class ProductsView(QWidget):
                 success = ProductsController.activate_product(self.current_selected_product_id)
             if success:
                 QMessageBox.information(self, "Éxito", f"Producto '{product_name}' {action_text_past}.")
-                self.load_products_and_setup_completer() # Recargar y actualizar completer
             else:
                 QMessageBox.warning(self, "Error", f"No se pudo {action_text_verb} el producto.")
\ No newline at end of file
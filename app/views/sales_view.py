@@ -3,7 +3,7 @@ import os
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
     QPushButton, QTableWidget, QTableWidgetItem, QMessageBox, QCompleter,
-    QHeaderView, QFrame, QDialog
+    QHeaderView, QFrame, QDialog, QInputDialog
 )
 from PyQt5.QtCore import Qt, QStringListModel
 from PyQt5.QtGui import QDoubleValidator, QIntValidator
@@ -11,6 +11,8 @@ from PyQt5.QtGui import QDoubleValidator, QIntValidator
 from app.controllers.sales_controller import SalesController
 from app.controllers.products_controller import ProductsController
 from .dialogs import InvoiceDialog 
+from app.models.change_events import ProductsUpserted, StockChanged
+from .change_event_bridge import get_change_event_bridge
 from utils.helpers import resource_path # Sigue siendo útil si cargas otros recursos en esta vista
 from utils.printer import Printer
 
@@ -31,8 +33,8 @@ class SalesView(QWidget):
 
         self.current_sale_items_list = []
         self.base_amount_registered = 0.0 # Podrías inicializarlo a None y verificarlo
-        self.product_cache_for_sale = {}
         self.all_product_names_for_completer = []
+        self.displayed_low_stock_version = None # Versión del conjunto de stock bajo mostrada en el aviso
         self.printer_service = Printer()
         self.store_name = "Ferretería YD" # Nombre de tu tienda
         self.store_nit = "9659228"       # NIT de tu tienda
@@ -40,7 +42,13 @@ class SalesView(QWidget):
 
         self.init_ui_layout()
         self.load_products_for_autocompleter_and_cache()
+        get_change_event_bridge().connect_view(self.on_change_event)
         self.update_total_display()
+        if self.user_id is not None:
+            # Si la caja quedó abierta (p. ej. se cerró la aplicación), retomarla sin pedir la base.
+            open_session = SalesController.resume_open_cash_session(self.user_id)
+            if open_session:
+                self.apply_open_cash_session(open_session)
 
     def init_ui_layout(self):
         main_layout = QVBoxLayout(self)
@@ -57,7 +65,11 @@ class SalesView(QWidget):
         self.register_base_button = QPushButton("Registrar Base"); self.register_base_button.setObjectName("primaryButton")
         self.register_base_button.setStyleSheet("padding: 8px 12px;")
         self.register_base_button.clicked.connect(self.handle_base_registration)
-        for widget in [base_label, self.base_amount_lineedit, self.register_base_button]: self.base_input_section_layout.addWidget(widget)
+        self.close_cash_session_button = QPushButton("🔒 Cerrar Caja"); self.close_cash_session_button.setObjectName("warningButton")
+        self.close_cash_session_button.setStyleSheet("padding: 8px 12px;")
+        self.close_cash_session_button.clicked.connect(self.handle_close_cash_session)
+        self.close_cash_session_button.setEnabled(False)
+        for widget in [base_label, self.base_amount_lineedit, self.register_base_button, self.close_cash_session_button]: self.base_input_section_layout.addWidget(widget)
         self.base_input_section_layout.addStretch(); main_layout.addLayout(self.base_input_section_layout)
 
         self.sale_processing_section_widget = QWidget()
@@ -137,20 +149,29 @@ class SalesView(QWidget):
         self.setLayout(main_layout)
 
     def load_products_for_autocompleter_and_cache(self):
-        self.product_cache_for_sale.clear()
-        self.all_product_names_for_completer = []
-        all_active_products = ProductsController.get_active_products_for_sales_view()
-        if all_active_products:
-            for prod_row in all_active_products:
-                self.product_cache_for_sale[prod_row['name'].lower()] = dict(prod_row)
-                self.all_product_names_for_completer.append(prod_row['name'])
+        # Los productos viven en el catálogo en memoria compartido; aquí solo se toman los nombres.
+        self.all_product_names_for_completer = ProductsController.get_product_names_for_completer(active_only=True)
         
         completer_model = QStringListModel(self.all_product_names_for_completer)
         self.sales_view_product_completer.setModel(completer_model)
         self.display_low_stock_warning()
 
-    def display_low_stock_warning(self, threshold=5):
-        low_stock_items = ProductsController.get_low_stock_products_for_alert(threshold)
+    def on_change_event(self, event):
+        """
+        Cambios del bus (también los hechos por la API): un alta o edición puede cambiar los
+        nombres del completer; un cambio de stock o una venta solo puede cambiar el aviso.
+        """
+        if isinstance(event, ProductsUpserted):
+            self.load_products_for_autocompleter_and_cache()
+        elif isinstance(event, StockChanged):
+            self.display_low_stock_warning()
+
+    def display_low_stock_warning(self):
+        """Redibuja el aviso solo si cambió el conjunto de productos bajo su punto de reorden."""
+        low_stock_version, low_stock_items = ProductsController.get_low_stock_alerts()
+        if low_stock_version == self.displayed_low_stock_version:
+            return
+        self.displayed_low_stock_version = low_stock_version
         if low_stock_items:
             names = [item['name'] for item in low_stock_items]
             message = f"Stock bajo: {', '.join(names)}"
@@ -172,18 +193,61 @@ class SalesView(QWidget):
         except ValueError as e:
             QMessageBox.warning(self, "Monto Inválido", f"Ingrese monto válido.\n{e}"); return
         
-        if SalesController.set_daily_base(base_val, self.user_id):
-            self.base_amount_registered = base_val
-            self.registered_base_info_label.setText(f"Base: ${self.base_amount_registered:,.2f}")
-            self.registered_base_info_label.setStyleSheet("font-weight: bold; color: #27ae60;")
-            self.base_amount_lineedit.setEnabled(False); self.register_base_button.setEnabled(False)
-            self.sale_processing_section_widget.setEnabled(True)
-            self.product_name_search_lineedit.setFocus()
+        cash_session, resumed = SalesController.set_daily_base(base_val, self.user_id)
+        if cash_session:
+            self.apply_open_cash_session(cash_session)
             self.display_low_stock_warning()
-            QMessageBox.information(self, "Base Registrada", "Base registrada.")
+            if resumed:
+                QMessageBox.warning(self, "Caja Ya Abierta",
+                                    f"Ya hay una caja abierta (caja #{cash_session['id']}) con base "
+                                    f"${cash_session['base_amount']:,.2f}.\n"
+                                    f"La base ingresada (${base_val:,.2f}) no se registró.")
+            else:
+                QMessageBox.information(self, "Base Registrada", "Base registrada.")
         else:
             QMessageBox.critical(self, "Error", "No se pudo registrar la base.")
 
+    def apply_open_cash_session(self, cash_session):
+        """Muestra la caja abierta y habilita la sección de ventas."""
+        self.base_amount_registered = cash_session['base_amount']
+        self.registered_base_info_label.setText(f"Base: ${self.base_amount_registered:,.2f} (caja #{cash_session['id']})")
+        self.registered_base_info_label.setStyleSheet("font-weight: bold; color: #27ae60;")
+        self.base_amount_lineedit.setText(f"{self.base_amount_registered:.2f}")
+        self.base_amount_lineedit.setEnabled(False); self.register_base_button.setEnabled(False)
+        self.close_cash_session_button.setEnabled(True)
+        self.sale_processing_section_widget.setEnabled(True)
+        self.product_name_search_lineedit.setFocus()
+
+    def handle_close_cash_session(self):
+        """Pide el efectivo contado, cierra la caja y muestra el cuadre (esperado vs. contado)."""
+        if self.current_sale_items_list:
+            QMessageBox.warning(self, "Venta en Curso", "Finalice o limpie la venta actual antes de cerrar la caja.")
+            return
+        counted_cash, accepted = QInputDialog.getDouble(
+            self, "Cerrar Caja", "Efectivo contado en caja ($):", 0.0, 0.0, 99999999.99, 2
+        )
+        if not accepted:
+            return
+        closed_session = SalesController.close_cash_session(self.user_id, counted_cash)
+        if not closed_session:
+            QMessageBox.critical(self, "Error", "No se pudo cerrar la caja.")
+            return
+        QMessageBox.information(
+            self, "Caja Cerrada",
+            f"Base: ${closed_session['base_amount']:,.2f}\n"
+            f"Ventas ({closed_session['sale_count']}): ${closed_session['sales_total']:,.2f}\n"
+            f"Esperado en caja: ${closed_session['expected_cash']:,.2f}\n"
+            f"Contado: ${closed_session['counted_cash']:,.2f}\n"
+            f"Diferencia: ${closed_session['cash_difference']:,.2f}"
+        )
+        self.base_amount_registered = 0.0
+        self.registered_base_info_label.setText("Base no registrada.")
+        self.registered_base_info_label.setStyleSheet("font-style: italic; color: #7f8c8d;")
+        self.base_amount_lineedit.clear()
+        self.base_amount_lineedit.setEnabled(True); self.register_base_button.setEnabled(True)
+        self.close_cash_session_button.setEnabled(False)
+        self.sale_processing_section_widget.setEnabled(False)
+
     def handle_add_item_to_current_sale(self):
         product_name_typed = self.product_name_search_lineedit.text().strip()
         quantity_text = self.item_quantity_lineedit.text().strip()
@@ -194,7 +258,7 @@ class SalesView(QWidget):
         except ValueError as e:
             QMessageBox.warning(self, "Cantidad Inválida", f"Ingrese una cantidad numérica válida.\n{e}"); return
         
-        product_data_from_cache = self.product_cache_for_sale.get(product_name_typed.lower())
+        product_data_from_cache = ProductsController.find_active_product_by_name(product_name_typed)
         if not product_data_from_cache: QMessageBox.warning(self, "Producto Desconocido", f"Producto '{product_name_typed}' no encontrado en caché."); return
         
         current_quantity_in_cart = sum(item['quantity_sold'] for item in self.current_sale_items_list if item['product_id'] == product_data_from_cache['id'])
@@ -263,7 +327,7 @@ class SalesView(QWidget):
             items_for_controller = [{'product_id': i['product_id'], 'quantity_sold': i['quantity_sold'], 
                                      'price_per_unit': i['price_per_unit']} for i in self.current_sale_items_list]
 
-            # Asegúrate de que SalesController.current_base_cash y self.user_id estén correctos
+            # SalesController toma la base y la caja de la sesión de caja abierta del usuario
             # La llamada a process_new_sale en SalesController fue modificada para tomar solo 3 argumentos.
             # Si tu SalesController.process_new_sale espera self.base_amount_registered y self.user_id
             # necesitas pasarlos o asegurar que SalesController los obtenga de otra manera (ej. desde sus atributos de clase)
@@ -273,8 +337,8 @@ class SalesView(QWidget):
                 # base_amount=self.base_amount_registered, # Si tu controlador aún lo espera
                 # user_id=self.user_id                    # Si tu controlador aún lo espera
             )
-            # Si SalesController.process_new_sale usa SalesController.current_base_cash y 
-            # SalesController.current_user_id, no necesitas pasarlos aquí.
+            # SalesController.process_new_sale usa la caja abierta de SalesController.current_user_id,
+            # no necesitas pasarlos aquí.
 
             if sale_id:
                 QMessageBox.information(self, "Venta Registrada", f"Venta ID {sale_id} ha sido procesada exitosamente.")
@@ -0,0 +1,53 @@
+# app/views/workers.py
+"""
+Trabajo en segundo plano para las vistas: ejecuta una función fuera del hilo de la interfaz
+(en un QThreadPool) y entrega el resultado por señales, que Qt encola al hilo de la interfaz.
+"""
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    finished = pyqtSignal(object) # Resultado de la función
+    failed = pyqtSignal(str)      # Mensaje de error
+    progress = pyqtSignal(int, int) # (hechos, total), solo con with_progress=True
+
+
+class FunctionWorker(QRunnable):
+    """
+    Ejecuta fn(*args, **kwargs) en un hilo del pool. Si se cancela antes de empezar, no se
+    ejecuta; si se cancela mientras corre, su resultado se descarta sin emitir señales.
+    La vista debe conservar una referencia al worker (o a sus señales) hasta recibir la respuesta.
+    Con with_progress=True, fn recibe además progress_callback(hechos, total), que emite la señal
+    progress, y should_cancel(), que indica si se pidió cancelar (para tareas largas por lotes).
+    Con report_after_cancel=True las señales se emiten aunque se haya cancelado (finished(None)
+    si no llegó a ejecutarse), para tareas que escriben y cuyo resultado real hay que informar.
+    """
+    def __init__(self, fn, *args, with_progress=False, report_after_cancel=False, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self.cancelled = False
+        self.report_after_cancel = report_after_cancel
+        if with_progress:
+            self.kwargs['progress_callback'] = self.signals.progress.emit
+            self.kwargs['should_cancel'] = lambda: self.cancelled
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        if self.cancelled:
+            if self.report_after_cancel:
+                self.signals.finished.emit(None)
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            print(f"Error en tarea de segundo plano: {e}")
+            if self.report_after_cancel or not self.cancelled:
+                self.signals.failed.emit(str(e))
+            return
+        if self.report_after_cancel or not self.cancelled:
+            self.signals.finished.emit(result)
@@ -0,0 +1,72 @@
+# benchmarks/_common.py
+# Utilidades compartidas por los benchmarks. Se ejecutan desde la raíz del proyecto:
+#   python -m benchmarks.bench_connection_pool
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from database.db_connection import configure_database, initialize_database, get_connection
+
+
+@contextlib.contextmanager
+def temporary_database(quiet=True, profile_name=None, pool_max_size=None):
+    """Crea una base de datos temporal inicializada y apunta el pool hacia ella."""
+    tmp_dir = tempfile.mkdtemp(prefix="ferreteria_bench_")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    configure_database(db_path, profile_name=profile_name, pool_max_size=pool_max_size)
+    try:
+        with silenced(quiet):
+            initialize_database()
+        yield db_path
+    finally:
+        configure_database(None)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def silenced(enabled=True):
+    """Descarta los print de depuración de la aplicación mientras se mide."""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def seed_products(count, stock=1000):
+    """Inserta `count` productos sintéticos en una sola transacción."""
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO products (name, quantity_available, sale_price, purchase_price) VALUES (?, ?, ?, ?)",
+            ((f"Producto {i:06d}", stock, 1000.0 + i % 500, 600.0 + i % 300) for i in range(count))
+        )
+        conn.commit()
+
+
+def time_calls(func, repetitions):
+    """Ejecuta `func` varias veces y devuelve la lista de duraciones en segundos."""
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def print_latency_row(label, durations):
+    """Imprime media, p50 y p99 en microsegundos."""
+    mean_us = statistics.mean(durations) * 1e6 if durations else 0.0
+    print(f"{label:<40} n={len(durations):<6} media={mean_us:9.1f}us "
+          f"p50={percentile(durations, 50) * 1e6:9.1f}us p99={percentile(durations, 99) * 1e6:9.1f}us")
@@ -0,0 +1,86 @@
+# benchmarks/bench_concurrency.py
+# Escritores estilo caja (ventas) y lectores estilo API (listado de productos) trabajando
+# a la vez sobre la misma base de datos, con cada perfil de almacenamiento.
+# Reporta p50/p99 de latencia y cuántas operaciones fallaron por bloqueo.
+#   python -m benchmarks.bench_concurrency [segundos] [escritores] [lectores]
+import sqlite3
+import sys
+import threading
+import time
+
+from benchmarks._common import temporary_database, seed_products, silenced, percentile
+from database.db_connection import STORAGE_PROFILES, get_connection
+
+PRODUCT_COUNT = 2000
+
+
+def writer_loop(stop_event, latencies, errors, writer_index):
+    product_id = 1 + writer_index
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        try:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("INSERT INTO sales (user_id, initial_cash, total_amount) VALUES (1, 0, 2000)")
+                sale_id = cursor.lastrowid
+                cursor.execute(
+                    "INSERT INTO sale_items (sale_id, product_id, quantity_sold, price_per_unit, subtotal) VALUES (?, ?, 1, 2000, 2000)",
+                    (sale_id, product_id)
+                )
+                cursor.execute("UPDATE products SET quantity_available = quantity_available - 1 WHERE id = ?", (product_id,))
+                conn.commit()
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError as e:
+            errors.append(str(e))
+        product_id = product_id % PRODUCT_COUNT + 1
+
+
+def reader_loop(stop_event, latencies, errors):
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        try:
+            with get_connection() as conn:
+                conn.execute(
+                    "SELECT id, name, quantity_available, sale_price, purchase_price, is_active FROM products WHERE is_active = 1 ORDER BY name ASC LIMIT 100"
+                ).fetchall()
+                conn.execute("SELECT COUNT(*), SUM(total_amount) FROM sales").fetchone()
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError as e:
+            errors.append(str(e))
+
+
+def run_profile(profile_name, seconds, writer_count, reader_count):
+    with temporary_database(profile_name=profile_name, pool_max_size=writer_count + reader_count + 1):
+        seed_products(PRODUCT_COUNT)
+        stop_event = threading.Event()
+        write_latencies, read_latencies, write_errors, read_errors = [], [], [], []
+        threads = [threading.Thread(target=writer_loop, args=(stop_event, write_latencies, write_errors, i))
+                   for i in range(writer_count)]
+        threads += [threading.Thread(target=reader_loop, args=(stop_event, read_latencies, read_errors))
+                    for _ in range(reader_count)]
+        with silenced():
+            for thread in threads:
+                thread.start()
+            time.sleep(seconds)
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+
+    for label, latencies, errors in (("escrituras", write_latencies, write_errors),
+                                     ("lecturas", read_latencies, read_errors)):
+        print(f"  {profile_name:<11} {label:<11} ops={len(latencies):<7} "
+              f"p50={percentile(latencies, 50) * 1000:8.2f}ms p99={percentile(latencies, 99) * 1000:8.2f}ms "
+              f"errores_bloqueo={len(errors)}")
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    writer_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    reader_count = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    print(f"{writer_count} escritores + {reader_count} lectores durante {seconds:.0f}s por perfil:")
+    for profile_name in STORAGE_PROFILES:
+        run_profile(profile_name, seconds, writer_count, reader_count)
+
+
+if __name__ == "__main__":
+    main()
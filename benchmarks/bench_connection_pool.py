@@ -0,0 +1,44 @@
+# benchmarks/bench_connection_pool.py
+# Compara la latencia por llamada de las consultas de modelo abriendo una conexión nueva
+# en cada llamada (comportamiento anterior) contra el pool de conexiones reutilizables.
+#   python -m benchmarks.bench_connection_pool [repeticiones]
+import sqlite3
+import sys
+
+from benchmarks._common import temporary_database, seed_products, silenced, time_calls, print_latency_row
+from app.models.product_model import ProductModel
+
+SEARCH_SQL = "SELECT id, name, quantity_available, sale_price, purchase_price, is_active FROM products WHERE name LIKE ? ORDER BY name ASC"
+BY_ID_SQL = "SELECT id, name, quantity_available, sale_price, purchase_price, is_active FROM products WHERE id = ?"
+
+
+def query_with_fresh_connection(db_path, sql, params):
+    """Reproduce el camino anterior: resolver ruta, conectar, PRAGMA, consultar y cerrar."""
+    print(f"DEBUG db_connection: Conectando a la base de datos en (persistente): {db_path}")
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.row_factory = sqlite3.Row
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with temporary_database() as db_path:
+        seed_products(500)
+        print(f"Latencia por llamada ({repetitions} llamadas, 500 productos):")
+        with silenced():
+            before_search = time_calls(lambda: query_with_fresh_connection(db_path, SEARCH_SQL, ("%00012%",)), repetitions)
+            after_search = time_calls(lambda: ProductModel.search_products_for_management("00012"), repetitions)
+            before_by_id = time_calls(lambda: query_with_fresh_connection(db_path, BY_ID_SQL, (1,)), repetitions)
+            after_by_id = time_calls(lambda: ProductModel.get_product_by_id(1), repetitions)
+        print_latency_row("search (conexión nueva por llamada)", before_search)
+        print_latency_row("search (pool)", after_search)
+        print_latency_row("get_product_by_id (conexión nueva)", before_by_id)
+        print_latency_row("get_product_by_id (pool)", after_by_id)
+
+
+if __name__ == "__main__":
+    main()
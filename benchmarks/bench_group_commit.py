@@ -0,0 +1,56 @@
+# benchmarks/bench_group_commit.py
+# Carga de ventas concurrentes (como varias peticiones a /api/v1/sales/ a la vez) comparando
+# ventas/segundo con el modo group commit desactivado y activado.
+#   python -m benchmarks.bench_group_commit [clientes] [ventas_por_cliente]
+import sys
+import threading
+import time
+
+from benchmarks._common import temporary_database, seed_products, silenced
+from database.db_connection import STORAGE_PROFILES
+from app.models.sale_model import SaleModel
+
+
+def client_loop(client_index, sales_per_client, failures):
+    for sale_number in range(sales_per_client):
+        product_id = 1 + (client_index * sales_per_client + sale_number) % 500
+        items = [{'product_id': product_id, 'quantity_sold': 1, 'price_per_unit': 2500.0},
+                 {'product_id': 501 + client_index, 'quantity_sold': 2, 'price_per_unit': 1200.0}]
+        if not SaleModel.create_sale(1, 0.0, 4900.0, items):
+            failures.append(sale_number)
+
+
+def run(profile_name, group_commit, client_count, sales_per_client):
+    with temporary_database(profile_name=profile_name, pool_max_size=client_count + 1):
+        seed_products(500 + client_count, stock=10 ** 9)
+        writer = SaleModel.enable_group_commit() if group_commit else None
+        failures = []
+        threads = [threading.Thread(target=client_loop, args=(i, sales_per_client, failures))
+                   for i in range(client_count)]
+        with silenced():
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        SaleModel.disable_group_commit()
+
+    total_sales = client_count * sales_per_client - len(failures)
+    batches = f" lotes={writer.batches_committed}" if writer else ""
+    mode = "group commit" if group_commit else "commit por venta"
+    print(f"  {profile_name:<11} {mode:<17} {total_sales / elapsed:9.0f} ventas/s "
+          f"(ventas={total_sales}, fallidas={len(failures)}{batches})")
+
+
+def main():
+    client_count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    sales_per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    print(f"{client_count} clientes x {sales_per_client} ventas:")
+    for profile_name in STORAGE_PROFILES:
+        for group_commit in (False, True):
+            run(profile_name, group_commit, client_count, sales_per_client)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_product_import.py
+# Compara la carga de inventario producto por producto (ProductModel.add_product: una conexión
+# y un commit por fila) con la importación masiva desde CSV (ProductsController.import_products_from_file:
+# validación por lotes y un solo INSERT ... ON CONFLICT(name) DO UPDATE con executemany).
+#   python -m benchmarks.bench_product_import [productos] [productos_uno_a_uno]
+import csv
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks._common import temporary_database, silenced
+from app.models.product_model import ProductModel
+from app.controllers.products_controller import ProductsController, PRODUCT_IMPORT_FIELDS
+
+
+def write_import_csv(file_path, count, price_offset=0.0):
+    with open(file_path, "w", encoding="utf-8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(PRODUCT_IMPORT_FIELDS)
+        for i in range(count):
+            writer.writerow((f"Producto importado {i:06d}", i % 500, 1000.0 + i % 700 + price_offset, 500.0 + i % 300))
+
+
+def main():
+    product_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    one_by_one_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    tmp_dir = tempfile.mkdtemp(prefix="ferreteria_import_")
+    csv_path = os.path.join(tmp_dir, "productos.csv")
+    write_import_csv(csv_path, product_count)
+
+    with temporary_database():
+        with silenced():
+            start = time.perf_counter()
+            for i in range(one_by_one_count):
+                ProductModel.add_product(f"Producto uno a uno {i:06d}", i % 500, 1000.0, 500.0)
+            one_by_one_seconds = time.perf_counter() - start
+        print(f"Uno a uno (add_product): {one_by_one_count} productos en {one_by_one_seconds:.2f}s "
+              f"(~{one_by_one_seconds / one_by_one_count * product_count:.1f}s estimados para {product_count})")
+
+    with temporary_database():
+        with silenced():
+            start = time.perf_counter()
+            report = ProductsController.import_products_from_file(csv_path)
+            insert_seconds = time.perf_counter() - start
+            write_import_csv(csv_path, product_count, price_offset=10.0)
+            start = time.perf_counter()
+            update_report = ProductsController.import_products_from_file(csv_path)
+            update_seconds = time.perf_counter() - start
+        print(f"Importación CSV (nuevos):       {report['inserted']} insertados en {insert_seconds:.2f}s")
+        print(f"Importación CSV (actualizados): {update_report['updated']} actualizados en {update_seconds:.2f}s")
+
+    os.remove(csv_path)
+    os.rmdir(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_product_search.py
+# Compara la búsqueda anterior (name LIKE '%término%', recorre toda la tabla y no tolera
+# tildes ni errores) con ProductModel.search_products_ranked (FTS5 trigram) en un catálogo
+# sintético de ferretería.
+#   python -m benchmarks.bench_product_search [productos] [repeticiones]
+import itertools
+import random
+import sys
+
+from benchmarks._common import temporary_database, silenced, time_calls, print_latency_row
+from database.db_connection import get_connection
+from app.models.product_model import ProductModel
+
+ITEMS = ("Tornillo", "Tuerca", "Arandela", "Clavo", "Bisagra", "Cerradura", "Tubería", "Codo",
+         "Válvula", "Llave", "Martillo", "Destornillador", "Cinta", "Pegante", "Broca", "Lija",
+         "Brocha", "Rodillo", "Pintura", "Cable", "Interruptor", "Bombillo", "Cañería", "Unión")
+DETAILS = ("galvanizado", "inoxidable", "de bronce", "PVC", "cabeza hexagonal", "para madera",
+           "autoperforante", "de presión", "eléctrico", "de acero", "amarillo", "blanco mate")
+SIZES = ("1/4", "3/8", "1/2", "3/4", "1\"", "2\"", "10 mm", "12 mm", "x 50", "x 100", "galón", "cuarto")
+
+# (etiqueta, término): exacto, sin tildes, prefijo corto y con error de tipeo.
+QUERIES = (
+    ("exacto 'Tornillo'", "Tornillo"),
+    ("sin tilde 'valvula bronce'", "valvula bronce"),
+    ("prefijo 'caner'", "caner"),
+    ("error 'tornilo galbanizado'", "tornilo galbanizado"),
+    ("error 'destornilaor'", "destornilaor"),
+)
+
+
+def seed_hardware_catalog(count):
+    """Inserta `count` productos con nombres únicos de ferretería."""
+    rng = random.Random(42)
+    combinations = list(itertools.product(ITEMS, DETAILS, SIZES))
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO products (name, quantity_available, sale_price, purchase_price) VALUES (?, ?, ?, ?)",
+            ((f"{item} {detail} {size} ref {i:06d}", rng.randint(0, 500), 1000.0 + i % 700, 500.0 + i % 300)
+             for i, (item, detail, size) in zip(range(count), itertools.cycle(combinations)))
+        )
+        conn.commit()
+
+
+def search_with_like(search_term):
+    """Búsqueda anterior: LIKE sin índice ni plegado de tildes."""
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT id, name, quantity_available, sale_price, purchase_price, is_active FROM products WHERE name LIKE ? ORDER BY name ASC",
+            (f"%{search_term}%",)
+        ).fetchall()
+
+
+def main():
+    product_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with temporary_database():
+        seed_hardware_catalog(product_count)
+        print(f"Catálogo de {product_count} productos, {repetitions} repeticiones por búsqueda:")
+        for label, search_term in QUERIES:
+            with silenced():
+                like_hits = len(search_with_like(search_term))
+                ranked = ProductModel.search_products_ranked(search_term, limit=20)
+                before = time_calls(lambda: search_with_like(search_term), repetitions)
+                after = time_calls(lambda: ProductModel.search_products_ranked(search_term, limit=20), repetitions)
+            print(f"  {label}: LIKE encontró {like_hits}, FTS devolvió {len(ranked)}"
+                  f"{' (primero: ' + ranked[0]['name'] + ')' if ranked else ''}")
+            print_latency_row("    antes (LIKE '%término%')", before)
+            print_latency_row("    después (FTS5 trigram, top 20)", after)
+
+
+if __name__ == "__main__":
+    main()
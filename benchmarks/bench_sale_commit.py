@@ -0,0 +1,57 @@
+# benchmarks/bench_sale_commit.py
+# Registra ventas con carritos de 1 a 200 líneas y compara el camino anterior
+# (commit de la venta + un INSERT y un UPDATE por item + segundo commit) con la
+# transacción única de SaleModel.create_sale (executemany + descuento de stock por conjunto).
+#   python -m benchmarks.bench_sale_commit [ventas_por_tamaño]
+import sys
+
+from benchmarks._common import temporary_database, seed_products, silenced, time_calls, print_latency_row
+from database.db_connection import STORAGE_PROFILES, get_connection
+from app.models.sale_model import SaleModel
+
+CART_SIZES = (1, 10, 50, 100, 200)
+
+
+def create_sale_per_item_commits(user_id, initial_cash, total_amount, items):
+    """Reproducción del create_sale anterior (dos commits y sentencias por item)."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO sales (user_id, initial_cash, total_amount) VALUES (?, ?, ?)",
+                       (user_id, initial_cash, total_amount))
+        sale_id = cursor.lastrowid
+        conn.commit()
+        for item in items:
+            cursor.execute(
+                "INSERT INTO sale_items (sale_id, product_id, quantity_sold, price_per_unit, subtotal) VALUES (?, ?, ?, ?, ?)",
+                (sale_id, item['product_id'], item['quantity_sold'], item['price_per_unit'],
+                 item['quantity_sold'] * item['price_per_unit'])
+            )
+            cursor.execute("UPDATE products SET quantity_available = quantity_available - ? WHERE id = ?",
+                           (item['quantity_sold'], item['product_id']))
+        conn.commit()
+        return sale_id
+
+
+def make_cart(size):
+    return [{'product_id': product_id, 'quantity_sold': 1, 'price_per_unit': 1500.0}
+            for product_id in range(1, size + 1)]
+
+
+def main():
+    sales_per_size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for profile_name in STORAGE_PROFILES:
+        print(f"Perfil '{profile_name}', {sales_per_size} ventas por tamaño de carrito:")
+        with temporary_database(profile_name=profile_name):
+            seed_products(max(CART_SIZES), stock=10 ** 9)
+            for size in CART_SIZES:
+                cart = make_cart(size)
+                total = sum(item['quantity_sold'] * item['price_per_unit'] for item in cart)
+                with silenced():
+                    before = time_calls(lambda: create_sale_per_item_commits(1, 0.0, total, cart), sales_per_size)
+                    after = time_calls(lambda: SaleModel.create_sale(1, 0.0, total, cart), sales_per_size)
+                print_latency_row(f"  {size:>3} líneas, antes (por item)", before)
+                print_latency_row(f"  {size:>3} líneas, después (1 transacción)", after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# database/daily_sales_summary.py
+"""
+Resumen diario de ventas materializado (tabla daily_sales_summary).
+
+SaleModel suma cada venta a la fila de su día dentro de la misma transacción que la registra,
+así los reportes por día leen una fila por día en lugar de recorrer todas las líneas vendidas.
+El costo sale de sale_items.unit_cost_at_sale (precio de compra guardado al vender).
+La base del día no se guarda aquí: es la suma de las bases de las cajas abiertas ese día, que
+SaleModel lee de cash_sessions con una consulta agrupada por rango.
+
+Para reconstruir la tabla a partir de sales/sale_items (p. ej. tras editar ventas a mano):
+    python -m database.daily_sales_summary
+"""
+import sqlite3
+
+from database.db_connection import transaction
+
+# Suma la venta :sale_id al resumen de su día.
+UPSERT_SALE_INTO_DAILY_SUMMARY_SQL = """
+    INSERT INTO daily_sales_summary
+        (sale_date, sale_count, item_count, revenue, cost, last_sale_timestamp)
+    SELECT SUBSTR(s.sale_timestamp, 1, 10), 1, SUM(si.quantity_sold), SUM(si.subtotal),
+           SUM(si.quantity_sold * COALESCE(si.unit_cost_at_sale, 0)), s.sale_timestamp
+    FROM sales s
+    JOIN sale_items si ON si.sale_id = s.id
+    WHERE s.id = :sale_id
+    GROUP BY s.id
+    ON CONFLICT(sale_date) DO UPDATE SET
+        sale_count = sale_count + excluded.sale_count,
+        item_count = item_count + excluded.item_count,
+        revenue = revenue + excluded.revenue,
+        cost = cost + excluded.cost,
+        last_sale_timestamp = MAX(last_sale_timestamp, excluded.last_sale_timestamp)
+"""
+
+# Recalcula todos los días desde cero, solo con sales y sale_items.
+_REBUILD_DAILY_SUMMARY_SQL = """
+    INSERT INTO daily_sales_summary
+        (sale_date, sale_count, item_count, revenue, cost, last_sale_timestamp)
+    SELECT SUBSTR(s.sale_timestamp, 1, 10) AS sale_date,
+           COUNT(DISTINCT s.id),
+           SUM(si.quantity_sold),
+           SUM(si.subtotal),
+           SUM(si.quantity_sold * COALESCE(si.unit_cost_at_sale, 0)),
+           MAX(s.sale_timestamp)
+    FROM sales s
+    JOIN sale_items si ON si.sale_id = s.id
+    GROUP BY sale_date
+"""
+
+def rebuild_daily_sales_summary(conn):
+    """
+    Vacía y recalcula daily_sales_summary en una transacción (un SAVEPOINT dentro de la del
+    llamador, si ya tiene una abierta: no confirma nada ajeno). Devuelve la cantidad de días,
+    o None si falla (la tabla queda como estaba).
+    """
+    try:
+        with transaction(conn, "IMMEDIATE"):
+            conn.execute("DELETE FROM daily_sales_summary")
+            conn.execute(_REBUILD_DAILY_SUMMARY_SQL)
+            return conn.execute("SELECT COUNT(*) FROM daily_sales_summary").fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"Error al reconstruir daily_sales_summary: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    from database.db_connection import initialize_database, get_connection
+
+    initialize_database()
+    with get_connection() as conn:
+        rebuilt_days = rebuild_daily_sales_summary(conn)
+    if rebuilt_days is not None:
+        print(f"Resumen diario reconstruido: {rebuilt_days} días.")
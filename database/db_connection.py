@@ -5,12 +5,65 @@ from sqlite3 import Error as SQLiteError
 import os
 import hashlib
 import sys # <--- AÑADIDO: Necesario para sys._MEIPASS
+import threading
+import queue
+import atexit
+import itertools
+import unicodedata
+from contextlib import contextmanager
+
+from database.migrations import apply_migrations, get_schema_version, LATEST_SCHEMA_VERSION
 
 # Define el nombre del archivo de la base de datos una vez
 DB_FILENAME = "database.db"
 
+# Variable de entorno para apuntar a otra base de datos (benchmarks, pruebas manuales, etc.)
+DB_PATH_ENV_VAR = "FERRETERIA_DB_PATH"
+
+# Hilos que conservan una conexión propia durante toda su vida (hilo de PyQt, hilo de uvicorn
+# y el escritor de group commit). El resto de hilos (p. ej. el threadpool de FastAPI) toman
+# conexiones de un pool acotado.
+PINNED_THREAD_NAMES = ("MainThread", "FastAPIThread", "GroupCommitThread")
+POOL_MAX_SIZE = 4
+POOL_ACQUIRE_TIMEOUT = 10.0 # Segundos esperando una conexión libre antes de fallar
+
+# --- Perfiles de almacenamiento ---
+# Cada perfil es un conjunto de PRAGMA que se aplican al abrir cada conexión.
+# "concurrent" (por defecto) usa WAL: los lectores de la API no bloquean al escritor de la caja
+# y viceversa. "legacy" reproduce el modo rollback-journal original.
+STORAGE_PROFILES = {
+    "legacy": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+    "concurrent": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",   # Seguro con WAL: solo se pierde la última transacción ante un corte de luz
+        "cache_size": -16000,      # Negativo = KiB (~16 MB de caché de páginas)
+        "mmap_size": 134217728,    # 128 MB de E/S mapeada en memoria
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,      # ms esperando un bloqueo antes de devolver "database is locked"
+        "wal_autocheckpoint": 1000,
+    },
+}
+DEFAULT_STORAGE_PROFILE = "concurrent"
+STORAGE_PROFILE_ENV_VAR = "FERRETERIA_DB_PROFILE"
+# Orden de aplicación: journal_mode primero porque 'synchronous' y 'wal_autocheckpoint' dependen de él
+PRAGMA_ORDER = ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store",
+                "busy_timeout", "wal_autocheckpoint")
+
+CHECKPOINT_INTERVAL_SECONDS = 60.0 # Checkpoint periódico del WAL (además del autocheckpoint)
+
+_resolved_db_path = None # Cache de la ruta resuelta (evita os.makedirs en cada consulta)
+_storage_profile_name = None
+
 def get_persistent_db_path():
     """Obtiene una ruta persistente para la base de datos."""
+    env_db_path = os.environ.get(DB_PATH_ENV_VAR)
+    if env_db_path:
+        return env_db_path
+
     if hasattr(sys, 'frozen') and hasattr(sys, '_MEIPASS'):
         # Aplicación empaquetada: guardar BD junto al .exe
         # o en una carpeta de datos de aplicación.
@@ -25,14 +78,59 @@ def get_persistent_db_path():
         os.makedirs(db_dir, exist_ok=True)
     return os.path.join(db_dir, DB_FILENAME)
 
+def get_db_path():
+    """Devuelve la ruta de la base de datos, resolviéndola solo la primera vez."""
+    global _resolved_db_path
+    if _resolved_db_path is None:
+        _resolved_db_path = get_persistent_db_path()
+    return _resolved_db_path
+
+def get_storage_profile_name():
+    """Nombre del perfil de almacenamiento activo (configure_database > variable de entorno > defecto)."""
+    global _storage_profile_name
+    if _storage_profile_name is None:
+        profile_name = os.environ.get(STORAGE_PROFILE_ENV_VAR, DEFAULT_STORAGE_PROFILE)
+        if profile_name not in STORAGE_PROFILES:
+            print(f"Advertencia: perfil de almacenamiento '{profile_name}' desconocido, usando '{DEFAULT_STORAGE_PROFILE}'.")
+            profile_name = DEFAULT_STORAGE_PROFILE
+        _storage_profile_name = profile_name
+    return _storage_profile_name
+
+def get_storage_profile():
+    return STORAGE_PROFILES[get_storage_profile_name()]
+
+def apply_storage_profile(conn, profile):
+    """Aplica los PRAGMA del perfil a una conexión abierta."""
+    for pragma_name in PRAGMA_ORDER:
+        if pragma_name in profile:
+            conn.execute(f"PRAGMA {pragma_name} = {profile[pragma_name]}")
+
+def fold_search_text(text):
+    """Texto en minúsculas y sin tildes ni diacríticos, para búsquedas ("Tornillo Cañería" -> "tornillo caneria")."""
+    if text is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+def _open_connection(db_path, profile=None):
+    """Abre una conexión SQLite configurada como la usa la aplicación."""
+    # check_same_thread=False: las conexiones del pool pasan de un hilo a otro,
+    # pero nunca las usan dos hilos a la vez (el pool lo garantiza).
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA foreign_keys = ON")
+    # Los triggers del índice de búsqueda (products_fts) la usan: debe existir en toda conexión que escriba products.
+    conn.create_function("fold_search_text", 1, fold_search_text, deterministic=True)
+    apply_storage_profile(conn, profile if profile is not None else get_storage_profile())
+    conn.row_factory = sqlite3.Row
+    return conn
+
 def create_connection():
+    """Abre una conexión nueva e independiente del pool (el llamador debe cerrarla)."""
     conn = None
-    db_path_persistent = get_persistent_db_path() # <--- USA LA NUEVA FUNCIÓN
+    db_path_persistent = get_db_path() # <--- USA LA NUEVA FUNCIÓN
     print(f"DEBUG db_connection: Conectando a la base de datos en (persistente): {db_path_persistent}")
     try:
-        conn = sqlite3.connect(db_path_persistent)
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.row_factory = sqlite3.Row
+        conn = _open_connection(db_path_persistent)
         return conn
     except SQLiteError as e:
         print(f"Error al conectar a SQLite: {e}")
@@ -43,6 +141,244 @@ def create_connection():
         print(f"Ruta (si está definida): {db_path_persistent}")
         return None
 
+
+class ConnectionPool:
+    """
+    Pool de conexiones SQLite consciente de hilos.
+    - Los hilos "fijos" (PINNED_THREAD_NAMES) reciben una conexión de larga vida propia.
+    - Los demás hilos comparten como máximo `max_size` conexiones reutilizables.
+    Las adquisiciones anidadas dentro del mismo hilo devuelven la misma conexión,
+    así un método de modelo puede llamar a otro sin abrir una segunda conexión.
+    """
+    def __init__(self, db_path, max_size=POOL_MAX_SIZE, pinned_thread_names=PINNED_THREAD_NAMES,
+                 acquire_timeout=POOL_ACQUIRE_TIMEOUT):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.pinned_thread_names = set(pinned_thread_names)
+        self.acquire_timeout = acquire_timeout
+        self._local = threading.local()
+        self._idle_connections = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._all_connections = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _new_connection(self):
+        conn = _open_connection(self.db_path)
+        with self._lock:
+            self._all_connections.append(conn)
+        return conn
+
+    def acquire(self):
+        if self._closed:
+            raise SQLiteError("El pool de conexiones está cerrado.")
+        local = self._local
+        if getattr(local, "active_conn", None) is not None:
+            local.depth += 1 # Adquisición anidada en el mismo hilo
+            return local.active_conn
+
+        if threading.current_thread().name in self.pinned_thread_names:
+            conn = getattr(local, "pinned_conn", None)
+            if conn is None:
+                conn = self._new_connection()
+                local.pinned_conn = conn
+            local.from_pool = False
+        else:
+            if not self._slots.acquire(timeout=self.acquire_timeout):
+                raise SQLiteError("Tiempo de espera agotado esperando una conexión libre del pool.")
+            try:
+                conn = self._idle_connections.get_nowait()
+            except queue.Empty:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    self._slots.release()
+                    raise
+            local.from_pool = True
+
+        local.active_conn = conn
+        local.depth = 1
+        return conn
+
+    def release(self, conn):
+        local = self._local
+        local.depth -= 1
+        if local.depth > 0:
+            return
+        local.active_conn = None
+        # Nunca devolver una conexión con una transacción a medias: liberaría bloqueos tarde
+        # y el siguiente usuario heredaría cambios no confirmados.
+        if conn.in_transaction:
+            conn.rollback()
+        if local.from_pool:
+            self._idle_connections.put(conn)
+            self._slots.release()
+
+    def close_all(self):
+        self._closed = True
+        with self._lock:
+            connections, self._all_connections = self._all_connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except SQLiteError:
+                pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Devuelve el pool global, creándolo de forma perezosa."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(get_db_path(), max_size=POOL_MAX_SIZE)
+    return _pool
+
+@contextmanager
+def get_connection():
+    """
+    Context manager para usar una conexión del pool:
+        with get_connection() as conn:
+            conn.execute(...)
+    La conexión NO se cierra al salir; vuelve al pool (o queda asignada al hilo).
+    Si queda una transacción abierta al salir, se deshace.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+@contextmanager
+def transaction(conn, mode="IMMEDIATE"):
+    """
+    Ejecuta un bloque como una única transacción:
+        with get_connection() as conn, transaction(conn):
+            ...
+    BEGIN IMMEDIATE toma el bloqueo de escritura al empezar, así dos escritores no chocan a mitad
+    de la venta. Si ya hay una transacción abierta en la conexión se usa un SAVEPOINT anidado.
+    Confirma al salir normalmente y deshace si ocurre una excepción.
+    """
+    if conn.in_transaction:
+        savepoint_name = f"sp_{threading.get_ident()}_{id(conn)}_{_next_savepoint_id()}"
+        conn.execute(f"SAVEPOINT {savepoint_name}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {savepoint_name}")
+            conn.execute(f"RELEASE {savepoint_name}")
+            raise
+        else:
+            conn.execute(f"RELEASE {savepoint_name}")
+        return
+
+    conn.execute(f"BEGIN {mode}")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+_savepoint_counter = itertools.count(1)
+
+def _next_savepoint_id():
+    return next(_savepoint_counter)
+
+def configure_database(db_path=None, profile_name=None, pool_max_size=None):
+    """
+    Cambia la base de datos, el perfil de almacenamiento o el tamaño del pool
+    (cierra las conexiones existentes). Pensado para benchmarks y herramientas;
+    la aplicación usa la ruta persistente y el perfil por defecto.
+    """
+    global _pool, _resolved_db_path, _storage_profile_name, POOL_MAX_SIZE
+    if profile_name is not None and profile_name not in STORAGE_PROFILES:
+        raise ValueError(f"Perfil de almacenamiento desconocido: {profile_name}")
+    stop_checkpoint_worker()
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+        _resolved_db_path = db_path
+        _storage_profile_name = profile_name
+        if pool_max_size is not None:
+            POOL_MAX_SIZE = pool_max_size
+
+def close_all_connections():
+    """Cierra todas las conexiones del pool (se llama al salir de la aplicación)."""
+    global _pool
+    stop_checkpoint_worker()
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+atexit.register(close_all_connections)
+
+
+class CheckpointWorker(threading.Thread):
+    """
+    Hilo en segundo plano que hace checkpoint del WAL cada `interval` segundos.
+    Usa PASSIVE para no bloquear nunca a la caja ni a la API; al detenerse hace un
+    TRUNCATE para dejar el archivo -wal vacío al cerrar la aplicación.
+    """
+    def __init__(self, db_path, interval=CHECKPOINT_INTERVAL_SECONDS):
+        super().__init__(name="WALCheckpointThread", daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        conn = None
+        try:
+            conn = _open_connection(self.db_path)
+            while not self._stop_event.wait(self.interval):
+                self.checkpoint(conn, "PASSIVE")
+            self.checkpoint(conn, "TRUNCATE")
+        except SQLiteError as e:
+            print(f"Error en el hilo de checkpoint WAL: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def checkpoint(conn, mode="PASSIVE"):
+        try:
+            busy, wal_pages, checkpointed_pages = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+            return busy, wal_pages, checkpointed_pages
+        except SQLiteError as e:
+            print(f"Error haciendo checkpoint ({mode}) del WAL: {e}")
+            return None
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_checkpoint_worker = None
+
+def start_checkpoint_worker(interval=CHECKPOINT_INTERVAL_SECONDS):
+    """Inicia el checkpoint periódico si el perfil activo usa WAL. Devuelve el hilo o None."""
+    global _checkpoint_worker
+    if str(get_storage_profile().get("journal_mode", "")).upper() != "WAL":
+        return None
+    if _checkpoint_worker is not None and _checkpoint_worker.is_alive():
+        return _checkpoint_worker
+    _checkpoint_worker = CheckpointWorker(get_db_path(), interval)
+    _checkpoint_worker.start()
+    return _checkpoint_worker
+
+def stop_checkpoint_worker(timeout=5.0):
+    global _checkpoint_worker
+    worker, _checkpoint_worker = _checkpoint_worker, None
+    if worker is not None:
+        worker.stop()
+        worker.join(timeout)
+
 def initialize_database():
     """Inicializar la base de datos con tablas y datos por defecto si es necesario."""
     print("Intentando inicializar la base de datos...")
@@ -50,58 +386,15 @@ def initialize_database():
     if conn is not None:
         try:
             cursor = conn.cursor()
-            
-            print("Creando tabla 'users' (si no existe)...")
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT NOT NULL UNIQUE,
-                    email TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    registration_date DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            print("Creando tabla 'products' (si no existe)...")
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL UNIQUE,
-                    quantity_available INTEGER NOT NULL,
-                    sale_price REAL NOT NULL,
-                    purchase_price REAL NOT NULL DEFAULT 0,
-                    is_active BOOLEAN DEFAULT 1
-                )
-            """)
-            
-            print("Creando tabla 'sales' (si no existe)...")
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS sales (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    sale_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    initial_cash REAL NOT NULL,
-                    total_amount REAL NOT NULL,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE RESTRICT
-                )
-            """)
-            
-            print("Creando tabla 'sale_items' (si no existe)...")
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS sale_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sale_id INTEGER NOT NULL,
-                    product_id INTEGER NOT NULL,
-                    quantity_sold INTEGER NOT NULL, 
-                    price_per_unit REAL NOT NULL,
-                    subtotal REAL NOT NULL,
-                    FOREIGN KEY (sale_id) REFERENCES sales(id) ON DELETE CASCADE,
-                    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE RESTRICT
-                )
-            """)
-            
-            conn.commit()
-            print("Tablas creadas/verificadas.")
+
+            # Camino rápido: si el esquema ya está en la última versión no se ejecuta ningún DDL.
+            schema_version = get_schema_version(conn)
+            if schema_version >= LATEST_SCHEMA_VERSION:
+                print(f"Esquema al día (versión {schema_version}); no se requieren migraciones.")
+            else:
+                print(f"Esquema en versión {schema_version}, migrando a la versión {LATEST_SCHEMA_VERSION}...")
+                apply_migrations(conn)
+                print("Tablas creadas/verificadas.")
 
             print("Verificando usuario admin...")
             cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'Admin'")
@@ -0,0 +1,127 @@
+# PROYECTO1_FERRETERIA/database/group_commit.py
+"""
+Escritor único con "group commit".
+
+En lugar de que cada petición abra su propia transacción y pague su propio fsync, los trabajos
+de escritura se encolan y un solo hilo los ejecuta por lotes: cada lote es una transacción
+(un único commit/fsync) y cada trabajo corre dentro de su propio SAVEPOINT, de modo que el fallo
+de una venta no arrastra a las demás del mismo lote. El lote se cierra cuando pasan
+`max_delay_ms` desde el primer trabajo (por defecto no se espera: se toma todo lo que ya está
+en cola) o cuando se juntan `max_batch_size` trabajos.
+
+Un trabajo es una función que recibe un cursor y devuelve un resultado; quien lo envía recibe
+un concurrent.futures.Future que se resuelve (con el resultado o la excepción) después del commit.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from database.db_connection import get_connection, transaction
+
+GROUP_COMMIT_ENV_VAR = "FERRETERIA_GROUP_COMMIT"
+GROUP_COMMIT_THREAD_NAME = "GroupCommitThread"
+DEFAULT_MAX_BATCH_SIZE = 64
+# 0 = el lote se cierra en cuanto el escritor queda libre, con todo lo que se encoló mientras
+# confirmaba el lote anterior (se adapta solo a la carga). Un valor > 0 espera ese tiempo extra
+# para juntar más ventas; útil en discos con fsync muy lento.
+DEFAULT_MAX_DELAY_MS = 0.0
+
+_STOP = object()
+
+
+def group_commit_requested():
+    """True si la variable de entorno FERRETERIA_GROUP_COMMIT pide activar el modo."""
+    return os.environ.get(GROUP_COMMIT_ENV_VAR, "").strip().lower() in ("1", "true", "yes", "si", "sí")
+
+
+class GroupCommitWriter:
+    def __init__(self, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_delay_ms=DEFAULT_MAX_DELAY_MS):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_delay = max(0.0, float(max_delay_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._accepting = False
+        # Estadísticas simples para benchmarks/diagnóstico
+        self.batches_committed = 0
+        self.jobs_processed = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._accepting = True
+            self._thread = threading.Thread(target=self._run, name=GROUP_COMMIT_THREAD_NAME, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Deja de aceptar trabajos, procesa los pendientes y detiene el hilo."""
+        with self._lock:
+            if not self._accepting:
+                return
+            self._accepting = False
+            self._queue.put(_STOP)
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def submit(self, job):
+        """Encola `job(cursor)` y devuelve un Future con su resultado."""
+        future = Future()
+        with self._lock:
+            if not self._accepting:
+                raise RuntimeError("El escritor de group commit no está en ejecución.")
+            self._queue.put((future, job))
+        return future
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    next_item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_item is _STOP:
+                    stopping = True
+                    break
+                batch.append(next_item)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        outcomes = []
+        try:
+            with get_connection() as conn, transaction(conn):
+                cursor = conn.cursor()
+                for future, job in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction(conn): # SAVEPOINT por trabajo
+                            result = job(cursor)
+                        outcomes.append((future, result, None))
+                    except Exception as job_error:
+                        outcomes.append((future, None, job_error))
+        except Exception as batch_error:
+            # Falló el BEGIN o el COMMIT del lote: ningún trabajo quedó guardado.
+            print(f"Error confirmando lote de group commit ({len(batch)} trabajos): {batch_error}")
+            for future, _job in batch:
+                if future.running():
+                    future.set_exception(batch_error)
+            return
+
+        self.batches_committed += 1
+        self.jobs_processed += len(outcomes)
+        for future, result, job_error in outcomes:
+            if job_error is not None:
+                future.set_exception(job_error)
+            else:
+                future.set_result(result)
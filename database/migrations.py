@@ -0,0 +1,430 @@
+# PROYECTO1_FERRETERIA/database/migrations.py
+"""
+Migraciones versionadas del esquema.
+
+La versión aplicada se guarda en `PRAGMA user_version` (vale 0 en una base nueva o en una
+creada antes de que existieran las migraciones). Cada migración se ejecuta en su propia
+transacción junto con la actualización de user_version, así que una migración fallida no deja
+el esquema a medias. Para cambiar el esquema, añadir una función nueva al final de MIGRATIONS;
+nunca modificar una migración ya publicada.
+"""
+import sqlite3
+
+
+def _migration_001_base_schema(cursor):
+    """Tablas originales. Usa IF NOT EXISTS porque las bases existentes ya las tienen."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            registration_date DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            quantity_available INTEGER NOT NULL,
+            sale_price REAL NOT NULL,
+            purchase_price REAL NOT NULL DEFAULT 0,
+            is_active BOOLEAN DEFAULT 1
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            sale_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            initial_cash REAL NOT NULL,
+            total_amount REAL NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE RESTRICT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sale_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity_sold INTEGER NOT NULL,
+            price_per_unit REAL NOT NULL,
+            subtotal REAL NOT NULL,
+            FOREIGN KEY (sale_id) REFERENCES sales(id) ON DELETE CASCADE,
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE RESTRICT
+        )
+    """)
+
+
+def _migration_002_performance_indexes(cursor):
+    """Índices para los joins del historial, el listado por fecha y la alerta de stock bajo."""
+    # Cubre el join sales -> sale_items del historial sin tocar la tabla sale_items.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sale_items_sale_id
+        ON sale_items (sale_id, product_id, quantity_sold, price_per_unit)
+    """)
+    # Búsquedas por producto y verificación de la FK ON DELETE RESTRICT de products.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_product_id ON sale_items (product_id)")
+    # Historial ordenado/filtrado por fecha.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_timestamp ON sales (sale_timestamp, id)")
+    # get_low_stock_products: WHERE is_active = 1 AND quantity_available <= ? ORDER BY quantity_available, name
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_products_active_stock
+        ON products (is_active, quantity_available, name)
+    """)
+    # Listados de productos activos ordenados por nombre (ventas, autocompletado).
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_active_name ON products (is_active, name)")
+
+
+def _migration_003_product_keyset_indexes(cursor):
+    """Índices para paginar productos por (nombre sin distinguir mayúsculas, id)."""
+    # Listado de activos: WHERE is_active = 1 [AND prefijo] ORDER BY name COLLATE NOCASE, id
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_products_active_name_nocase
+        ON products (is_active, name COLLATE NOCASE, id)
+    """)
+    # Listado incluyendo inactivos.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_name_nocase ON products (name COLLATE NOCASE, id)")
+
+
+def _migration_004_products_fts(cursor):
+    """
+    Índice de texto completo para buscar productos por nombre (FTS5 con tokenizador trigram).
+    Guarda el nombre ya plegado con fold_search_text (minúsculas, sin tildes), función que
+    db_connection registra en cada conexión; los triggers lo mantienen sincronizado con products.
+    Si esta versión de SQLite no tiene FTS5/trigram (SQLite < 3.34) no se crea nada y la búsqueda
+    de ProductModel recurre a LIKE.
+    """
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(name_folded, tokenize = 'trigram')")
+    except sqlite3.OperationalError as e:
+        print(f"Advertencia: búsqueda FTS5 trigram no disponible en SQLite {sqlite3.sqlite_version} ({e}); se usará LIKE.")
+        return
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, name_folded) VALUES (new.id, fold_search_text(new.name));
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_update AFTER UPDATE OF name ON products BEGIN
+            UPDATE products_fts SET name_folded = fold_search_text(new.name) WHERE rowid = old.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_delete AFTER DELETE ON products BEGIN
+            DELETE FROM products_fts WHERE rowid = old.id;
+        END
+    """)
+    cursor.execute("DELETE FROM products_fts")
+    cursor.execute("INSERT INTO products_fts (rowid, name_folded) SELECT id, fold_search_text(name) FROM products")
+
+
+
+def _migration_005_sales_user_timestamp_index(cursor):
+    """Índice para el historial filtrado por usuario y rango de fechas."""
+    # SaleModel.get_sales_history: WHERE user_id = ? AND sale_timestamp >= ? AND sale_timestamp < ?
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_user_timestamp ON sales (user_id, sale_timestamp, id)")
+
+
+def _migration_006_daily_sales_summary(cursor):
+    """
+    Resumen diario de ventas mantenido al registrar cada venta (ver database/daily_sales_summary.py).
+    Se llena aquí con el historial existente; el costo usa el precio de compra actual porque las
+    ventas anteriores no guardaron el suyo.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_sales_summary (
+            sale_date TEXT PRIMARY KEY,            -- 'YYYY-MM-DD' (UTC, como sale_timestamp)
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            item_count INTEGER NOT NULL DEFAULT 0,  -- Unidades vendidas
+            revenue REAL NOT NULL DEFAULT 0,
+            cost REAL NOT NULL DEFAULT 0,           -- Costo con el precio de compra al momento de la venta
+            last_sale_timestamp TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("DELETE FROM daily_sales_summary")
+    cursor.execute("""
+        INSERT INTO daily_sales_summary
+            (sale_date, sale_count, item_count, revenue, cost, last_sale_timestamp)
+        SELECT day.sale_date, day.sale_count, day.item_count, day.revenue, day.cost, day.last_sale_timestamp
+        FROM (
+            SELECT SUBSTR(s.sale_timestamp, 1, 10) AS sale_date,
+                   COUNT(DISTINCT s.id) AS sale_count,
+                   SUM(si.quantity_sold) AS item_count,
+                   SUM(si.subtotal) AS revenue,
+                   SUM(si.quantity_sold * COALESCE(p.purchase_price, 0)) AS cost,
+                   MAX(s.sale_timestamp) AS last_sale_timestamp
+            FROM sales s
+            JOIN sale_items si ON si.sale_id = s.id
+            LEFT JOIN products p ON p.id = si.product_id
+            GROUP BY sale_date
+        ) AS day
+    """)
+
+
+def _migration_007_sale_items_cost_snapshot(cursor):
+    """
+    Costo unitario y nombre del producto guardados en cada línea vendida, para que los reportes
+    de ganancias no dependan del precio de compra actual ni tengan que unir con products.
+    Las líneas existentes se completan con los valores actuales del producto (no hay otro dato).
+    """
+    cursor.execute("ALTER TABLE sale_items ADD COLUMN unit_cost_at_sale REAL")
+    cursor.execute("ALTER TABLE sale_items ADD COLUMN product_name TEXT")
+    cursor.execute("""
+        UPDATE sale_items SET
+            unit_cost_at_sale = COALESCE((SELECT p.purchase_price FROM products p WHERE p.id = sale_items.product_id), 0),
+            product_name = COALESCE((SELECT p.name FROM products p WHERE p.id = sale_items.product_id), 'N/A')
+    """)
+
+
+def _migration_008_cash_sessions(cursor):
+    """
+    Sesiones de caja: apertura con base, cierre con efectivo contado, y el total vendido que
+    SaleModel acumula en la misma transacción de cada venta (esperado = base + ventas).
+    Las ventas referencian su sesión con sales.cash_session_id. Las ventas existentes se
+    agrupan en una sesión cerrada por usuario y día, con la base de su primera venta.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cash_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            opened_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            closed_at TEXT,                          -- NULL mientras la caja está abierta
+            base_amount REAL NOT NULL,
+            sales_total REAL NOT NULL DEFAULT 0,
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            counted_cash REAL,                       -- Efectivo contado al cerrar
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE RESTRICT
+        )
+    """)
+    # Una sola caja abierta por usuario; también es el índice de "¿qué caja tiene abierta?".
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_cash_sessions_open_user
+        ON cash_sessions (user_id) WHERE closed_at IS NULL
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cash_sessions_opened_at ON cash_sessions (opened_at)")
+    cursor.execute("ALTER TABLE sales ADD COLUMN cash_session_id INTEGER REFERENCES cash_sessions(id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_cash_session ON sales (cash_session_id)")
+
+    cursor.execute("""
+        INSERT INTO cash_sessions (user_id, opened_at, closed_at, base_amount, sales_total, sale_count)
+        SELECT day.user_id, day.opened_at, day.closed_at,
+               (SELECT s2.initial_cash FROM sales s2
+                WHERE s2.user_id = day.user_id AND s2.sale_timestamp = day.opened_at
+                ORDER BY s2.id LIMIT 1),
+               day.sales_total, day.sale_count
+        FROM (
+            SELECT user_id, MIN(sale_timestamp) AS opened_at, MAX(sale_timestamp) AS closed_at,
+                   SUM(total_amount) AS sales_total, COUNT(*) AS sale_count
+            FROM sales
+            GROUP BY user_id, SUBSTR(sale_timestamp, 1, 10)
+        ) AS day
+        ORDER BY day.opened_at
+    """)
+    cursor.execute("""
+        UPDATE sales SET cash_session_id = (
+            SELECT cs.id FROM cash_sessions cs
+            WHERE cs.user_id = sales.user_id
+              AND sales.sale_timestamp BETWEEN cs.opened_at AND cs.closed_at
+        )
+    """)
+
+
+def _migration_009_stock_movements(cursor):
+    """
+    Registro de movimientos de stock (solo inserción): cada cambio de products.quantity_available
+    escribe aquí su diferencia en la misma transacción, así la suma por producto debe coincidir
+    siempre con el saldo. Los productos existentes arrancan con un movimiento 'initial' por su
+    stock actual. sale_id no es clave foránea: el registro sobrevive al borrado del historial.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL REFERENCES products(id),
+            movement_type TEXT NOT NULL
+                CHECK (movement_type IN ('initial', 'sale', 'restock', 'adjustment', 'return')),
+            quantity_change INTEGER NOT NULL,
+            sale_id INTEGER,
+            note TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Cubre el SUM(quantity_change) GROUP BY product_id del verificador sin leer la tabla.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_stock_movements_product
+        ON stock_movements (product_id, quantity_change)
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_stock_movements_no_update BEFORE UPDATE ON stock_movements BEGIN
+            SELECT RAISE(ABORT, 'stock_movements es de solo inserción');
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_stock_movements_no_delete BEFORE DELETE ON stock_movements BEGIN
+            SELECT RAISE(ABORT, 'stock_movements es de solo inserción');
+        END
+    """)
+    cursor.execute("""
+        INSERT INTO stock_movements (product_id, movement_type, quantity_change, note)
+        SELECT id, 'initial', quantity_available, 'Saldo al crear el registro de movimientos'
+        FROM products
+        WHERE quantity_available <> 0
+    """)
+
+
+def _migration_010_reorder_thresholds(cursor):
+    """
+    Punto de reorden y cantidad a pedir por producto. El punto de reorden empieza en 5, el
+    umbral fijo que usaban las vistas. El índice parcial contiene solo los productos activos con
+    stock <= su punto de reorden, así la alerta de stock bajo lee O(alertas) filas.
+    """
+    cursor.execute("ALTER TABLE products ADD COLUMN reorder_point INTEGER NOT NULL DEFAULT 5")
+    cursor.execute("ALTER TABLE products ADD COLUMN reorder_qty INTEGER NOT NULL DEFAULT 0")
+    # ProductModel.get_low_stock_products repite este mismo WHERE para que SQLite use el índice.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_products_low_stock
+        ON products (quantity_available, name)
+        WHERE is_active = 1 AND quantity_available <= reorder_point
+    """)
+
+def _migration_011_row_versions(cursor):
+    """
+    Versión de fila para la sincronización de terminales remotas (GET /api/v1/sync).
+    sync_state guarda un contador global; cada alta o cambio en products, sales y sale_items
+    toma el siguiente valor en su row_version (triggers), así "qué cambió desde la versión N" es
+    un recorrido por rango del índice de row_version de cada tabla. Las filas existentes reciben
+    versiones únicas al migrar. history_reset_version marca el último borrado del historial (no
+    se guarda una fila por venta borrada). client_sale_id identifica las ventas cargadas desde una
+    terminal sin conexión, para no registrarlas dos veces.
+
+    Una escritura puede poner ella misma la versión (la venta: sus líneas y el descuento de stock
+    toman la versión de la fila de sales en el mismo INSERT/UPDATE); los triggers solo la asignan
+    si no cambió, así una venta de N líneas no paga 2N actualizaciones extra. Varias filas pueden
+    compartir versión, pero siempre de la misma transacción. sale_items no tiene trigger de INSERT
+    (incluso sin ejecutarse, encarece cada línea): sus filas solo las crea SaleModel._insert_sale,
+    que siempre les pone la versión de su venta.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_row_version INTEGER NOT NULL,
+            history_reset_version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for table in ("products", "sales", "sale_items"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE sales ADD COLUMN client_sale_id TEXT")
+
+    # Versiones iniciales únicas entre las tres tablas: primero productos, luego ventas y líneas.
+    cursor.execute("UPDATE products SET row_version = id")
+    cursor.execute("UPDATE sales SET row_version = id + (SELECT COALESCE(MAX(id), 0) FROM products)")
+    cursor.execute("""
+        UPDATE sale_items SET row_version = id
+            + (SELECT COALESCE(MAX(id), 0) FROM products) + (SELECT COALESCE(MAX(id), 0) FROM sales)
+    """)
+    cursor.execute("""
+        INSERT OR REPLACE INTO sync_state (id, last_row_version)
+        SELECT 1, (SELECT COALESCE(MAX(id), 0) FROM products) + (SELECT COALESCE(MAX(id), 0) FROM sales)
+                  + (SELECT COALESCE(MAX(id), 0) FROM sale_items)
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_row_version ON products (row_version)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_row_version ON sales (row_version)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_row_version ON sale_items (row_version)")
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_client_sale_id
+        ON sales (client_sale_id) WHERE client_sale_id IS NOT NULL
+    """)
+
+    # Los triggers de UPDATE solo miran las columnas de datos: el UPDATE de row_version que hacen
+    # ellos mismos no vuelve a dispararlos (ni al trigger de FTS, que mira solo name). No hacen
+    # nada si la escritura ya trajo su versión.
+    watched_columns = {
+        "products": "name, quantity_available, sale_price, purchase_price, is_active, reorder_point, reorder_qty",
+        "sales": "user_id, sale_timestamp, initial_cash, total_amount, cash_session_id",
+        "sale_items": "sale_id, product_id, quantity_sold, price_per_unit, subtotal",
+    }
+    for table, columns in watched_columns.items():
+        for trigger_suffix, trigger_event, stamp_missing in (
+                ("insert", "INSERT", "NEW.row_version = 0"),
+                ("update", f"UPDATE OF {columns}", "NEW.row_version = OLD.row_version")):
+            if table == "sale_items" and trigger_suffix == "insert":
+                continue
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_row_version_{trigger_suffix}
+                AFTER {trigger_event} ON {table} WHEN {stamp_missing} BEGIN
+                    UPDATE sync_state SET last_row_version = last_row_version + 1 WHERE id = 1;
+                    UPDATE {table} SET row_version = (SELECT last_row_version FROM sync_state WHERE id = 1)
+                    WHERE id = NEW.id;
+                END
+            """)
+
+def _migration_012_idempotency_keys(cursor):
+    """
+    Claves de idempotencia de POST /sales/: la clave, un hash de la petición y el resultado de la
+    venta (JSON), guardados en la misma transacción que la venta. expires_at (segundos Unix) tiene
+    índice para que la limpieza periódica borre las vencidas sin recorrer la tabla.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            idempotency_key TEXT PRIMARY KEY,
+            request_hash TEXT NOT NULL,
+            response TEXT NOT NULL,
+            expires_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys (expires_at)")
+
+# (versión, descripción, función). Las versiones deben ser consecutivas y crecientes.
+MIGRATIONS = [
+    (1, "Esquema base: users, products, sales, sale_items", _migration_001_base_schema),
+    (2, "Índices de rendimiento para historial y stock bajo", _migration_002_performance_indexes),
+    (3, "Índices para paginación por cursor de productos", _migration_003_product_keyset_indexes),
+    (4, "Búsqueda de productos con FTS5 trigram", _migration_004_products_fts),
+    (5, "Índice de ventas por usuario y fecha", _migration_005_sales_user_timestamp_index),
+    (6, "Resumen diario de ventas materializado", _migration_006_daily_sales_summary),
+    (7, "Costo y nombre del producto guardados en sale_items", _migration_007_sale_items_cost_snapshot),
+    (8, "Sesiones de caja referenciadas por las ventas", _migration_008_cash_sessions),
+    (9, "Registro de movimientos de stock", _migration_009_stock_movements),
+    (10, "Punto de reorden por producto e índice de stock bajo", _migration_010_reorder_thresholds),
+    (11, "Versión de fila para sincronizar terminales remotas", _migration_011_row_versions),
+    (12, "Claves de idempotencia para registrar ventas", _migration_012_idempotency_keys),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn):
+    """
+    Aplica en orden las migraciones pendientes. Devuelve la versión final del esquema.
+    Lanza sqlite3.Error si alguna falla (las anteriores quedan aplicadas).
+    """
+    current_version = get_schema_version(conn)
+    if conn.in_transaction:
+        conn.commit()
+
+    for version, description, migration_func in MIGRATIONS:
+        if version <= current_version:
+            continue
+        print(f"Aplicando migración {version}: {description}...")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Releer dentro de la transacción: otro proceso pudo haber migrado mientras tanto.
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            migration_func(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        current_version = version
+
+    # Actualiza las estadísticas del planificador tras cambios de índices.
+    conn.execute("PRAGMA optimize")
+    return current_version
@@ -0,0 +1,91 @@
+# database/stock_ledger.py
+"""
+Registro de movimientos de stock (tabla stock_movements, solo inserción).
+
+products.quantity_available es el saldo; cada escritura que lo cambia (ventas, altas, ediciones,
+conteos, reposiciones, devoluciones) inserta su diferencia en stock_movements dentro de la misma
+transacción. Así la suma de movimientos de cada producto debe ser igual a su saldo, y el
+verificador lo comprueba para todos los productos con una sola consulta agrupada.
+
+Para revisar diferencias desde la consola:
+    python -m database.stock_ledger
+"""
+import sqlite3
+
+MOVEMENT_INITIAL = "initial"       # Stock con el que se crea el producto
+MOVEMENT_SALE = "sale"
+MOVEMENT_RESTOCK = "restock"
+MOVEMENT_ADJUSTMENT = "adjustment" # Ediciones y conteos físicos
+MOVEMENT_RETURN = "return"
+MOVEMENT_TYPES = (MOVEMENT_INITIAL, MOVEMENT_SALE, MOVEMENT_RESTOCK, MOVEMENT_ADJUSTMENT, MOVEMENT_RETURN)
+
+# Un movimiento por producto de la venta :sale_id (ya descontado de products).
+RECORD_SALE_STOCK_MOVEMENTS_SQL = """
+    INSERT INTO stock_movements (product_id, movement_type, quantity_change, sale_id)
+    SELECT product_id, 'sale', -SUM(quantity_sold), :sale_id
+    FROM sale_items
+    WHERE sale_id = :sale_id
+    GROUP BY product_id
+"""
+
+# Movimiento que lleva el producto de su saldo actual a una cantidad fija; se ejecuta ANTES del
+# UPDATE. Parámetros: (cantidad nueva, tipo, nota, condición por id o nombre, cantidad nueva).
+_RECORD_SET_QUANTITY_SQL = """
+    INSERT INTO stock_movements (product_id, movement_type, quantity_change, note)
+    SELECT id, ?, ? - quantity_available, ?
+    FROM products
+    WHERE {key_column} = ? AND quantity_available <> ?
+"""
+RECORD_SET_QUANTITY_BY_ID_SQL = _RECORD_SET_QUANTITY_SQL.format(key_column="id")
+RECORD_SET_QUANTITY_BY_NAME_SQL = _RECORD_SET_QUANTITY_SQL.format(key_column="name")
+
+RECORD_STOCK_MOVEMENT_SQL = """
+    INSERT INTO stock_movements (product_id, movement_type, quantity_change, sale_id, note)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# Productos cuyo saldo no coincide con la suma de sus movimientos.
+_STOCK_DRIFT_SQL = """
+    SELECT p.id AS product_id, p.name, p.quantity_available,
+           COALESCE(ledger.balance, 0) AS ledger_balance,
+           p.quantity_available - COALESCE(ledger.balance, 0) AS drift
+    FROM products p
+    LEFT JOIN (
+        SELECT product_id, SUM(quantity_change) AS balance
+        FROM stock_movements
+        GROUP BY product_id
+    ) AS ledger ON ledger.product_id = p.id
+    WHERE p.quantity_available <> COALESCE(ledger.balance, 0)
+    ORDER BY p.id
+"""
+
+
+def record_set_quantity(cursor, product_id, new_quantity, movement_type=MOVEMENT_ADJUSTMENT, note=None):
+    """Registra el paso de un producto a `new_quantity`, usando la transacción del llamador (antes del UPDATE)."""
+    cursor.execute(RECORD_SET_QUANTITY_BY_ID_SQL, (movement_type, new_quantity, note, product_id, new_quantity))
+
+
+def find_stock_drift(conn):
+    """
+    Lista de productos cuyo saldo difiere de la suma de su registro de movimientos:
+    [{'product_id', 'name', 'quantity_available', 'ledger_balance', 'drift'}] ([] si todo cuadra).
+    Devuelve None si la consulta falla.
+    """
+    try:
+        return [dict(row) for row in conn.execute(_STOCK_DRIFT_SQL)]
+    except sqlite3.Error as e:
+        print(f"Error al verificar stock_movements: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    from database.db_connection import initialize_database, get_connection
+
+    initialize_database()
+    with get_connection() as conn:
+        drifted_products = find_stock_drift(conn)
+    if drifted_products is not None:
+        for product in drifted_products:
+            print(f"Producto {product['product_id']} ({product['name']}): saldo {product['quantity_available']}, "
+                  f"movimientos {product['ledger_balance']}, diferencia {product['drift']}")
+        print(f"Productos con diferencias: {len(drifted_products)}.")
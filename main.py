@@ -24,7 +24,9 @@ else:
 
 import threading
 from PyQt5.QtWidgets import QApplication, QDialog
-from database.db_connection import initialize_database
+from database.db_connection import initialize_database, start_checkpoint_worker
+from database.group_commit import group_commit_requested
+from app.models.idempotency_model import start_idempotency_cleanup_worker
 from utils.helpers import resource_path # Importar la función resource_path
 import uvicorn
 
@@ -63,6 +65,11 @@ if __name__ == "__main__":
     # 1. Inicializar la base de datos primero
     print("Inicializando base de datos...")
     initialize_database() # Esta función ya usa resource_path internamente
+    start_checkpoint_worker() # Checkpoint periódico del WAL (solo si el perfil de almacenamiento usa WAL)
+    start_idempotency_cleanup_worker() # Borra las claves de idempotencia vencidas de POST /sales/
+    if group_commit_requested(): # FERRETERIA_GROUP_COMMIT=1 agrupa las ventas en commits por lotes
+        from app.models.sale_model import SaleModel
+        SaleModel.enable_group_commit()
     print("Base de datos lista.")
     
     # 2. Iniciar API en un hilo separado